@@ -2,7 +2,7 @@
 import logging
 logging.basicConfig(level=logging.INFO)
 
-import asyncio, collections, time, json, base64, cv2, numpy as np
+import asyncio, collections, time, json, base64, uuid, hashlib, cv2, numpy as np
 import yaml
 from datetime import datetime, timezone
 from typing import Dict
@@ -11,23 +11,30 @@ from pathlib import Path
 from fastapi import FastAPI, WebSocket, Body, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from starlette.websockets import WebSocketDisconnect
 
 from core.capture import Camera
 from core.facemesh import FaceMeshWrapper
 from core.features import compute_all
 from core.events import EventState
-from core.window import WindowAggregator
+from core.window import WindowAggregator, MultiWindowAggregator, IntervalAccumulator
 from core.calibrator import Calibrator
-from core.indices import compute_from_features
+from core.indices import compute_from_features, get_engine, reload_rules, reload_if_changed, rules_status
+from core.session import PipelineSession, SessionRegistry
 
 # ⬇ LLM (로컬 우선 / 최초 1회만 HF) + 디버그 상태
 from llm.exaone import build_coaching_text, exaone_debug_status
 
 # ⬇ DB 및 트렌드 분석 (v0.8.0)
 from db.repository import repo
-from core.trend_analysis import GraphAnalyzer
+from db.tenants import TenantRouter, DEFAULT_USER
+from db.writer import LogWriter
+from db import maintenance
+from core.trend_service import TrendService
+from core.downsample import lttb
+from core.scheduler import Scheduler
+from core.anomaly import AnomalyDetector
 
 # 로깅 인터벌
 LOG_INTERVAL = 10.0  # 10초마다 DB 저장
@@ -145,6 +152,8 @@ def draw_debug_overlay(frame, feats, face_lms, pose_lms, indices, fps, detect_en
         cv2.putText(dbg, "BLINK", (w-140, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,255), 2, cv2.LINE_AA)
     if events.get("yawn"):
         cv2.putText(dbg, "YAWN",  (w-135, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,128,255), 2, cv2.LINE_AA)
+    if events.get("nodding"):
+        cv2.putText(dbg, "NOD",   (w-120, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255,128,0), 2, cv2.LINE_AA)
 
     # 감지 OFF 워터마크
     if not detect_enabled:
@@ -161,28 +170,61 @@ def draw_debug_overlay(frame, feats, face_lms, pose_lms, indices, fps, detect_en
 PIPELINE_PAUSE = asyncio.Event()
 PIPELINE_PAUSE.clear()
 
-@app.websocket("/ws")
-async def ws_stream(ws: WebSocket):
-    await ws.accept()
+# 🆕 세션 레지스트리: 재연결 시 파이프라인 상태/카메라 유지
+SESSION_CONFIG = CONFIG.get("session", {})
+def submit_interval(sess, row):
+    """구간 요약 행 → 이상치 판정 + write-behind 큐 적재 (프레임 루프는 대기하지 않음). 이상치 목록 반환."""
+    if row is None:
+        return []
+    user_key = sess.repo.user_key if sess.repo is not None else DEFAULT_USER
+    row["session_id"] = sess.session_id
+    row["user_key"] = user_key
+    # 🆕 개인 기준선 대비 이상치 (WS로 바로 전송, 로그 행과 같은 트랜잭션에 저장)
+    anomalies = ANOMALY.update(user_key, row)
+    if anomalies:
+        row["anomalies"] = anomalies
+    LOG_WRITER.submit(row)
+    return anomalies
+
+def _flush_session_interval(sess):
+    """세션 정리(유예 만료/서버 종료) 전 마지막 부분 구간 저장"""
+    if sess.interval is not None:
+        submit_interval(sess, sess.interval.flush())
+
+SESSIONS = SessionRegistry(
+    grace_sec=SESSION_CONFIG.get("grace_sec", 60),
+    # 상대 경로는 저장소 루트 기준 (storage.data_dir과 동일, 실행 위치와 무관)
+    checkpoint_dir=Path(__file__).parent.parent / SESSION_CONFIG["checkpoint_dir"]
+    if SESSION_CONFIG.get("checkpoint_dir") else None,
+    checkpoint_ttl_sec=SESSION_CONFIG.get("checkpoint_ttl_hours", 24) * 3600,
+    on_close=_flush_session_interval,
+)
 
-    # 설정 로드
+def _new_cumulative_stats():
+    return {
+        "blink_count": 0,
+        "yawn_count": 0,
+        "nodding_count": 0,
+        "fatigue_history": [],
+        "stress_history": [],
+        "perclos_history": [],
+        "timestamps": []
+    }
+
+def _open_pipeline(session_id: str) -> PipelineSession:
+    """새 세션용 카메라/FaceMesh/상태 객체 생성 (SessionRegistry factory)"""
     cam_config = CONFIG.get("camera", {})
     vision_config = CONFIG.get("vision", {})
-    perf_config = CONFIG.get("performance", {})
-    
+    window_config = CONFIG.get("window", {})
+
     # 카메라 설정
     cam_width = cam_config.get("width", 640)
     cam_height = cam_config.get("height", 480)
     cam_fps = cam_config.get("fps", 20)
     max_num_faces = cam_config.get("max_num_faces", 3)
-    
-    # 비전 기능
-    use_pnp = vision_config.get("use_pnp_headpose", True)
     use_target_tracking = vision_config.get("use_target_tracking", True)
-    use_brightness = vision_config.get("use_brightness_check", True)
-    
-    logging.info(f"🎥 Camera: {cam_width}x{cam_height} @ {cam_fps}fps")
-    logging.info(f"🔧 PnP: {use_pnp}, Tracking: {use_target_tracking}, Brightness: {use_brightness}")
+
+    logging.info(f"🎥 Camera: {cam_width}x{cam_height} @ {cam_fps}fps (session {session_id})")
 
     # Windows에서 카메라 점유 이슈가 있을 수 있어, dshow 우선시 옵션 허용
     try:
@@ -196,10 +238,299 @@ async def ws_stream(ws: WebSocket):
         max_num_faces=max_num_faces,
         use_target_tracking=use_target_tracking
     )
-    
-    ev = EventState(fps=cam_fps)
-    agg = WindowAggregator(window_sec=60)
-    cal = Calibrator(warmup_sec=10, fps=cam_fps)  # 🆕 30→10초
+
+    return PipelineSession(
+        session_id,
+        cam=cam, fm=fm,
+        ev=EventState(fps=cam_fps),
+        agg=WindowAggregator(window_sec=60),
+        multi=MultiWindowAggregator(horizons=window_config.get("horizons_sec")),  # 10초/1분/5분/1시간 동시 집계
+        cal=Calibrator(warmup_sec=10, fps=cam_fps),  # 🆕 30→10초
+        interval=IntervalAccumulator(interval_sec=LOG_INTERVAL),  # DB 로그 구간 집계
+        extra={"cumulative": _new_cumulative_stats()},
+    )
+
+# 🆕 사용자별 DB 파일 라우팅 (기본 사용자는 기존 wellness.db)
+STORAGE_CONFIG = CONFIG.get("storage", {})
+TENANTS = TenantRouter(
+    Path(__file__).parent.parent / STORAGE_CONFIG.get("data_dir", "data"),
+    default_repo=repo,
+    max_open=STORAGE_CONFIG.get("max_open_tenants", 64),
+)
+
+# 🆕 DB write-behind 큐 (모든 세션 공용, 배치 커밋 - 행의 user_key로 사용자 DB 선택)
+WRITER_CONFIG = STORAGE_CONFIG.get("writer", {})
+LOG_WRITER = LogWriter(
+    TENANTS,
+    max_queue=WRITER_CONFIG.get("max_queue", 10000),
+    batch_rows=WRITER_CONFIG.get("batch_rows", 200),
+    flush_ms=WRITER_CONFIG.get("flush_ms", 1000),
+)
+
+# 🆕 보존 기간 정리/공간 회수 (db/maintenance.py)
+MAINT_CONFIG = STORAGE_CONFIG.get("maintenance", {})
+MAINT_STATE = {"last_run": None, "reports": [], "running": False}
+
+async def run_maintenance():
+    """모든 사용자 DB 정리 (스레드에서 청크 단위 실행, 동시 실행 방지)"""
+    if MAINT_STATE["running"]:
+        return MAINT_STATE["reports"]
+    MAINT_STATE["running"] = True
+    try:
+        MAINT_STATE["reports"] = await asyncio.to_thread(
+            maintenance.run_all, TENANTS, log=logging.info,
+            retention_days=MAINT_CONFIG.get("raw_retention_days", 30),
+            rollup_1m_retention_days=MAINT_CONFIG.get("rollup_1m_retention_days", 180),
+            chunk=MAINT_CONFIG.get("delete_chunk", 2000),
+            vacuum_pages=MAINT_CONFIG.get("vacuum_pages", 512),
+        )
+        MAINT_STATE["last_run"] = time.time()
+    finally:
+        MAINT_STATE["running"] = False
+    return MAINT_STATE["reports"]
+
+# 🆕 트렌드 요약 캐시 (최근 12시간 시간대별 평균 + 최근 10분 기울기 + 강건 추세/변화점)
+TREND_CONFIG = CONFIG.get("trend", {})
+TREND = TrendService(
+    TENANTS, hours=TREND_CONFIG.get("hours", 12), trend_window_min=TREND_CONFIG.get("window_min", 10),
+    robust=TREND_CONFIG.get("robust"), robust_warmup_min=TREND_CONFIG.get("warmup_min", 60),
+    change_recent_min=TREND_CONFIG.get("change_recent_min", 60), max_users=TREND_CONFIG.get("max_users", 256),
+)
+LOG_WRITER.add_listener(TREND.on_commit)
+
+# 🆕 개인 기준선(사용자·시간대별 median/MAD) 대비 이상치 - 구간 집계마다 즉시 판정, WS + anomalies 테이블
+ANOMALY_CONFIG = CONFIG.get("anomaly", {})
+ANOMALY = AnomalyDetector(TENANTS, **ANOMALY_CONFIG)
+
+async def precompute_report_context():
+    """연결 중인 세션 사용자별 트렌드 요약을 미리 구축/검증 → /report·/chat은 trend_context()로 DB 조회 없이 사용"""
+    users = {s.repo.user_key for s in SESSIONS.active() if s.repo is not None}
+    for user_key in users:
+        await asyncio.to_thread(TREND.summary, user_key)
+
+async def trend_context(user_key: str = None) -> str:
+    """미리 계산된 요약 (메모리), 없으면 그 자리에서 계산"""
+    text = TREND.peek(user_key)
+    return text if text is not None else await asyncio.to_thread(TREND.summary, user_key)
+
+def reload_rules_if_changed():
+    if reload_if_changed():
+        logging.info(f"📐 rules.yaml reloaded (version {get_engine().version})")
+
+# 🆕 백그라운드 작업 (세션 정리, 규칙 리로드, DB 정리, 리포트 컨텍스트 선계산) - /scheduler에서 상태 확인
+SCHEDULER = Scheduler()
+# 카메라 해제·구간 flush(reap), 규칙 파일 stat/컴파일(reload)은 블로킹 → 스레드에서
+SCHEDULER.add("sessions.reap", SESSIONS.reap, 5.0, in_thread=True, timeout_sec=30.0)
+SCHEDULER.add("rules.reload", reload_rules_if_changed, 5.0, in_thread=True, timeout_sec=30.0)
+SCHEDULER.add("report.precompute", precompute_report_context, TREND_CONFIG.get("precompute_sec", 60),
+              jitter_sec=5.0, initial_delay_sec=10.0, timeout_sec=30.0)
+if MAINT_CONFIG.get("enabled", True):
+    SCHEDULER.add("db.maintenance", run_maintenance, MAINT_CONFIG.get("interval_min", 60) * 60,
+                  jitter_sec=60.0, initial_delay_sec=MAINT_CONFIG.get("initial_delay_sec", 300))
+
+@app.on_event("startup")
+async def _start_housekeeping():
+    LOG_WRITER.start()
+    get_engine()  # rules.yaml 컴파일
+    SCHEDULER.start()
+
+@app.get("/scheduler")
+def scheduler_status():
+    """작업별 실행/실패/건너뜀(이전 실행 진행 중) 횟수와 소요 시간"""
+    return SCHEDULER.info()
+
+@app.post("/scheduler/{name}/run")
+def scheduler_run(name: str):
+    if name not in SCHEDULER.jobs:
+        return JSONResponse({"ok": False, "error": f"unknown job: {name}"}, status_code=404)
+    return {"ok": SCHEDULER.run_now(name)}
+
+@app.get("/db/maintenance")
+def db_maintenance_status():
+    """마지막 정리 결과 (삭제 행 수, 회수 바이트, 소요 시간)"""
+    return MAINT_STATE
+
+@app.post("/db/maintenance")
+async def db_maintenance_run():
+    return {"ok": True, "reports": await run_maintenance()}
+
+@app.get("/rules/status")
+def rules_reload_status():
+    """적용 중인 규칙 버전 + 자동 리로드(rules.reload 작업)의 마지막 컴파일 오류"""
+    return rules_status()
+
+@app.post("/rules/reload")
+def rules_reload():
+    """config/rules.yaml 재컴파일 (가중치/정규화/알림 레벨)"""
+    try:
+        engine = reload_rules()
+    except Exception as e:
+        return {"ok": False, "error": str(e), "status": rules_status()}
+    return {
+        "ok": True,
+        "version": engine.version,
+        "features": engine.keys,
+        "weights": {s: dict(zip(engine.names, engine.W[:, j].tolist())) for j, s in enumerate(engine.score_names)},
+        "alert_levels": {name: th for th, name in engine.alert_levels},
+    }
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await SCHEDULER.stop()
+    SESSIONS.close_all()
+    await LOG_WRITER.stop()   # 남은 로그 flush
+    TENANTS.close()
+
+@app.get("/db/stats")
+def db_stats():
+    """write-behind 큐 상태 (큐 깊이, 커밋 지연, 드롭/실패 카운터) + 열린 사용자 DB 수"""
+    return {**LOG_WRITER.stats(), "tenants": TENANTS.info()}
+
+def _unknown_user(user: str = None):
+    """조회 전용 API: 등록되지 않은 사용자는 만들지 않고 404 (카탈로그 행/DB 파일/캐시가 생기지 않도록)"""
+    if TENANTS.exists(user):
+        return None
+    return JSONResponse({"ok": False, "error": f"unknown user: {user}"}, status_code=404)
+
+@app.get("/trend")
+async def trend(user: str = None):
+    """강건 추세 스냅샷: 수준, EWMA/Theil–Sen 분당 기울기, 최근 변화점 + 리포트용 요약 텍스트"""
+    resp = _unknown_user(user)
+    if resp is not None:
+        return resp
+    return await asyncio.to_thread(TREND.snapshot, user)
+
+@app.get("/trend/stats")
+def trend_stats():
+    """트렌드 캐시 hit/miss/재구축 카운터"""
+    return TREND.info()
+
+# 🆕 차트 히스토리 (롤업/원시 행 → LTTB 다운샘플, 줌 레벨과 무관하게 지표당 최대 points개)
+HISTORY_MAX_POINTS = 5000
+
+def _history(store, since_ms, until_ms, metrics, points, source):
+    data = store.get_series(since_ms, until_ms, metrics, points, source)
+    series = {}
+    for m, (t, v) in data["series"].items():
+        t, v = lttb(t, v, points)
+        series[m] = {"t": t.tolist(), "v": np.round(v, 4).tolist()}
+    return {"source": data["source"], "series": series}
+
+@app.get("/history")
+async def history(request: Request, metrics: str = "fatigue,stress", hours: float = 24, since: int = None,
+                  until: int = None, points: int = 500, source: str = "auto", user: str = None, session: str = None):
+    """
+    [since, until) (epoch ms) 지표별 다운샘플 시계열. since/until 없으면 최근 hours시간 (끝은 다음 1분 경계로 올림).
+    ETag = 조회 조건 + 마지막 로그 id → 새 로그가 없으면 304. 과거 구간은 1시간, 진행 중 구간은 LOG_INTERVAL 캐시.
+    """
+    metric_list = [m.strip() for m in metrics.split(",") if m.strip()]
+    points = max(3, min(points, HISTORY_MAX_POINTS))
+    if until is None:
+        until = -(-int(time.time() * 1000) // 60_000) * 60_000
+    if since is None:
+        since = until - int(hours * 3_600_000)
+    if since >= until:
+        return JSONResponse({"ok": False, "error": "since must be before until"}, status_code=400)
+    resp = _unknown_user(user)
+    if resp is not None:
+        return resp
+    store = TENANTS.scope(user, session)
+    last_id, last_ms = await asyncio.to_thread(lambda: (store.last_row_id(), store.last_ts_ms()))
+
+    key = f"{store.user_key}|{session}|{since}|{until}|{','.join(metric_list)}|{points}|{source}|{last_id}"
+    etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+    closed = last_ms is not None and until <= last_ms      # 이미 지난 구간 → 더 바뀌지 않음
+    headers = {"ETag": etag,
+               "Cache-Control": "private, max-age=3600" if closed else f"private, max-age={int(LOG_INTERVAL)}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        body = await asyncio.to_thread(_history, store, since, until, metric_list, points, source)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    return JSONResponse({"ok": True, "user": store.user_key, "since_ms": since, "until_ms": until,
+                         "points": points, **body}, headers=headers)
+
+@app.get("/anomalies")
+def anomalies(user: str = None, session: str = None, hours: float = 24, limit: int = 200, baseline: bool = False):
+    """저장된 이상치 이벤트 (최신순) + 검출기 카운터, baseline=true면 시간대별 median/MAD"""
+    resp = _unknown_user(user)
+    if resp is not None:
+        return resp
+    store = TENANTS.scope(user, session)
+    out = {"user": store.user_key, "events": store.get_anomalies(hours=hours, limit=limit), "detector": ANOMALY.info()}
+    if baseline:
+        ANOMALY.warm(store.user_key)   # LRU에서 밀려났거나 아직 없으면 DB로 구성 (있으면 no-op)
+        out["baseline"] = ANOMALY.baseline(store.user_key)
+    return out
+
+@app.get("/sessions")
+def list_sessions(user: str = None, limit: int = 50):
+    """사용자의 최근 세션 목록 (카탈로그)"""
+    resp = _unknown_user(user)
+    if resp is not None:
+        return resp
+    u = TENANTS.user(user or DEFAULT_USER)
+    return {"user": u["user_key"], "sessions": TENANTS.catalog.sessions(u["id"], limit)}
+
+async def save_calibration(store, profile_key: str, profile: dict):
+    """캘리브레이션 프로필 저장 (스레드), 실패는 로그만 - 프레임 루프에서는 태스크로 띄움"""
+    try:
+        await asyncio.to_thread(store.save_calibration, profile_key, profile)
+    except Exception as e:
+        logging.error(f"Calibration profile save failed: {e}")
+
+@app.websocket("/ws")
+async def ws_stream(ws: WebSocket):
+    await ws.accept()
+
+    # 설정 로드
+    cam_config = CONFIG.get("camera", {})
+    vision_config = CONFIG.get("vision", {})
+    cam_fps = cam_config.get("fps", 20)
+
+    # 비전 기능
+    use_pnp = vision_config.get("use_pnp_headpose", True)
+    use_brightness = vision_config.get("use_brightness_check", True)
+    logging.info(f"🔧 PnP: {use_pnp}, Brightness: {use_brightness}")
+
+    # 🆕 세션 복원 (sid 쿼리) 또는 생성
+    session_id = ws.query_params.get("sid") or uuid.uuid4().hex
+    sess, resumed = SESSIONS.attach(session_id, _open_pipeline)
+    session_id = sess.session_id   # 요청 sid가 다른 연결에서 사용 중이면 새 id
+    generation = sess.generation
+    cam, fm, ev, agg, multi, cal = sess.cam, sess.fm, sess.ev, sess.agg, sess.multi, sess.cal
+    logging.info(f"🔗 Session {'resumed' if resumed else 'started'}: {session_id}")
+    # 확정된 sid를 먼저 알림 (클라이언트는 sessionStorage에 저장 → 새 id를 받은 복제 탭은 이후 자기 id로 재접속)
+    try:
+        await ws.send_text(json.dumps({"type": "hello", "session_id": session_id, "resumed": resumed}))
+    except Exception:
+        SESSIONS.detach(session_id, generation)
+        return
+
+    # 🆕 사용자/장치 범위 저장소 (카탈로그에 세션 기록)
+    user_key = ws.query_params.get("user") or DEFAULT_USER
+    device_key = f"camera:{cam_config.get('id', 0)}"
+    if sess.repo is None or sess.repo.user_key != user_key:
+        sess.repo = await asyncio.to_thread(TENANTS.open_session, session_id, user_key, device_key)
+    store = sess.repo
+    try:
+        n = await asyncio.to_thread(ANOMALY.warm, user_key)
+        if n:
+            logging.info(f"📈 Anomaly baseline warmed: {user_key} ({n} rows)")
+    except Exception as e:
+        logging.error(f"Anomaly baseline warm failed: {e}")
+
+    # 🆕 저장된 캘리브레이션 프로필 복원 (user 쿼리 → 없으면 카메라 단위)
+    calib_config = CONFIG.get("calibration", {})
+    profile_key = ws.query_params.get("user") or device_key
+    profile_save_sec = calib_config.get("profile_save_sec", 30)
+    if not cal.ready:
+        try:
+            if cal.load_profile(await asyncio.to_thread(store.load_calibration, profile_key)):
+                logging.info(f"🎯 Calibration profile loaded: {profile_key}")
+        except Exception as e:
+            logging.error(f"Calibration profile load failed: {e}")
 
     detect_enabled = True
     last_preview_ms = 0
@@ -210,22 +541,18 @@ async def ws_stream(ws: WebSocket):
     # FPS 모니터링
     frame_times = collections.deque(maxlen=30)
     
-    # 🆕 누적 통계 추적
-    cumulative_stats = {
-        "blink_count": 0,
-        "yawn_count": 0,
-        "nodding_count": 0,
-        "fatigue_history": [],
-        "stress_history": [],
-        "perclos_history": [],
-        "timestamps": []
-    }
+    # 🆕 누적 통계 추적 (세션에 보관 → 재연결 시 이어짐)
+    cumulative_stats = sess.extra.setdefault("cumulative", _new_cumulative_stats())
     
-    # 🆕 DB 저장 타이머
-    last_log_time = time.time()
+    # 🆕 DB 로그 구간 집계기 (LOG_INTERVAL마다 평균/최소/최대/횟수 1행)
+    interval_acc = sess.interval
 
     try:
         while True:
+            # 같은 sid로 새 연결이 붙으면 이 루프는 종료
+            if sess.generation != generation:
+                break
+
             if PIPELINE_PAUSE.is_set():
                 await asyncio.sleep(0.05)
                 continue
@@ -256,7 +583,7 @@ async def ws_stream(ws: WebSocket):
                     except:
                         pass
                     try:
-                        cam = Camera(0, 1280, 720, 30, use_dshow=True).open()
+                        cam = sess.cam = Camera(0, 1280, 720, 30, use_dshow=True).open()
                     except:
                         pass
                     continue
@@ -295,20 +622,27 @@ async def ws_stream(ws: WebSocket):
                 ev.th_open  = cal.th_open
                 ev.th_yawn  = cal.th_yawn
 
+            # 프로필 저장 (디바운스, 기다리지 않음)
+            if cal.profile_due(frame_start, profile_save_sec):
+                asyncio.create_task(save_calibration(store, profile_key, cal.to_profile()))
+
             if detect_enabled:
-                events = ev.update(feats)
-                agg.update(feats, events)
+                ts_ms = int(frame_start * 1000)
+                events = ev.update(feats, ts_ms=ts_ms)
+                agg.update(feats, events, ts_ms=ts_ms)
+                multi.update(feats, events, ts_ms=ts_ms)
                 snap = agg.snapshot()
+                horizons = multi.snapshot()
                 fused = {
                     "perclos":           snap.get("perclos", feats.get("perclos", 0.0)),
                     "yawn_rate_min":     snap.get("yawn_rate_min", 0.0),
-                    "nodding_rate_min":  0.0,
+                    "nodding_rate_min":  snap.get("nodding_rate_min", 0.0),
                     "posture_angle_norm":snap.get("posture_angle_norm", feats.get("posture_angle_norm", 0.0)),
                     "headpose_var":      snap.get("headpose_var", feats.get("headpose_var", 0.0)),
                     "gaze_on_pct":       snap.get("gaze_on_pct", feats.get("gaze_on_pct", 0.7)),
                     "near_work":         snap.get("near_work", feats.get("near_work", 0.0)),
                     "facial_tension":    feats.get("facial_tension", 0.5),
-                    "blink_var":         feats.get("blink_var", 0.2),
+                    "blink_var":         ev.blink_stats.cv("1m", now_ms=ts_ms, default=feats.get("blink_var", 0.2)),
                 }
                 indices = compute_from_features(fused)
                 events_out = events
@@ -321,24 +655,21 @@ async def ws_stream(ws: WebSocket):
                 if events.get("nodding"):
                     cumulative_stats["nodding_count"] += 1
                 
-                # 🆕 DB 저장 (10초마다)
-                now_ts = time.time()
-                if now_ts - last_log_time >= LOG_INTERVAL:
-                    log_data = {
-                        "perclos": fused["perclos"],
-                        "yawn_rate": fused["yawn_rate_min"],
-                        "posture": fused["posture_angle_norm"],
-                        "headpose": fused["headpose_var"],
-                        "fatigue": indices["fatigue"],
-                        "stress": indices["stress"],
-                        "blink": events.get("blink", False),
-                        "yawn": events.get("yawn", False),
-                        "nodding": events.get("nodding", False)
-                    }
-                    # 비동기로 DB 저장 (서버 멈춤 방지)
-                    loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(None, repo.save, log_data)
-                    last_log_time = now_ts
+                # 🆕 DB 저장: 프레임마다 구간 누적, LOG_INTERVAL마다 요약 1행
+                q = feats.get("quality", {})
+                interval_acc.add(ts_ms, {
+                    "perclos": fused["perclos"],
+                    "yawn_rate": fused["yawn_rate_min"],
+                    "posture": fused["posture_angle_norm"],
+                    "headpose": fused["headpose_var"],
+                    "fatigue": indices["fatigue"],
+                    "stress": indices["stress"],
+                }, events,
+                    valid=lm.get("face_landmarks") is not None and q.get("occlusion", 1.0) < 1.0,
+                    lighting_ok=q.get("lighting_quality") in ("good", "bright"))
+                anomalies_out = []
+                if interval_acc.due(ts_ms):
+                    anomalies_out = submit_interval(sess, interval_acc.flush(ts_ms))
                 
                 # 🆕 히스토리 저장 (최근 100개만)
                 cumulative_stats["fatigue_history"].append(indices["fatigue"])
@@ -362,6 +693,8 @@ async def ws_stream(ws: WebSocket):
                 }
                 indices = {"fatigue": 0.0, "stress": 0.0}
                 events_out = {"blink":0, "yawn":0, "nodding":0}
+                anomalies_out = []
+                horizons = {}
 
             # FPS
             tbuf.append(time.time())
@@ -384,9 +717,11 @@ async def ws_stream(ws: WebSocket):
 
             payload = {
                 "ts": datetime.now(timezone.utc).isoformat(),
+                "session_id": session_id,
                 "features": {
                     "perclos": fused["perclos"],
                     "yawn_rate_min": fused["yawn_rate_min"],
+                    "nodding_rate_min": fused["nodding_rate_min"],
                     "posture_angle_norm": fused["posture_angle_norm"],
                     "headpose_var": fused["headpose_var"],
                     "gaze_on_pct": fused["gaze_on_pct"],
@@ -394,7 +729,10 @@ async def ws_stream(ws: WebSocket):
                     "near_work": fused["near_work"]
                 },
                 "indices": indices,
+                "alerts": {k: get_engine().alert_level(v) for k, v in indices.items()},
                 "events": events_out,
+                "anomalies": anomalies_out,  # 🆕 개인 기준선 대비 이상치 (구간 저장 시점에만)
+                "horizons": horizons,  # 🆕 다중 해상도 윈도우 (10s/1m/5m/1h)
                 "quality": feats.get("quality", {"lighting":0.0,"fps":0.0,"occlusion":0.0}),
                 "frame_b64": frame_b64,
                 "detect_enabled": detect_enabled,
@@ -420,10 +758,10 @@ async def ws_stream(ws: WebSocket):
 
             await asyncio.sleep(0.01)
     finally:
-        try: fm.close()
-        except: pass
-        try: cam.close()
-        except: pass
+        if cal.profile_due(time.time(), 0):
+            await save_calibration(store, profile_key, cal.to_profile())
+        # 카메라/FaceMesh는 닫지 않고 유예 기간 동안 유지 (reaper가 정리)
+        SESSIONS.detach(session_id, generation)
 
 @app.post("/report")
 async def report(request: Request):
@@ -447,17 +785,16 @@ async def report(request: Request):
         except Exception:
             payload = {}
 
+        resp = _unknown_user(payload.get("user"))
+        if resp is not None:
+            return resp
         stats = payload.get("stats") or {}
         docs  = payload.get("docs")  or []
 
         # 🆕 트렌드 분석 추가
         try:
-            # 1. DB에서 최근 12시간 데이터 가져오기
-            history = await asyncio.to_thread(repo.get_data_for_analysis, hours=12)
-            
-            # 2. 분석기 실행
-            analyzer = GraphAnalyzer()
-            trend_text = analyzer.analyze(history, trend_window_min=10)  # 최근 10분 트렌드
+            # 1~2. 스케줄러가 미리 계산해 둔 트렌드 요약 (커밋 시 증분 갱신, 없으면 즉시 계산)
+            trend_text = await trend_context(payload.get("user"))
             
             # 3. stats에 결과 주입 (LLM이 볼 수 있게)
             stats['trend_summary'] = trend_text
@@ -487,6 +824,9 @@ async def chat(request: Request):
     await asyncio.sleep(0.15)
     try:
         payload = await request.json()
+        resp = _unknown_user(payload.get("user"))
+        if resp is not None:
+            return resp
         
         stats = payload.get("stats") or {}
         docs = payload.get("docs") or []
@@ -495,12 +835,8 @@ async def chat(request: Request):
         
         # 🆕 트렌드 분석 추가
         try:
-            # 1. DB에서 최근 12시간 데이터 가져오기
-            history = await asyncio.to_thread(repo.get_data_for_analysis, hours=12)
-            
-            # 2. 분석기 실행
-            analyzer = GraphAnalyzer()
-            trend_text = analyzer.analyze(history, trend_window_min=10)  # 최근 10분 트렌드
+            # 1~2. 스케줄러가 미리 계산해 둔 트렌드 요약 (커밋 시 증분 갱신, 없으면 즉시 계산)
+            trend_text = await trend_context(payload.get("user"))
             
             # 3. stats에 결과 주입 (LLM이 볼 수 있게)
             stats['trend_summary'] = trend_text
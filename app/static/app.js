@@ -52,6 +52,17 @@ let historyData = {
     timestamps: []
 };
 
+// 서버 히스토리 (/history - LTTB 다운샘플, DB에 저장되는 지표만)
+const HISTORY_METRICS = {
+    'chart-perclos': 'perclos',
+    'chart-headpose': 'headpose_var',
+    'chart-fatigue': 'fatigue',
+    'chart-stress': 'stress',
+    'chart-yawn-rate': 'yawn_rate'
+};
+const HISTORY_RANGES = [1, 6, 24, 168];   // 시간 (차트 라벨 클릭 시 순환)
+let historyHours = 24;
+
 // 대화 히스토리
 let conversationHistory = [];
 
@@ -68,7 +79,9 @@ function fmt(v, digits=2){
 
 // === WebSocket 연결 ===
 function openWS(){
-    ws = new WebSocket(`ws://${location.host}/ws`);
+    // 세션 id 유지 → 새로고침/재연결 시 서버측 누적 상태 복원
+    const sid = sessionStorage.getItem('medi_sid');
+    ws = new WebSocket(`ws://${location.host}/ws` + (sid ? `?sid=${encodeURIComponent(sid)}` : ''));
     ws.onopen = () => { console.log('WS 연결됨'); };
     ws.onclose = () => { console.log('WS 종료'); setTimeout(openWS, 1500); };
     ws.onerror = (e) => { console.warn('WS 에러', e); };
@@ -76,12 +89,19 @@ function openWS(){
     ws.onmessage = (ev) => {
         try {
             const msg = JSON.parse(ev.data);
+            if (msg.session_id) sessionStorage.setItem('medi_sid', msg.session_id);
+            if (msg.type === 'hello') return;   // 세션 id 확정 알림 (지표 없음)
             
             // 데이터 저장
             latestFeatures = msg.features || {};
             latestIndices = msg.indices || {};
             cumulativeStats = msg.cumulative || {};
 
+            // 개인 기준선 대비 이상치 (서버가 구간 저장 시점에 판정)
+            if (msg.anomalies && msg.anomalies.length) {
+                notifyAnomalies(msg.anomalies);
+            }
+
             // 히스토리 데이터 저장 (최근 100개)
             if (msg.features && msg.indices) {
                 historyData.perclos.push(latestFeatures.perclos || 0);
@@ -115,6 +135,23 @@ function openWS(){
     };
 }
 
+// === 이상치 알림 ===
+const ANOMALY_LABELS = { fatigue: '피로도', stress: '스트레스' };
+
+function notifyAnomalies(list) {
+    list.forEach(a => {
+        const name = ANOMALY_LABELS[a.metric] || a.metric;
+        const body = `${name} ${fmt(a.value, 1)} (평소 이 시간대 ${fmt(a.median, 1)}, z=${fmt(a.z, 1)})`;
+        console.warn('⚠️ 이상치:', a);
+        if ("Notification" in window && Notification.permission === "granted") {
+            new Notification(a.severity === 'high' ? "🚨 평소와 크게 달라요" : "⚠️ 평소와 달라요", {
+                body,
+                icon: "/static/user_icon_placeholder.png"
+            });
+        }
+    });
+}
+
 // === Dashboard UI 업데이트 ===
 function updateDashboardUI(msg) {
     const features = msg.features || {};
@@ -403,6 +440,9 @@ function createStatsCharts() {
     createChart('chart-yawn-rate', chartConfig('하품/분', historyData.yawnRate, '#FFD700'));
     createChart('chart-gaze', chartConfig('시선온', historyData.gaze, '#90EE90', 1));
     createChart('chart-near', chartConfig('근거리작업', historyData.near, '#DDA0DD'));
+
+    // DB 지표는 서버 히스토리로 교체 (실패 시 WS 최근 50개 유지)
+    loadHistory().catch(err => console.warn('히스토리 조회 실패', err));
     
     // 누적 카운트 표시 (숫자로)
     if (cumulativeStats) {
@@ -429,6 +469,47 @@ function createStatsCharts() {
     }
 }
 
+// === 서버 히스토리 ===
+function historyLabel(hours) {
+    return hours >= 24 && hours % 24 === 0 ? `최근 ${hours / 24}일` : `최근 ${hours}시간`;
+}
+
+async function loadHistory(hours = historyHours) {
+    const ids = Object.keys(HISTORY_METRICS).filter(id => statsCharts[id]);
+    if (ids.length === 0) return;
+    // 차트 폭(px)만큼만 요청 → 범위와 무관하게 응답 크기 일정 (재요청은 ETag로 304)
+    const width = document.getElementById(ids[0])?.offsetWidth || 300;
+    const points = Math.max(50, Math.min(1000, Math.round(width)));
+    const metrics = ids.map(id => HISTORY_METRICS[id]).join(',');
+    const res = await fetch(`/history?metrics=${metrics}&hours=${hours}&points=${points}`);
+    if (!res.ok) throw new Error(`요청 실패 (${res.status})`);
+    const data = await res.json();
+
+    ids.forEach(id => {
+        const chart = statsCharts[id];
+        const s = data.series[HISTORY_METRICS[id]];
+        if (!chart || !s || s.t.length === 0) return;
+        chart.data.labels = s.t.map(t => new Date(t).toLocaleString([], {
+            month: 'numeric', day: 'numeric', hour: '2-digit', minute: '2-digit'
+        }));
+        chart.data.datasets[0].data = s.v;
+        chart.update('none');
+        const label = document.getElementById(id)?.parentElement?.querySelector('.label-time');
+        if (label) label.textContent = historyLabel(hours);
+    });
+}
+
+// 라벨 클릭 → 조회 범위 변경 (1시간 → 6시간 → 1일 → 7일)
+Object.keys(HISTORY_METRICS).forEach(id => {
+    const label = document.getElementById(id)?.parentElement?.querySelector('.label-time');
+    if (!label) return;
+    label.style.cursor = 'pointer';
+    label.addEventListener('click', () => {
+        historyHours = HISTORY_RANGES[(HISTORY_RANGES.indexOf(historyHours) + 1) % HISTORY_RANGES.length];
+        loadHistory().catch(err => console.warn('히스토리 조회 실패', err));
+    });
+});
+
 // === 대화 기능 ===
 function addMessage(role, content) {
     const messagesDiv = document.getElementById('chatMessages');
@@ -0,0 +1,205 @@
+# core/anomaly.py
+# 개인 기준선 대비 이상치 검출 (모델 호출 없음, 10초 구간 집계마다 갱신)
+#   robust z = 0.6745 · (x - median) / MAD   (Iglewicz-Hoaglin, |z| ≥ 3.5 이상치)
+#   기준선: 사용자별 · 로컬 시(0~23)별 최근 값 (표본이 적은 시간대는 사용자 전체 기준선으로 대체)
+import logging, threading, time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import numpy as np
+
+from core.trend_analysis import GraphAnalyzer
+from db.tenants import DEFAULT_USER
+
+class _Baseline:
+    """지표 1개의 시간대별/전체 최근 값 (deque → 조회 시 median/MAD)"""
+    def __init__(self, per_hour: int, overall: int):
+        self.hours = [deque(maxlen=per_hour) for _ in range(24)]
+        self.all = deque(maxlen=overall)
+
+    def add(self, hour: int, x: float):
+        self.hours[hour].append(x)
+        self.all.append(x)
+
+    def pool(self, hour: int, min_samples: int):
+        """(값 목록, "hour"|"all"), 표본 부족이면 (None, None)"""
+        if len(self.hours[hour]) >= min_samples:
+            return self.hours[hour], "hour"
+        if len(self.all) >= min_samples:
+            return self.all, "all"
+        return None, None
+
+class AnomalyDetector:
+    """
+    사용자별 이상치 검출기.
+      - warm(): 최근 baseline_days일 로그로 기준선 채움 (세션 시작 시 스레드에서)
+      - update(): 구간 집계 행 1개를 점수화 → 이벤트 목록 반환 후 기준선에 추가
+        (점수 먼저 → 자기 자신이 기준선에 섞이지 않음)
+      - 같은 지표·방향은 cooldown_sec 동안 한 번만 이벤트 (지속되는 이상 상태가 매 구간 알림이 되지 않도록)
+      - 사용자 상태는 max_users명까지 LRU 유지 (1명 최대 수 MB). 밀려난 사용자가 다시 update()되면
+        백그라운드 스레드에서 warm()으로 기준선 재구성 (그 사이 값은 병합)
+    """
+    def __init__(self, tenants, metrics=("fatigue", "stress"), threshold: float = 3.5, high_threshold: float = 5.0,
+                 baseline_days: float = 7, per_hour: int = 2000, min_samples: int = 60, mad_floor: float = 1.0,
+                 cooldown_sec: float = 300, upper_only: bool = True, max_users: int = 64):
+        self.tenants = tenants
+        self.metrics = tuple(metrics)
+        self.threshold = threshold
+        self.high_threshold = high_threshold
+        self.baseline_days = baseline_days
+        self.per_hour = per_hour
+        self.min_samples = min_samples
+        self.mad_floor = mad_floor
+        self.cooldown_ms = int(cooldown_sec * 1000)
+        self.upper_only = upper_only
+        self.max_users = max_users
+        # user_key → {"baselines": {metric: _Baseline}, "last_event": {(metric, dir): ts_ms}} (LRU)
+        self._users = OrderedDict()
+        self._warming = set()   # 백그라운드 warm 진행 중인 사용자
+        self._lock = threading.Lock()
+        self.stats = {"scored": 0, "events": 0, "suppressed": 0, "warmed_rows": 0, "evicted": 0}
+
+    def _new_state(self):
+        return {
+            "baselines": {m: _Baseline(self.per_hour, self.per_hour * 4) for m in self.metrics},
+            "last_event": {},
+        }
+
+    def _put(self, user_key, st):
+        """상태 등록 + LRU 초과분 제거. _lock 보유 상태에서 호출."""
+        self._users[user_key] = st
+        self._users.move_to_end(user_key)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+            self.stats["evicted"] += 1
+        return st
+
+    def _state(self, user_key):
+        """상태 조회 (LRU 갱신), 없으면 빈 상태를 만들고 백그라운드 warm 시작. _lock 보유 상태에서 호출."""
+        st = self._users.get(user_key)
+        if st is not None:
+            self._users.move_to_end(user_key)
+            return st
+        if user_key not in self._warming:
+            self._warming.add(user_key)
+            threading.Thread(target=self._rewarm, args=(user_key,), daemon=True).start()
+        return self._put(user_key, self._new_state())
+
+    def _rewarm(self, user_key):
+        try:
+            self.warm(user_key)
+        except Exception as e:
+            logging.error(f"Anomaly baseline warm failed ({user_key}): {e}")
+        finally:
+            with self._lock:
+                self._warming.discard(user_key)
+
+    def warm(self, user_key: str = None, force: bool = False) -> int:
+        """
+        DB의 최근 로그로 기준선 구성 (이미 있으면 건너뜀, 재구성 대기 중인 상태는 제외). 채운 행 수 반환.
+        DB 조회 → 스레드에서 호출. 조회 중 update()가 먼저 상태를 만들었으면 지우지 않고 병합:
+        DB 값(과거) 뒤에 메모리 값(최근), cooldown 기록은 유지. force=True면 메모리 값은 버리고 DB로 재구성.
+        """
+        user_key = user_key or DEFAULT_USER
+        with self._lock:
+            if user_key in self._users and user_key not in self._warming and not force:
+                return 0
+        cols = self.tenants.scope(user_key).get_arrays(hours=self.baseline_days * 24, metrics=self.metrics)
+        hours = GraphAnalyzer._local_hour(cols["ts_ms"]) if len(cols["ts_ms"]) else np.zeros(0, dtype=np.int64)
+        # 락 밖에서 새 객체에 구성
+        warmed = self._new_state()
+        for m in self.metrics:
+            v = cols[m].astype(np.float64)
+            ok = ~np.isnan(v)
+            b = warmed["baselines"][m]
+            h, v = hours[ok], v[ok]
+            b.all.extend(v[-b.all.maxlen:].tolist())
+            for hr in np.unique(h).tolist():
+                b.hours[hr].extend(v[h == hr][-self.per_hour:].tolist())
+        with self._lock:
+            live = self._users.get(user_key)
+            if live is not None:
+                if not force:
+                    # 조회 전에 로그가 이미 저장됐다면 DB와 메모리에 같은 구간이 둘 다 있을 수 있음 (최대 수 구간, 기준선 영향 미미)
+                    for m, b in warmed["baselines"].items():
+                        cur = live["baselines"][m]
+                        b.all.extend(cur.all)
+                        for d, c in zip(b.hours, cur.hours):
+                            d.extend(c)
+                warmed["last_event"] = live["last_event"]
+            self._put(user_key, warmed)
+            self.stats["warmed_rows"] += len(cols["ts_ms"])
+        return len(cols["ts_ms"])
+
+    def update(self, user_key: str, row: dict) -> list:
+        """
+        구간 집계 행(IntervalAccumulator.flush 결과)을 점수화.
+        Returns: [{ts_ms, metric, value, median, mad, z, direction, severity, baseline, hour, n}]
+        """
+        user_key = user_key or DEFAULT_USER
+        ts_ms = int(row.get("ts_ms") or time.time() * 1000)
+        hour = datetime.fromtimestamp(ts_ms / 1000).hour
+        events = []
+        with self._lock:
+            st = self._state(user_key)
+            for m in self.metrics:
+                x = row.get(m)
+                if x is None or x != x:
+                    continue
+                b = st["baselines"][m]
+                pool, kind = b.pool(hour, self.min_samples)
+                if pool is not None:
+                    self.stats["scored"] += 1
+                    ev = self._score(m, float(x), np.fromiter(pool, dtype=np.float64, count=len(pool)), kind)
+                    if ev is not None:
+                        key = (m, ev["direction"])
+                        last = st["last_event"].get(key)
+                        if last is not None and ts_ms - last < self.cooldown_ms:
+                            self.stats["suppressed"] += 1
+                        else:
+                            st["last_event"][key] = ts_ms
+                            ev.update(ts_ms=ts_ms, hour=hour)
+                            events.append(ev)
+                b.add(hour, float(x))
+            self.stats["events"] += len(events)
+        return events
+
+    def _score(self, metric, x, values, kind):
+        med = float(np.median(values))
+        mad = max(float(np.median(np.abs(values - med))), self.mad_floor)
+        z = 0.6745 * (x - med) / mad
+        if abs(z) < self.threshold or (self.upper_only and z < 0):
+            return None
+        return {
+            "metric": metric, "value": round(x, 2), "median": round(med, 2), "mad": round(mad, 2),
+            "z": round(z, 2), "direction": "up" if z > 0 else "down",
+            "severity": "high" if abs(z) >= self.high_threshold else "warn",
+            "baseline": kind, "n": len(values),
+        }
+
+    def baseline(self, user_key: str = None) -> dict:
+        """/anomalies 응답용: 지표별 시간대 median/MAD(판정에 쓰는 mad_floor 적용 값)/mad_raw/표본 수"""
+        with self._lock:
+            st = self._users.get(user_key or DEFAULT_USER)
+            if st is None:
+                return {}
+            out = {}
+            for m, b in st["baselines"].items():
+                rows = []
+                for hr, d in enumerate(b.hours):
+                    if d:
+                        v = np.fromiter(d, dtype=np.float64, count=len(d))
+                        med = float(np.median(v))
+                        mad = float(np.median(np.abs(v - med)))
+                        rows.append({"hour": hr, "n": len(d), "median": round(med, 2),
+                                     "mad": round(max(mad, self.mad_floor), 2), "mad_raw": round(mad, 2)})
+                out[m] = rows
+            return out
+
+    def forget(self, user_key: str = None):
+        with self._lock:
+            self._users.pop(user_key or DEFAULT_USER, None)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {**self.stats, "users": len(self._users)}
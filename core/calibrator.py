@@ -8,6 +8,7 @@ class Calibrator:
       - 워밍업 수집 → baseline 추정
       - 운영 중 품질 양호 프레임에서만 천천히 EWMA 업데이트
       - 눈(EAR) 히스테리시스, 하품(MAR) 임계 제공
+      - 저장된 프로필(load_profile)이 있으면 워밍업 생략 후 EWMA로 계속 보정
     """
     def __init__(
         self,
@@ -32,6 +33,10 @@ class Calibrator:
         self.mar_median = 0.20
         self.mar_mad = 0.03
 
+        # 프로필 저장 디바운스용
+        self._dirty = False
+        self._last_saved = 0.0
+
     def _good_quality(self, q: dict) -> bool:
         if not q: return False
         return (q.get("fps", 0) >= 20) and (q.get("occlusion", 1.0) <= 0.2) and (q.get("lighting", 0) >= 0.4)
@@ -56,6 +61,7 @@ class Calibrator:
                 mad = stats.median([abs(x-med) for x in self.mar_vals]) if self.mar_vals else 0.03
                 self.mar_median, self.mar_mad = med, max(mad, 1e-3)
                 self.ready = True
+                self._dirty = True
             return
 
         # 운영 중: 좋은 품질 프레임에서만 느리게 EWMA
@@ -66,6 +72,30 @@ class Calibrator:
             med = self.mar_median
             if abs(mar - med) < 0.2:
                 self.mar_median = 0.9 * self.mar_median + 0.1 * float(mar)
+            self._dirty = True
+
+    # ---- 프로필 (DB 저장/복원) ----
+    def to_profile(self) -> dict:
+        return {"ear_mu": self.ear_mu, "mar_median": self.mar_median, "mar_mad": self.mar_mad}
+
+    def load_profile(self, profile: dict):
+        """저장된 기준선 적용 → 즉시 ready (이후 EWMA로 계속 갱신)"""
+        if not profile:
+            return False
+        self.ear_mu = max(0.15, min(0.45, float(profile.get("ear_mu", self.ear_mu))))
+        self.mar_median = float(profile.get("mar_median", self.mar_median))
+        self.mar_mad = max(float(profile.get("mar_mad", self.mar_mad)), 1e-3)
+        self.ready = True
+        self._dirty = False
+        return True
+
+    def profile_due(self, now: float, min_interval: float = 30.0) -> bool:
+        """변경분이 있고 마지막 저장 후 min_interval초 지났으면 True (호출 시 저장한 것으로 간주)"""
+        if not (self.ready and self._dirty) or now - self._last_saved < min_interval:
+            return False
+        self._dirty = False
+        self._last_saved = now
+        return True
 
     @property
     def th_close(self) -> float:
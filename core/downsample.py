@@ -0,0 +1,49 @@
+# core/downsample.py
+# 차트용 시계열 다운샘플링 - Largest-Triangle-Three-Buckets (Steinarss, 2013)
+#  - 첫/마지막 점 고정, 나머지를 n-2개 버킷으로 나눠 버킷마다 1점 선택
+#  - 선택 기준: (직전 선택점, 후보, 다음 버킷 평균점) 삼각형 면적이 최대인 점 → 피크/급변 모양 유지
+import numpy as np
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    선택된 점의 인덱스 (오름차순). x는 오름차순, NaN 없는 1차원 배열.
+    n_out >= len(x) 또는 n_out < 3이면 전체 인덱스.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]                      # epoch ms 그대로 곱하면 면적 계산 정밀도 손실
+    y = np.asarray(y, dtype=np.float64)
+
+    # 버킷 경계 [1, n-1)을 n_out-2등분 + 버킷별 평균은 누적합으로 한 번에
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    # 버킷 i의 "다음 버킷" 평균 (마지막 버킷은 끝점)
+    nxt_lo, nxt_hi = edges[1:], np.append(edges[2:], n)
+    cnt = nxt_hi - nxt_lo
+    avg_x = (cx[nxt_hi] - cx[nxt_lo]) / cnt
+    avg_y = (cy[nxt_hi] - cy[nxt_lo]) / cnt
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def lttb(ts, values, n_out: int):
+    """(ts, values) → 다운샘플된 (ts, values). NaN(결측) 점은 먼저 제외."""
+    ts = np.asarray(ts)
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values)
+    if not ok.all():
+        ts, values = ts[ok], values[ok]
+    idx = lttb_indices(ts, values, n_out)
+    return ts[idx], values[idx]
@@ -1,13 +1,167 @@
 
 from collections import deque
-import time
+import math, time
+import numpy as np
+
+from config.constants import NODDING_PITCH_THRESHOLD, NODDING_FREQ_MIN, NODDING_FREQ_MAX
+
+class BlinkIntervalStats:
+    """
+    깜빡임 간격(IBI) 스트리밍 통계 - 이벤트당 O(1) (horizon 수 고정).
+      - horizon별 deque + 누적 합/제곱합 → 평균, 표준편차, 변동계수(CV)
+      - 중앙값: 로그 간격 히스토그램 스케치 (bin 수 고정, 만료 시 차감 가능)
+      - max_interval_ms 초과 간격(얼굴 이탈 등)은 통계에서 제외
+    """
+    MIN_MS = 50.0
+    N_BINS = 48
+    BIN_RATIO = 1.15   # 50ms * 1.15^48 ≈ 40s
+
+    def __init__(self, horizons: dict = None, max_interval_ms: float = 20000.0):
+        self.horizons = dict(horizons or {"1m": 60, "5m": 300})
+        self.max_interval_ms = max_interval_ms
+        self._last_ts = None
+        self._log_ratio = math.log(self.BIN_RATIO)
+        self._q = {h: deque() for h in self.horizons}          # (ts, interval, bin)
+        self._sum = {h: 0.0 for h in self.horizons}
+        self._sq = {h: 0.0 for h in self.horizons}
+        self._hist = {h: [0] * self.N_BINS for h in self.horizons}
+
+    def _bin(self, iv):
+        b = int(math.log(max(iv, self.MIN_MS) / self.MIN_MS) / self._log_ratio)
+        return min(self.N_BINS - 1, b)
+
+    def add(self, ts_ms: float):
+        """깜빡임 1회 (ts_ms) 기록"""
+        last, self._last_ts = self._last_ts, ts_ms
+        if last is None:
+            return
+        iv = ts_ms - last
+        if iv <= 0 or iv > self.max_interval_ms:
+            return
+        b = self._bin(iv)
+        for h in self.horizons:
+            self._q[h].append((ts_ms, iv, b))
+            self._sum[h] += iv
+            self._sq[h] += iv * iv
+            self._hist[h][b] += 1
+        self._evict(ts_ms)
+
+    def _evict(self, now_ms):
+        for h, span in self.horizons.items():
+            q = self._q[h]
+            while q and now_ms - q[0][0] > span * 1000:
+                _, iv, b = q.popleft()
+                self._sum[h] -= iv
+                self._sq[h] -= iv * iv
+                self._hist[h][b] -= 1
+
+    def _median(self, h):
+        n = len(self._q[h])
+        acc = 0
+        for b, c in enumerate(self._hist[h]):
+            acc += c
+            if acc * 2 >= n:
+                # bin 기하 중심
+                return self.MIN_MS * self.BIN_RATIO ** (b + 0.5)
+        return None
+
+    def stats(self, horizon: str, now_ms: float = None) -> dict:
+        """{count, mean_ms, std_ms, cv, median_ms} (간격 2개 미만이면 count만)"""
+        if now_ms is not None:
+            self._evict(now_ms)
+        n = len(self._q[horizon])
+        if n < 2:
+            return {"count": n}
+        mean = self._sum[horizon] / n
+        var = max(0.0, self._sq[horizon] / n - mean * mean)
+        std = math.sqrt(var)
+        return {
+            "count": n,
+            "mean_ms": mean,
+            "std_ms": std,
+            "cv": std / mean if mean > 0 else 0.0,
+            "median_ms": self._median(horizon),
+        }
+
+    def cv(self, horizon: str = "1m", now_ms: float = None, default: float = 0.2, min_count: int = 3) -> float:
+        """blink_var 용 변동계수 (표본 부족 시 default)"""
+        st = self.stats(horizon, now_ms)
+        return st["cv"] if st["count"] >= min_count else default
+
+    def snapshot(self, now_ms: float = None) -> dict:
+        return {h: self.stats(h, now_ms) for h in self.horizons}
+
+class NodDetector:
+    """
+    끄덕임 검출 - pitch 신호 대역통과(0.5~2Hz) + 진폭 게이팅, 프레임당 O(1).
+      - 1차 HP(f_min) → 1차 LP(f_max) 재귀 필터, 계수는 실제 dt(캡처 타임스탬프)로 계산 → 가변 fps 대응
+      - 영점 교차마다 반주기(극값, 길이) 기록
+      - 연속 두 반주기가 대역 내 길이 + peak-to-peak ≥ amp_deg 이면 1회
+    """
+    def __init__(self, amp_deg=NODDING_PITCH_THRESHOLD, f_min=NODDING_FREQ_MIN, f_max=NODDING_FREQ_MAX,
+                 max_gap_ms=500.0):
+        self.amp_deg = amp_deg
+        self.tau_hp = 1.0 / (2 * math.pi * f_min)
+        self.tau_lp = 1.0 / (2 * math.pi * f_max)
+        self.half_min_ms = 1000.0 / (2 * f_max)
+        self.half_max_ms = 1000.0 / (2 * f_min)
+        self.max_gap_ms = max_gap_ms
+        self.reset()
+
+    def reset(self):
+        self._ts = None
+        self._base = None      # HP용 느린 기준선
+        self._band = 0.0       # 대역통과 출력
+        self._sign = 0
+        self._cross_ts = None  # 직전 영점 교차 시각
+        self._ext = 0.0        # 현재 반주기 극값
+        self._prev_half = None # (극값, 길이 ms)
+
+    def update(self, pitch: float, ts_ms: float) -> int:
+        if self._ts is None or ts_ms - self._ts > self.max_gap_ms:
+            # 시작/긴 공백(얼굴 이탈 등): 필터 재초기화
+            self.reset()
+            self._ts = ts_ms
+            self._base = pitch
+            return 0
+        if ts_ms <= self._ts:
+            return 0
+
+        dt = (ts_ms - self._ts) / 1000.0
+        self._ts = ts_ms
+        a_hp = 1.0 - math.exp(-dt / self.tau_hp)
+        a_lp = 1.0 - math.exp(-dt / self.tau_lp)
+        self._base += a_hp * (pitch - self._base)
+        self._band += a_lp * ((pitch - self._base) - self._band)
+
+        x = self._band
+        sign = 1 if x > 0 else (-1 if x < 0 else 0)
+        nod = 0
+        if sign != 0 and sign != self._sign:
+            if self._sign != 0 and self._cross_ts is not None:
+                half = (self._ext, ts_ms - self._cross_ts)
+                prev = self._prev_half
+                if (prev is not None
+                        and self.half_min_ms <= prev[1] <= self.half_max_ms
+                        and self.half_min_ms <= half[1] <= self.half_max_ms
+                        and abs(half[0] - prev[0]) >= self.amp_deg):
+                    nod = 1
+                    self._prev_half = None   # 다음 1회는 새 반주기 2개 필요
+                else:
+                    self._prev_half = half
+            self._cross_ts = ts_ms
+            self._sign = sign
+            self._ext = x
+        elif sign != 0 and abs(x) > abs(self._ext):
+            self._ext = x
+        return nod
 
 class EventState:
     """
     Blink / Yawn / Nodding 이벤트를 히스테리시스로 검출.
     - blink: EAR < th_close 지속 후 th_open 회복 시 1회
     - yawn : MAR > th_yawn 최소 ms 지속 시 1회
-    - nod  : pitch 주기 분석 대신 간단 지속 카운트(후속 개선)
+    - nod  : pitch 0.5~2Hz 대역통과 + 진폭 게이팅 (NodDetector)
     """
     def __init__(self, fps=30, th_close=0.21, th_open=0.25, th_yawn=0.60, yawn_min_ms=800):
         self.fps = fps
@@ -22,10 +176,11 @@ class EventState:
         self._yawn_on = False
         self._yawn_start = 0.0
 
-        self._blink_times = deque(maxlen=120)  # 최근 2분
+        self.blink_stats = BlinkIntervalStats()  # 깜빡임 간격 변이 (blink_var)
+        self.nod_detector = NodDetector()
 
-    def update(self, feats):
-        now = time.time()*1000.0
+    def update(self, feats, ts_ms: float = None):
+        now = time.time()*1000.0 if ts_ms is None else float(ts_ms)
         ear = feats.get("ear", 0.3)
         mar = feats.get("mar", 0.2)
 
@@ -36,7 +191,7 @@ class EventState:
         elif self._eye_closed and ear > self.th_open:
             self._eye_closed = False
             blink = 1
-            self._blink_times.append(now)
+            self.blink_stats.add(now)
 
         yawn = 0
         if not self._yawn_on and mar > self.th_yawn:
@@ -48,8 +203,51 @@ class EventState:
             if dur >= self.yawn_min_ms:
                 yawn = 1
 
-        # nodding은 후속 개선. 일단 0
-        nod = 0
+        # nodding: head_pose pitch(도) 대역통과 검출
+        pitch = (feats.get("head_pose") or {}).get("pitch")
+        nod = self.nod_detector.update(pitch, now) if pitch is not None else 0
 
         # 분당 깜빡임/하품 비율 계산은 window에서 처리
         return {"blink": blink, "yawn": yawn, "nodding": nod}
+
+def detect_events_batch(ts_ms, ear, mar, th_close=0.21, th_open=0.25, th_yawn=0.60, yawn_min_ms=800):
+    """
+    EventState.update()의 blink/yawn 판정을 배열 단위로 벡터화 (오프라인/재생 데이터용).
+    임계값은 스칼라 또는 샘플별 배열(캘리브레이터 값) 모두 가능. th_open > th_close 가정.
+    초기 상태(눈 뜸, 하품 아님)와 히스테리시스 규칙은 스트리밍 버전과 동일.
+
+    Returns: {"blink": 이벤트 샘플 인덱스, "yawn": 이벤트 샘플 인덱스}
+    """
+    ts = np.asarray(ts_ms, dtype=np.float64)
+    ear = np.asarray(ear, dtype=np.float64)
+    mar = np.asarray(mar, dtype=np.float64)
+    n = len(ts)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {"blink": empty, "yawn": empty}
+    th_close = np.broadcast_to(np.asarray(th_close, dtype=np.float64), (n,))
+    th_open = np.broadcast_to(np.asarray(th_open, dtype=np.float64), (n,))
+    th_yawn = np.broadcast_to(np.asarray(th_yawn, dtype=np.float64), (n,))
+
+    # --- blink: +1(감김 진입 조건) / -1(회복 조건) 마커의 직전 상태 forward-fill ---
+    marker = np.where(ear < th_close, 1, np.where(ear > th_open, -1, 0)).astype(np.int8)
+    idx = np.where(marker != 0, np.arange(n), -1)
+    last = np.maximum.accumulate(idx)
+    state = np.where(last >= 0, marker[np.maximum(last, 0)], -1)   # 샘플 처리 후 상태 (1=감김)
+    prev_state = np.empty(n, dtype=state.dtype)
+    prev_state[0] = -1
+    prev_state[1:] = state[:-1]
+    blink_idx = np.flatnonzero((marker == -1) & (prev_state == 1))
+
+    # --- yawn: mar > th 구간의 시작/끝 쌍, 지속시간 ≥ yawn_min_ms ---
+    on = mar > th_yawn
+    prev_on = np.empty(n, dtype=bool)
+    prev_on[0] = False
+    prev_on[1:] = on[:-1]
+    starts = np.flatnonzero(on & ~prev_on)
+    ends = np.flatnonzero(~on & prev_on)
+    dur = ts[ends] - ts[starts[:len(ends)]]
+    yawn_idx = ends[dur >= yawn_min_ms]
+
+    return {"blink": blink_idx, "yawn": yawn_idx}
+
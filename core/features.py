@@ -344,7 +344,7 @@ def compute_all(frame_bgr, lm_dict, use_pnp=False, use_brightness=False):
         "distance_cm": distance_cm,
         "near_work": near_work,
         "facial_tension": 0.5,      # TODO: 미세변동 기반 추정
-        "blink_var": 0.2,           # TODO: 간격 변이
+        "blink_var": 0.2,           # 이벤트(EventState.blink_stats)에서 대체
         "quality": quality,
         # vis_test 추가 피처
         "head_pose": head_pose_dict,
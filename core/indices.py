@@ -1,37 +1,156 @@
 # core/indices.py
+import hashlib, logging, math, os, threading
+from pathlib import Path
+import numpy as np
+import yaml
+
+RULES_PATH = Path(__file__).parent.parent / "config" / "rules.yaml"
+
 def clamp01(x): 
     return max(0.0, min(1.0, float(x)))
 
+class ScoringEngine:
+    """
+    rules.yaml → 컴파일된 규칙 점수기.
+      - features: 정규화 벡터 (scale, offset, lo, hi), 기본값 벡터
+      - weights : (피처 × 점수) 가중치 행렬
+      - score(dict)        : 프레임 1개 (파이썬 경로, 넘파이 호출 오버헤드 없음)
+      - score_matrix(X)    : (N, 피처) 배열 → (N, 점수) 한 번의 행렬곱
+    """
+    def __init__(self, rules: dict):
+        feats = rules.get("features") or {}
+        weights = rules.get("weights") or {}
+        self.version = rules.get("version", 1)
+        self.names = list(feats)                                   # 피처 별칭 (perclos, yawn, ...)
+        self.keys = [feats[n]["key"] for n in self.names]          # 입력 dict 키
+        self.score_names = list(weights)                           # fatigue, stress
+        for s, ws in weights.items():
+            unknown = set(ws) - set(self.names)
+            if unknown:
+                raise ValueError(f"rules.yaml weights.{s}: unknown features {sorted(unknown)}")
+
+        F, S = len(self.names), len(self.score_names)
+        self.defaults = np.array([float(feats[n].get("default", 0.0)) for n in self.names])
+        div = np.array([float(feats[n].get("div", 1.0)) for n in self.names])
+        inv = np.array([bool(feats[n].get("invert", False)) for n in self.names])
+        self.scale = np.where(inv, -1.0, 1.0) / div
+        self.offset = np.where(inv, 1.0, 0.0) / div
+        self.lo = np.array([_bound(feats[n].get("min"), -math.inf) for n in self.names])
+        self.hi = np.array([_bound(feats[n].get("max"), math.inf) for n in self.names])
+        self.W = np.zeros((F, S))
+        for j, s in enumerate(self.score_names):
+            for n, w in weights[s].items():
+                self.W[self.names.index(n), j] = float(w)
+
+        levels = rules.get("alert_levels") or {}
+        self.alert_levels = sorted(((float(v), k) for k, v in levels.items()), reverse=True)
+
+        # 점수에 영향을 주는 컴파일 결과의 해시 (version을 올리지 않은 규칙 변경 감지, db/backfill.py)
+        h = hashlib.sha1(repr((self.keys, self.score_names)).encode())
+        for arr in (self.defaults, self.scale, self.offset, self.lo, self.hi, self.W):
+            h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+        self.fingerprint = h.hexdigest()[:16]
+
+        # 프레임 경로용 파이썬 리스트 사본
+        self._rows = list(zip(self.keys, self.defaults.tolist(), self.scale.tolist(),
+                              self.offset.tolist(), self.lo.tolist(), self.hi.tolist()))
+        self._wcols = [self.W[:, j].tolist() for j in range(S)]
+
+    @classmethod
+    def from_yaml(cls, path=RULES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(yaml.safe_load(f) or {})
+
+    # ---- 프레임 1개 ----
+    def normalize(self, f: dict) -> list:
+        out = []
+        for key, d, sc, off, lo, hi in self._rows:
+            v = f.get(key, d)
+            v = sc * float(d if v is None else v) + off
+            out.append(lo if v < lo else hi if v > hi else v)
+        return out
+
+    def score(self, f: dict) -> dict:
+        x = self.normalize(f)
+        res = {}
+        for name, w in zip(self.score_names, self._wcols):
+            v = sum(wi * xi for wi, xi in zip(w, x) if wi)
+            res[name] = float(max(0.0, min(100.0, v)))
+        return res
+
+    # ---- 배열 (N, 피처) ----
+    def vectorize(self, rows) -> np.ndarray:
+        """dict 리스트 → 원시 피처 배열 (N, F), 누락값은 기본값"""
+        X = np.array([[r.get(k, d) for k, d in zip(self.keys, self.defaults)] for r in rows], dtype=np.float64)
+        return X.reshape(-1, len(self.keys))
+
+    def normalize_matrix(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        X = np.where(np.isnan(X), self.defaults, X)
+        return np.clip(X * self.scale + self.offset, self.lo, self.hi)
+
+    def score_matrix(self, X) -> np.ndarray:
+        """X: (N, F) 원시 피처 (열 순서 = self.keys) → (N, S) 점수 (열 순서 = self.score_names)"""
+        return np.clip(self.normalize_matrix(X) @ self.W, 0.0, 100.0)
+
+    def alert_level(self, value: float) -> str:
+        for th, name in self.alert_levels:
+            if value >= th:
+                return name
+        return "ok"
+
+def _bound(v, default):
+    return default if v is None else float(v)
+
+# ---- 전역 엔진 (시작 시 컴파일, reload_rules()로 교체) ----
+_ENGINE = None
+_ENGINE_MTIME = None
+_FAILED_MTIME = None      # 컴파일에 실패한 파일 mtime (같은 파일은 다시 시도하지 않음)
+_LAST_ERROR = None
+_LOCK = threading.Lock()
+
+def get_engine() -> ScoringEngine:
+    if _ENGINE is None:
+        reload_rules()
+    return _ENGINE
+
+def reload_rules(path=RULES_PATH) -> ScoringEngine:
+    """rules.yaml 재컴파일 후 원자적으로 교체 (실패 시 기존 엔진 유지, 오류는 rules_status()에 기록 후 전달)"""
+    global _ENGINE, _ENGINE_MTIME, _FAILED_MTIME, _LAST_ERROR
+    with _LOCK:
+        mtime = os.path.getmtime(path)
+        try:
+            engine = ScoringEngine.from_yaml(path)
+        except Exception as e:
+            _FAILED_MTIME, _LAST_ERROR = mtime, f"{type(e).__name__}: {e}"
+            raise
+        _ENGINE, _ENGINE_MTIME = engine, mtime
+        _FAILED_MTIME = _LAST_ERROR = None
+    return engine
+
+def reload_if_changed(path=RULES_PATH) -> bool:
+    """
+    파일 mtime이 바뀌었으면 재컴파일. 컴파일 실패는 로그 후 예외 전달 (스케줄러 작업의 last_error/failures),
+    실패한 mtime은 기록해 두고 파일이 다시 바뀔 때까지 재시도하지 않음.
+    """
+    mtime = os.path.getmtime(path)
+    if mtime in (_ENGINE_MTIME, _FAILED_MTIME):
+        return False
+    try:
+        reload_rules(path)
+    except Exception as e:
+        version = _ENGINE.version if _ENGINE is not None else None
+        logging.error(f"rules reload failed, keeping version {version}: {e}")
+        raise
+    return True
+
+def rules_status() -> dict:
+    """현재 적용 중인 규칙 버전 + 마지막 컴파일 오류 (없으면 None)"""
+    return {"version": _ENGINE.version if _ENGINE is not None else None,
+            "fingerprint": _ENGINE.fingerprint if _ENGINE is not None else None,
+            "mtime": _ENGINE_MTIME, "error": _LAST_ERROR, "failed_mtime": _FAILED_MTIME}
+
 def compute_from_features(f):
     # f: dict with keys like perclos, yawn_rate_min, posture_angle_norm, headpose_var, gaze_on_pct, near_work, facial_tension, blink_var
-    perclos   = clamp01(f.get("perclos", 0.0))            # 0~1
-    yawn      = max(0.0, f.get("yawn_rate_min", 0.0)/6)   # 분당 6회≈1.0
-    posture   = clamp01(f.get("posture_angle_norm", 0.0))
-    headvar   = clamp01(f.get("headpose_var", 0.0))
-    gaze_off  = clamp01(1.0 - f.get("gaze_on_pct", 0.7))
-    nearwork  = clamp01(f.get("near_work", 0.0))
-    tension   = clamp01(f.get("facial_tension", 0.5))
-    blinkvar  = clamp01(f.get("blink_var", 0.2))
-
-    # Fatigue rule (예시 가중치)
-    fatigue = (
-        0.45*perclos +
-        0.20*yawn +
-        0.10*blinkvar +
-        0.10*nearwork +
-        0.15*posture
-    ) * 100.0  # 0~100 점수
-
-    # Stress rule (예시 가중치)
-    stress = (
-        0.30*tension +
-        0.20*gaze_off +
-        0.20*headvar +
-        0.20*posture +
-        0.10*nearwork
-    ) * 100.0
-
-    return {
-        "fatigue": float(max(0.0, min(100.0, fatigue))),
-        "stress":  float(max(0.0, min(100.0, stress))),
-    }
+    # 가중치/정규화는 config/rules.yaml (ScoringEngine)
+    return get_engine().score(f)
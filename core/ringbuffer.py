@@ -0,0 +1,83 @@
+# core/ringbuffer.py
+import numpy as np
+
+class SampleRing:
+    """
+    고정 용량 컬럼형 링버퍼 (윈도우 샘플 저장용).
+      - ts: int64 (ms), 나머지 컬럼: float32 (columns × capacity, 컬럼별 연속 메모리)
+      - 메모리 = capacity × (8 + 4×컬럼수) bytes 고정 (가득 차면 popleft 후 append)
+      - 프레임당 피처 dict(quality/head_pose/fhp_info 등)는 보관하지 않음
+    """
+    COLUMNS = ("ear", "mar", "posture_angle_norm", "gaze_on_pct", "near_work",
+               "blink", "yawn", "nodding")
+
+    def __init__(self, capacity: int, columns=COLUMNS):
+        self.capacity = int(max(1, capacity))
+        self.columns = tuple(columns)
+        self.col = {name: i for i, name in enumerate(self.columns)}
+        self.ts = np.zeros(self.capacity, dtype=np.int64)
+        self.data = np.zeros((len(self.columns), self.capacity), dtype=np.float32)
+        self._head = 0   # 가장 오래된 샘플 위치
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        return self._size == self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.data.nbytes
+
+    def append(self, ts_ms: int, values):
+        """values: self.columns 순서의 시퀀스. 저장된(float32) 값을 list로 반환."""
+        i = (self._head + self._size) % self.capacity
+        if self._size == self.capacity:
+            raise OverflowError("SampleRing full; popleft() before append()")
+        self.ts[i] = ts_ms
+        self.data[:, i] = values
+        self._size += 1
+        return self.data[:, i].tolist()
+
+    def popleft(self):
+        """가장 오래된 샘플 제거 → (ts_ms, 저장값 list)"""
+        if self._size == 0:
+            raise IndexError("pop from empty SampleRing")
+        i = self._head
+        out = (int(self.ts[i]), self.data[:, i].tolist())
+        self._head = (i + 1) % self.capacity
+        self._size -= 1
+        return out
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def first_ts(self) -> int:
+        return int(self.ts[self._head])
+
+    def last_ts(self) -> int:
+        return int(self.ts[(self._head + self._size - 1) % self.capacity])
+
+    # ---- 벡터화 조회 ----
+    def _ordered(self, arr, start, count):
+        """링 내부 [start, start+count) 구간을 시간순으로 반환 (랩 없으면 view)"""
+        end = start + count
+        if end <= self.capacity:
+            return arr[..., start:end]
+        return np.concatenate((arr[..., start:], arr[..., :end - self.capacity]), axis=-1)
+
+    def window(self, since_ms: int = None):
+        """
+        since_ms 이후 샘플을 컬럼 배열로 반환.
+        Returns: (ts int64[n], {col: float32[n]})
+        """
+        if self._size == 0:
+            return self.ts[:0], {c: self.data[j, :0] for c, j in self.col.items()}
+        ts = self._ordered(self.ts, self._head, self._size)
+        start = 0 if since_ms is None else int(np.searchsorted(ts, since_ms, side="left"))
+        ts = ts[start:]
+        data = self._ordered(self.data, self._head, self._size)[:, start:]
+        return ts, {c: data[j] for c, j in self.col.items()}
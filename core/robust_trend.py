@@ -0,0 +1,175 @@
+# core/robust_trend.py
+# 저장 구간(10초 로그 행)마다 갱신하는 강건 추세 추정
+#   - HoltEWMA: 불규칙 간격 Holt 선형 평활 (수준 + 분당 기울기), 잔차는 Huber 클리핑 → 하품 스파이크/얼굴 놓침 1건에 덜 흔들림
+#   - TheilSen: 슬라이딩 윈도우 쌍별 기울기의 중앙값 (이상치 ~29%까지 견딤)
+#   - PageHinkley: 양방향 변화점 검출 (평균 상승/하락), 검출 후 리셋
+import math
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+class HoltEWMA:
+    """
+    불규칙 간격 Holt: 계수는 시간 상수(분)로부터 α = 1 - exp(-dt/τ) → 행 간격이 달라도 같은 평활 강도.
+    update()는 Huber 클리핑된 관측값(예측 + 클리핑 잔차)을 반환 (변화점 검출 입력으로 사용).
+    """
+    def __init__(self, level_tau_min: float = 2.0, slope_tau_min: float = 10.0, huber_k: float = 3.0):
+        self.level_tau = level_tau_min
+        self.slope_tau = slope_tau_min
+        self.huber_k = huber_k
+        self.level = None
+        self.slope = 0.0           # 단위/분
+        self.scale = None          # |잔차| EWMA (Huber 임계 기준)
+        self._t = None
+
+    def update(self, t_min: float, y: float) -> float:
+        if self.level is None:
+            self.level, self._t = y, t_min
+            return y
+        dt = t_min - self._t
+        if dt <= 0:
+            return y
+        forecast = self.level + self.slope * dt
+        r = y - forecast
+        if self.scale is not None and self.scale > 0:
+            c = self.huber_k * self.scale
+            r = min(max(r, -c), c)
+        self.scale = abs(r) if self.scale is None else 0.9 * self.scale + 0.1 * abs(r)
+        alpha = 1.0 - math.exp(-dt / self.level_tau)
+        beta = 1.0 - math.exp(-dt / self.slope_tau)
+        level = forecast + alpha * r
+        self.slope += beta * ((level - self.level) / dt - self.slope)
+        self.level, self._t = level, t_min
+        return forecast + r
+
+class TheilSen:
+    def __init__(self, window_min: float = 10.0, max_points: int = 120):
+        self.window_min = window_min
+        self.buf = deque(maxlen=max_points)
+        self._slope = None
+
+    def update(self, t_min: float, y: float):
+        self.buf.append((t_min, y))
+        while self.buf and self.buf[0][0] < t_min - self.window_min:
+            self.buf.popleft()
+        self._slope = None
+
+    @property
+    def slope(self):
+        """쌍별 기울기 중앙값 (단위/분), 점이 3개 미만이면 None. 조회 시 1회 계산 후 캐시."""
+        if self._slope is None and len(self.buf) >= 3:
+            t, y = np.array(self.buf, dtype=np.float64).T
+            i, j = np.triu_indices(len(t), k=1)
+            dt = t[j] - t[i]
+            ok = dt > 0
+            self._slope = float(np.median((y[j] - y[i])[ok] / dt[ok])) if ok.any() else 0.0
+        return self._slope
+
+class PageHinkley:
+    """
+    양방향 Page-Hinkley.
+      up:   m_t = Σ(x - x̄ - δ),  M = min m  → m - M > λ 이면 상승 변화
+      down: m_t = Σ(x̄ - x - δ),  M = min m  → m - M > λ 이면 하락 변화
+    """
+    def __init__(self, delta: float = 2.0, threshold: float = 40.0, min_samples: int = 12):
+        self.delta = delta
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m_up = self.min_up = 0.0
+        self.m_dn = self.min_dn = 0.0
+
+    def update(self, x: float):
+        """변화가 검출되면 (방향, 리셋 이후 기준 평균) 반환 후 리셋, 아니면 None"""
+        self.n += 1
+        self.mean += (x - self.mean) / self.n
+        self.m_up += x - self.mean - self.delta
+        self.m_dn += self.mean - x - self.delta
+        self.min_up = min(self.min_up, self.m_up)
+        self.min_dn = min(self.min_dn, self.m_dn)
+        if self.n < self.min_samples:
+            return None
+        if self.m_up - self.min_up > self.threshold:
+            out = ("up", self.mean)
+        elif self.m_dn - self.min_dn > self.threshold:
+            out = ("down", self.mean)
+        else:
+            return None
+        self.reset()
+        return out
+
+class RobustTrend:
+    """지표 1개의 EWMA 수준/기울기 + Theil–Sen 기울기 + 변화점 (최근 max_events개)"""
+    def __init__(self, name: str, level_tau_min=2.0, slope_tau_min=10.0, huber_k=3.0, theil_sen_window_min=10.0,
+                 ph_delta=2.0, ph_threshold=40.0, max_events: int = 20):
+        self.name = name
+        self.ewma = HoltEWMA(level_tau_min, slope_tau_min, huber_k)
+        self.ts = TheilSen(theil_sen_window_min)
+        self.ph = PageHinkley(ph_delta, ph_threshold)
+        self.change_points = deque(maxlen=max_events)
+        self.last_ms = None
+
+    def update(self, ts_ms: int, y: float):
+        """시간순 입력만 반영. 변화점이 생기면 그 이벤트 dict 반환."""
+        if y is None or y != y or (self.last_ms is not None and ts_ms <= self.last_ms):
+            return None
+        self.last_ms = ts_ms
+        t_min = ts_ms / 60000.0
+        y_clipped = self.ewma.update(t_min, y)
+        self.ts.update(t_min, y)
+        hit = self.ph.update(y_clipped)      # 스파이크 1건으로 변화점이 나지 않도록 클리핑 값 사용
+        if hit is None:
+            return None
+        direction, before = hit
+        ev = {"metric": self.name, "ts_ms": int(ts_ms), "direction": direction,
+              "baseline": round(before, 2), "level": round(self.ewma.level, 2)}
+        self.change_points.append(ev)
+        return ev
+
+    def snapshot(self) -> dict:
+        return {
+            "level": self.ewma.level,
+            "ewma_slope_per_min": self.ewma.slope if self.ewma.level is not None else None,
+            "theil_sen_slope_per_min": self.ts.slope,
+            "change_points": list(self.change_points),
+        }
+
+class RobustTrendEngine:
+    """피로/스트레스 등 여러 지표의 RobustTrend 묶음"""
+    def __init__(self, metrics=("fatigue", "stress"), **params):
+        self.trends = {m: RobustTrend(m, **params) for m in metrics}
+
+    def update(self, ts_ms: int, values: dict) -> list:
+        events = []
+        for m, tr in self.trends.items():
+            ev = tr.update(ts_ms, values.get(m))
+            if ev is not None:
+                events.append(ev)
+        return events
+
+    def snapshot(self) -> dict:
+        return {m: tr.snapshot() for m, tr in self.trends.items()}
+
+    def summary_lines(self, recent_ms: int = None, now_ms: int = None, max_events: int = 3) -> list:
+        """리포트용 텍스트 (LLM 프롬프트의 trend_summary에 포함)"""
+        lines = []
+        for m, tr in self.trends.items():
+            if tr.ewma.level is None:
+                continue
+            ts = tr.ts.slope
+            ts_txt = f"{ts:+.3f}/분" if ts is not None else "-"
+            lines.append(f" - {m}: 수준 {tr.ewma.level:.1f}, EWMA 기울기 {tr.ewma.slope:+.3f}/분, Theil–Sen {ts_txt}")
+            cps = [c for c in tr.change_points
+                   if recent_ms is None or now_ms is None or c["ts_ms"] >= now_ms - recent_ms]
+            for c in cps[-max_events:]:
+                lines.append(f"   · 변화점 {_local_hhmm(c['ts_ms'])} {'↗️상승' if c['direction'] == 'up' else '↘️하락'} "
+                             f"(기준 평균 {c['baseline']:.1f} → 현재 {c['level']:.1f})")
+        return lines
+
+def _local_hhmm(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000).strftime("%H:%M")
@@ -0,0 +1,154 @@
+# core/scheduler.py
+import asyncio, logging, random, time
+
+class Job:
+    """
+    주기 작업 1개.
+      - fn: 코루틴 함수면 await, in_thread=True면 asyncio.to_thread, 아니면 이벤트 루프에서 직접 호출
+      - 기준 시각은 interval 간격, 실제 실행은 기준 + 0~jitter 초 무작위 → 여러 작업이 같은 초에 몰리지 않음
+      - 이전 실행이 아직 끝나지 않았으면 이번 회차는 건너뜀 (skipped)
+      - in_thread 작업이 timeout을 넘기면 대기만 끝나고 스레드는 계속 돌기 때문에,
+        그 스레드가 실제로 끝날 때까지 running으로 보고 다음 회차를 건너뜀 (같은 작업이 겹쳐 돌지 않도록)
+    """
+    def __init__(self, name: str, fn, interval_sec: float, jitter_sec: float = 0.0,
+                 initial_delay_sec: float = None, in_thread: bool = False, timeout_sec: float = None):
+        self.name = name
+        self.fn = fn
+        self.interval_sec = interval_sec
+        self.jitter_sec = jitter_sec
+        self.initial_delay_sec = interval_sec if initial_delay_sec is None else initial_delay_sec
+        self.in_thread = in_thread
+        self.timeout_sec = timeout_sec
+        self.enabled = True
+        self.next_run = None         # time.monotonic() 기준
+        self._running = None         # 실행 중인 Task
+        self._thread = None          # in_thread 실행의 스레드 future (timeout 후에도 끝날 때까지 유지)
+        self.stats = {
+            "runs": 0, "failures": 0, "skipped": 0, "timeouts": 0,
+            "last_started": None, "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0, "last_error": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return any(t is not None and not t.done() for t in (self._running, self._thread))
+
+    async def _call(self):
+        if asyncio.iscoroutinefunction(self.fn):
+            coro = self.fn()
+        elif self.in_thread:
+            self._thread = asyncio.ensure_future(asyncio.to_thread(self.fn))
+            # shield: timeout으로 대기를 끝내도 스레드 future는 취소하지 않음 (취소해도 스레드는 멈추지 않음)
+            coro = asyncio.shield(self._thread)
+        else:
+            return self.fn()
+        return await (asyncio.wait_for(coro, self.timeout_sec) if self.timeout_sec else coro)
+
+    def _late_done(self, fut):
+        """timeout 후 늦게 끝난 스레드 결과 기록"""
+        if fut.cancelled():
+            return
+        e = fut.exception()
+        if e is not None:
+            self.stats["last_error"] = str(e)
+            logging.error(f"job {self.name} failed after timeout: {e}")
+        else:
+            logging.info(f"job {self.name} finished after timeout")
+
+    async def run(self):
+        st = self.stats
+        st["last_started"] = time.time()
+        t0 = time.perf_counter()
+        try:
+            await self._call()
+            st["last_error"] = None
+        except asyncio.TimeoutError:
+            st["timeouts"] += 1
+            st["failures"] += 1
+            st["last_error"] = f"timeout after {self.timeout_sec}s"
+            logging.warning(f"⏱️ job {self.name} timed out")
+            if self._thread is not None and not self._thread.done():
+                self._thread.add_done_callback(self._late_done)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            st["failures"] += 1
+            st["last_error"] = str(e)
+            logging.error(f"job {self.name} failed: {e}")
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            st["runs"] += 1
+            st["last_ms"] = ms
+            st["max_ms"] = max(st["max_ms"], ms)
+            st["total_ms"] += ms
+
+    def info(self) -> dict:
+        st = dict(self.stats)
+        st["avg_ms"] = st["total_ms"] / st["runs"] if st["runs"] else 0.0
+        st["interval_sec"] = self.interval_sec
+        st["enabled"] = self.enabled
+        st["running"] = self.running
+        st["next_in_sec"] = max(self.next_run - time.monotonic(), 0.0) if self.next_run is not None else None
+        return st
+
+class Scheduler:
+    """
+    프로세스 내 asyncio 스케줄러.
+      - add()로 작업 등록 (start 전/후 모두 가능), 작업마다 대기 루프 태스크 1개
+      - 실행은 별도 태스크 → 느린 작업이 다른 작업의 주기를 밀지 않음
+      - run_now(): 즉시 1회 (실행 중이면 건너뜀)
+      - info(): 작업별 실행/실패/건너뜀 횟수와 소요 시간 (/scheduler)
+    """
+    def __init__(self):
+        self.jobs = {}
+        self._loops = {}
+        self._started = False
+
+    def add(self, name: str, fn, interval_sec: float, **kw) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"job already registered: {name}")
+        job = self.jobs[name] = Job(name, fn, interval_sec, **kw)
+        if self._started:
+            self._loops[name] = asyncio.create_task(self._loop(job))
+        return job
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            for name, job in self.jobs.items():
+                self._loops[name] = asyncio.create_task(self._loop(job))
+        return self
+
+    async def stop(self, timeout: float = 5.0):
+        """대기 루프 취소 후 실행 중인 작업은 timeout까지 기다렸다가 취소"""
+        self._started = False
+        for t in self._loops.values():
+            t.cancel()
+        self._loops.clear()
+        running = [t for j in self.jobs.values() for t in (j._running, j._thread) if t is not None and not t.done()]
+        if running:
+            done, pending = await asyncio.wait(running, timeout=timeout)
+            for t in pending:
+                t.cancel()
+
+    def run_now(self, name: str) -> bool:
+        job = self.jobs[name]
+        if job.running:
+            job.stats["skipped"] += 1
+            return False
+        job._running = asyncio.create_task(job.run())
+        return True
+
+    async def _loop(self, job: Job):
+        due = time.monotonic() + job.initial_delay_sec      # jitter 없는 기준 시각 (주기가 jitter만큼 밀리지 않도록)
+        while True:
+            job.next_run = due + random.uniform(0, job.jitter_sec)
+            await asyncio.sleep(max(job.next_run - time.monotonic(), 0.0))
+            if job.enabled:
+                if job.running:
+                    job.stats["skipped"] += 1
+                else:
+                    job._running = asyncio.create_task(job.run())
+            due = max(due + job.interval_sec, time.monotonic())   # 루프가 밀렸으면 지금부터
+
+    def info(self) -> dict:
+        return {name: job.info() for name, job in self.jobs.items()}
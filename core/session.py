@@ -0,0 +1,212 @@
+# core/session.py
+import json, logging, threading, time, uuid
+from pathlib import Path
+
+class PipelineSession:
+    """
+    WebSocket 1개 세션의 파이프라인 상태 묶음.
+      - cam/fm: 카메라·FaceMesh 핸들 (재연결 시 재오픈 비용 절약)
+      - ev/agg/multi/cal: 이벤트·윈도우·캘리브레이션 상태
+      - interval: DB 로그 구간 집계기
+      - repo: 사용자/세션 범위 저장소 (db/tenants.py ScopedRepository, 접속 시 설정)
+      - extra: 누적 통계 등 서버측 루프 상태 (dict)
+    """
+    def __init__(self, session_id: str, cam=None, fm=None, ev=None, agg=None, multi=None, cal=None,
+                 interval=None, extra=None):
+        self.session_id = session_id
+        self.cam = cam
+        self.fm = fm
+        self.ev = ev
+        self.agg = agg
+        self.multi = multi
+        self.cal = cal
+        self.interval = interval
+        self.repo = None
+        self.extra = extra if extra is not None else {}
+        self.created_at = time.time()
+        self.detached_at = None      # None이면 연결 중
+        self.generation = 0          # 같은 sid로 재접속할 때마다 증가 (이전 루프 종료 신호)
+
+    @property
+    def connected(self) -> bool:
+        return self.detached_at is None
+
+    def close(self):
+        """카메라/FaceMesh 해제 + 카탈로그에 세션 종료 기록"""
+        for h in (self.fm, self.cam):
+            if h is None:
+                continue
+            try: h.close()
+            except Exception: pass
+        self.fm = self.cam = None
+        if self.repo is not None:
+            try: self.repo.end()
+            except Exception as e: logging.error(f"Session end record failed: {e}")
+
+    # ---- 디스크 체크포인트 (서버 재시작 후 이어가기용, 작은 상태만) ----
+    def to_checkpoint(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "saved_at": time.time(),
+            "extra": self.extra,
+            "calibration": self.cal.to_profile() if self.cal is not None and self.cal.ready else None,
+        }
+
+    def restore_checkpoint(self, ckpt: dict):
+        self.extra.update(ckpt.get("extra") or {})
+        if self.cal is not None and ckpt.get("calibration"):
+            self.cal.load_profile(ckpt["calibration"])
+
+class SessionRegistry:
+    """
+    세션 id → PipelineSession.
+      - 연결 해제 후 grace_sec 동안 상태/카메라를 유지, 같은 id로 재접속하면 그대로 복원
+      - 연결 중인 세션의 id로 접속하면(탭 복제로 sessionStorage sid가 복사된 경우 등) 빼앗지 않고 새 id로 생성
+      - checkpoint_dir 지정 시 해제/종료 시점의 작은 상태를 JSON으로 저장 → 서버 재시작 후 복원
+        (유예 만료로 정리된 세션의 파일은 삭제, 서버 종료 때 남은 파일은 checkpoint_ttl_sec 지나면 시작 시 삭제)
+      - on_close(sess): 정리(reap/close_all) 직전 호출 (남은 부분 구간 로그 저장 등)
+      - reap()은 스케줄러 스레드에서 호출 가능 → 목록 변경은 락 안에서, 카메라 해제 등 close는 락 밖에서
+    """
+    def __init__(self, grace_sec: float = 60.0, checkpoint_dir=None, on_close=None,
+                 checkpoint_ttl_sec: float = 86400.0):
+        self.grace_sec = grace_sec
+        self.on_close = on_close
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.checkpoint_ttl_sec = checkpoint_ttl_sec
+        self._sessions = {}
+        self._lock = threading.RLock()
+        self.stats = {"created": 0, "resumed": 0, "restored_from_disk": 0, "expired": 0, "forked": 0,
+                      "checkpoints_pruned": 0}
+        self.prune_checkpoints()
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def attach(self, session_id: str, factory):
+        """
+        세션 획득. 유예 중이면 재사용, 없으면 factory(session_id)로 생성 (+디스크 체크포인트 복원).
+        이미 연결 중인 id면 새 id로 생성 → 호출 측은 sess.session_id를 클라이언트에 알려야 함.
+        Returns: (session, resumed: bool)
+        """
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is not None and sess.connected:
+                # 두 탭이 같은 sid로 서로 세션을 빼앗으며 재접속을 반복하지 않도록
+                logging.info(f"Session {session_id} is connected elsewhere, issuing a new id")
+                self.stats["forked"] += 1
+                session_id = uuid.uuid4().hex
+                sess = None
+            if sess is not None:
+                sess.detached_at = None
+                sess.generation += 1
+                self.stats["resumed"] += 1
+                return sess, True
+            # 카메라는 하나뿐이므로 유예 중인 다른 세션은 먼저 정리
+            stale = [self._sessions.pop(sid) for sid, x in list(self._sessions.items()) if not x.connected]
+        for old in stale:
+            self._close(old, drop_checkpoint=True)
+
+        sess = factory(session_id)
+        ckpt = self._load_checkpoint(session_id)
+        if ckpt:
+            sess.restore_checkpoint(ckpt)
+            self.stats["restored_from_disk"] += 1
+        with self._lock:
+            self._sessions[session_id] = sess
+            self.stats["created"] += 1
+        return sess, False
+
+    def detach(self, session_id: str, generation: int = None):
+        """연결 해제 표시 (유예 시작). 이미 새 연결이 붙었으면(generation 불일치) 무시."""
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None or (generation is not None and generation != sess.generation):
+                return
+            sess.detached_at = time.time()
+        self._save_checkpoint(sess)
+
+    def active(self) -> list:
+        """연결 중인 세션 목록"""
+        with self._lock:
+            return [s for s in self._sessions.values() if s.connected]
+
+    def reap(self, now: float = None) -> int:
+        """유예 시간이 지난 세션 정리. 정리한 개수 반환."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [self._sessions.pop(sid) for sid, s in list(self._sessions.items())
+                       if s.detached_at is not None and now - s.detached_at > self.grace_sec]
+        for sess in expired:
+            self._close(sess, drop_checkpoint=True)
+        return len(expired)
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for sess in sessions:
+            self._save_checkpoint(sess)
+            self._close(sess)
+
+    def _close(self, sess, drop_checkpoint: bool = False):
+        """목록에서 이미 뺀 세션 정리 (on_close → 핸들 해제). drop_checkpoint: 유예 만료 → 복원할 일 없음"""
+        if self.on_close is not None:
+            try: self.on_close(sess)
+            except Exception as e: logging.error(f"Session on_close failed: {e}")
+        sess.close()
+        if drop_checkpoint:
+            self._delete_checkpoint(sess.session_id)
+        with self._lock:
+            self.stats["expired"] += 1
+        logging.info(f"🧹 Session expired: {sess.session_id}")
+
+    # ---- checkpoint I/O ----
+    def _ckpt_path(self, session_id):
+        safe = "".join(c for c in session_id if c.isalnum() or c in "-_")[:64]
+        return self.checkpoint_dir / f"{safe}.json"
+
+    def _save_checkpoint(self, sess):
+        if self.checkpoint_dir is None:
+            return
+        try:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            path = self._ckpt_path(sess.session_id)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(sess.to_checkpoint(), ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except Exception as e:
+            logging.error(f"Session checkpoint save failed: {e}")
+
+    def _delete_checkpoint(self, session_id):
+        if self.checkpoint_dir is None:
+            return
+        try:
+            self._ckpt_path(session_id).unlink(missing_ok=True)
+        except Exception as e:
+            logging.error(f"Session checkpoint delete failed: {e}")
+
+    def prune_checkpoints(self) -> int:
+        """checkpoint_ttl_sec보다 오래된 체크포인트 파일 삭제 (서버 종료 후 다시 오지 않은 세션). 삭제 수 반환."""
+        if self.checkpoint_dir is None or not self.checkpoint_dir.is_dir():
+            return 0
+        cutoff = time.time() - self.checkpoint_ttl_sec
+        n = 0
+        for path in self.checkpoint_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    n += 1
+            except OSError as e:
+                logging.error(f"Session checkpoint prune failed: {e}")
+        self.stats["checkpoints_pruned"] += n
+        return n
+
+    def _load_checkpoint(self, session_id):
+        if self.checkpoint_dir is None:
+            return None
+        path = self._ckpt_path(session_id)
+        try:
+            return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        except Exception as e:
+            logging.error(f"Session checkpoint load failed: {e}")
+            return None
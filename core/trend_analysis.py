@@ -4,82 +4,149 @@ from datetime import datetime
 from collections import defaultdict
 
 class GraphAnalyzer:
+    HOURLY_KEYS = ["fatigue", "stress", "perclos", "yawn_rate", "posture_angle", "headpose_var"]
+
     def __init__(self):
         # 분석 대상 컬럼 6개
         self.targets = [
-            "perclos", "yawn_rate", "posture_angle", 
+            "perclos", "yawn_rate", "posture_angle",
             "headpose_var", "fatigue", "stress"
         ]
 
-    def analyze(self, raw_data: list, trend_window_min: int = 10):
+    def analyze(self, raw_data, trend_window_min: int = 10, hourly: list = None):
         """
         1. Hourly Averages (시간대별 평균)
         2. Recent Trend Slope (최근 N분간 분당 변화율)
+
+        raw_data: 행 dict 목록(ts ISO 문자열) 또는 컬럼 배열 dict (LogRepository.get_arrays → analyze_arrays)
+        hourly: 1시간 롤업 행(db/rollup.py query 결과). 주면 시간대별 평균은 롤업에서,
+                raw_data는 최근 트렌드 구간만 있으면 됨.
         """
-        if not raw_data:
+        if isinstance(raw_data, dict):
+            return self.analyze_arrays(raw_data, trend_window_min, hourly)
+        if not raw_data and not hourly:
             return "데이터가 충분하지 않습니다."
 
-        # 데이터 전처리: timestamp 문자열을 datetime 객체로 변환
-        processed = []
-        for row in raw_data:
-            dt = datetime.fromisoformat(row['ts'])
-            processed.append({**row, 'dt': dt, 'ts_unix': dt.timestamp()})
+        # 행 → 컬럼 배열 (ts는 로컬 naive ISO → datetime64로 한 번에 파싱, 시=정수 나눗셈)
+        t = np.array([row['ts'] for row in raw_data], dtype="datetime64[ms]").astype(np.int64)
+        cols = {key: np.array([row[key] for row in raw_data], dtype=np.float64) for key in self.targets}
+        return self._report(t / 1000.0, (t // 3_600_000) % 24, cols, trend_window_min, hourly)
 
-        # 결과 저장소
-        report = ["[📊 시간대별 평균 및 트렌드 분석]"]
+    def analyze_arrays(self, cols: dict, trend_window_min: int = 10, hourly: list = None):
+        """
+        analyze()의 컬럼형 버전: {"ts_ms": int64[n], 지표: float32[n]} (ts_ms 오름차순).
+        행 dict/datetime 객체를 만들지 않음. 출력 텍스트는 analyze()와 동일.
+        """
+        ts = cols["ts_ms"]
+        if len(ts) == 0 and not hourly:
+            return "데이터가 충분하지 않습니다."
+        return self._report(ts / 1000.0, self._local_hour(ts), cols, trend_window_min, hourly)
 
+    def _report(self, ts_unix, hour, cols, trend_window_min, hourly):
         # === 1. Hourly Average (시간대별 평균) ===
-        hourly_groups = defaultdict(list)
-        for row in processed:
-            hour_key = row['dt'].strftime("%H시") # 예: "14시"
-            hourly_groups[hour_key].append(row)
-
-        report.append("\n1️⃣ 시간대별 평균 (Hourly Avg):")
-        
-        # 정렬된 시간 순서대로 출력
-        sorted_hours = sorted(hourly_groups.keys())
-        for hour in sorted_hours:
-            rows = hourly_groups[hour]
-            # 각 지표별 평균 계산
-            stats = []
-            for key in ["fatigue", "stress", "perclos", "yawn_rate", "posture_angle", "headpose_var"]:
-                vals = [r[key] for r in rows if r[key] is not None]
-                if vals:
-                    avg = sum(vals) / len(vals)
-                    stats.append(f"{key}:{avg:.1f}")
-            report.append(f" - {hour}: {', '.join(stats)}")
+        hourly_lines = self._hourly_from_rollup(hourly) if hourly is not None else self._hourly_from_arrays(hour, cols)
 
         # === 2. Recent Trend (선형 회귀 기울기) ===
-        # 최근 N분 데이터 필터링
-        now_ts = processed[-1]['ts_unix']
-        start_ts = now_ts - (trend_window_min * 60)
-        
-        recent_data = [r for r in processed if r['ts_unix'] >= start_ts]
+        # 최근 N분 데이터 필터링 (ts 오름차순 → 경계는 이분 탐색)
+        start = np.searchsorted(ts_unix, ts_unix[-1] - trend_window_min * 60, side="left") if len(ts_unix) else 0
+        slopes = None
+        if len(ts_unix) - start >= 10: # 데이터가 너무 적으면 분석 불가
+            # X축: 시간 (분 단위), Y축: 지표 6개를 열로 쌓은 2-D 배열 → 기울기 6개를 한 번에
+            x = (ts_unix[start:] - ts_unix[start]) / 60.0
+            Y = np.column_stack([cols[target][start:] for target in self.targets]).astype(np.float64)
+            slopes = self._slopes(x, Y)
+        return self.format_report(hourly_lines, slopes, trend_window_min)
 
+    def format_report(self, hourly_lines, slopes, trend_window_min: int = 10, robust_lines: list = None):
+        """
+        리포트 텍스트 조립. slopes: self.targets 순서 기울기 (None이면 수집 중, 원소가 NaN이면 그 지표만 수집 중)
+        robust_lines: RobustTrendEngine.summary_lines() 결과 (있을 때만 3️⃣ 섹션 추가)
+        """
+        report = ["[📊 시간대별 평균 및 트렌드 분석]"]
+        report.append("\n1️⃣ 시간대별 평균 (Hourly Avg):")
+        report.extend(hourly_lines)
         report.append(f"\n2️⃣ 최근 {trend_window_min}분 트렌드 (분당 변화율):")
-        
-        if len(recent_data) < 10: # 데이터가 너무 적으면 분석 불가
+        if slopes is None:
             report.append(" - (분석을 위한 데이터가 모이는 중입니다)")
         else:
-            # X축: 시간 (분 단위로 정규화, 0분 ~ N분)
-            # Y축: 각 지표 값
-            x = np.array([r['ts_unix'] for r in recent_data])
-            x = (x - x.min()) / 60.0  # 초 단위를 '분' 단위로 변환 (Slope 의미 명확화)
+            for target, slope in zip(self.targets, slopes):
+                report.append(self._trend_line(target, slope))
+        if robust_lines:
+            report.append("\n3️⃣ 강건 추세 / 변화점 (이상치 영향 완화):")
+            report.extend(robust_lines)
+        return "\n".join(report)
+
+    @staticmethod
+    def _slopes(x, Y, min_rows: int = 10):
+        """
+        최소제곱 1차 기울기 (np.polyfit(x, y, 1)[0]과 동일) - 닫힌 형태, Y의 열마다.
+        NaN(NULL)은 열마다 제외 → 유효 행이 min_rows 미만인 열은 NaN
+        """
+        ok = ~np.isnan(Y)
+        if ok.all():
+            xc = x - x.mean()
+            sxx = xc @ xc
+            if sxx == 0:
+                return np.zeros(Y.shape[1])
+            return xc @ (Y - Y.mean(axis=0)) / sxx
+        n = ok.sum(axis=0)
+        cnt = np.maximum(n, 1)
+        X = np.where(ok, x[:, None], 0.0)
+        mx = X.sum(axis=0) / cnt
+        my = np.where(ok, Y, 0.0).sum(axis=0) / cnt
+        xc = np.where(ok, x[:, None] - mx, 0.0)
+        sxx = (xc * xc).sum(axis=0)
+        sxy = (xc * np.where(ok, Y - my, 0.0)).sum(axis=0)
+        out = np.divide(sxy, sxx, out=np.zeros(Y.shape[1]), where=sxx > 0)
+        out[n < min_rows] = np.nan
+        return out
+
+    @staticmethod
+    def _trend_line(target, slope):
+        if slope != slope:   # NaN: 이 지표는 유효 행 부족 (NULL 구간)
+            return f" - {target}: (분석을 위한 데이터가 모이는 중입니다)"
+        # LLM이 이해하기 쉬운 텍스트로 변환
+        # 기울기가 0.0에 가까우면 '유지', 양수면 '증가', 음수면 '감소'
+        # 하지만 우리는 "판단"하지 않고 "값"을 줍니다.
+        direction = "↗️증가" if slope > 0 else "↘️감소"
+        if abs(slope) < 0.01: direction = "➡️유지"
+        return f" - {target}: {direction} (속도: {slope:+.3f}/분)"
+
+    @staticmethod
+    def _local_hour(ts_ms):
+        """epoch ms → 로컬 시(0~23). 오프셋은 UTC 시간 버킷마다 1번만 조회 (DST 대응)"""
+        utc_hour, inv = np.unique(ts_ms // 3_600_000, return_inverse=True)
+        offs = np.array([datetime.fromtimestamp(int(h) * 3600).astimezone().utcoffset().total_seconds()
+                         for h in utc_hour], dtype=np.int64) * 1000
+        return ((ts_ms + offs[inv]) // 3_600_000) % 24
 
-            for target in self.targets:
-                y = np.array([r[target] for r in recent_data])
-                
-                # 1차 함수(선형 회귀) 적합: y = slope * x + intercept
-                # polyfit(deg=1)의 첫 번째 반환값이 기울기(slope)
-                if len(y) > 0:
-                    slope, _ = np.polyfit(x, y, 1)
-                    
-                    # LLM이 이해하기 쉬운 텍스트로 변환
-                    # 기울기가 0.0에 가까우면 '유지', 양수면 '증가', 음수면 '감소'
-                    # 하지만 우리는 "판단"하지 않고 "값"을 줍니다.
-                    direction = "↗️증가" if slope > 0 else "↘️감소"
-                    if abs(slope) < 0.01: direction = "➡️유지"
-                    
-                    report.append(f" - {target}: {direction} (속도: {slope:+.3f}/분)")
+    def _hourly_from_arrays(self, hour, cols: dict):
+        """시(0~23)별 평균 - np.bincount로 개수/합계 (NaN/NULL 제외)"""
+        present = np.bincount(hour, minlength=24) > 0
+        sums = {}
+        for key in self.HOURLY_KEYS:
+            v = np.asarray(cols[key], dtype=np.float64)
+            ok = ~np.isnan(v)
+            sums[key] = (np.bincount(hour[ok], minlength=24),
+                         np.bincount(hour[ok], weights=v[ok], minlength=24))
+        lines = []
+        for h in np.flatnonzero(present):
+            stats = [f"{key}:{sums[key][1][h] / sums[key][0][h]:.1f}"
+                     for key in self.HOURLY_KEYS if sums[key][0][h]]
+            lines.append(f" - {h:02d}시: {', '.join(stats)}")
+        return lines
 
-        return "\n".join(report)
\ No newline at end of file
+    def _hourly_from_rollup(self, hourly: list):
+        """롤업 버킷 → "HH시"별 Σsum/Σcount (원시 행 평균과 같은 값)"""
+        groups = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        for r in hourly:
+            hour_key = datetime.fromtimestamp(r['bucket_ms'] / 1000).strftime("%H시")
+            acc = groups[hour_key][r['metric']]
+            acc[0] += r['count']
+            acc[1] += r['sum']
+        lines = []
+        for hour in sorted(groups):
+            stats = [f"{key}:{groups[hour][key][1] / groups[hour][key][0]:.1f}"
+                     for key in self.HOURLY_KEYS if groups[hour][key][0]]
+            lines.append(f" - {hour}: {', '.join(stats)}")
+        return lines
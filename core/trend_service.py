@@ -0,0 +1,261 @@
+# core/trend_service.py
+import threading, time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from core.robust_trend import RobustTrendEngine
+from core.trend_analysis import GraphAnalyzer
+from db import rollup
+from db.tenants import DEFAULT_USER
+
+HOUR_MS = 3_600_000
+
+# GraphAnalyzer.targets(logs 컬럼) → 로그 행 dict 키 (LogRepository._log_params 입력)
+ROW_KEYS = {"perclos": "perclos", "yawn_rate": "yawn_rate", "posture_angle": "posture",
+            "headpose_var": "headpose", "fatigue": "fatigue", "stress": "stress"}
+
+class _TrendState:
+    """
+    사용자 1명의 증분 통계.
+      - hourly: 로컬 시 버킷 → [개수(6), 합계(6)]
+      - 최근 N분(마지막 행 기준) 회귀 충분통계: 지표별 n, Σx, Σx², Σy, Σxy (NaN/NULL은 지표마다 제외)
+      - robust: 피로/스트레스 EWMA·Theil–Sen 기울기 + 변화점 (core/robust_trend.py)
+    x는 origin 기준 분 단위 (큰 epoch 값의 상쇄 오차 방지, 주기적으로 재기준)
+    """
+    REBASE_MS = 6 * HOUR_MS
+
+    def __init__(self, k: int, window_ms: int, robust: RobustTrendEngine = None):
+        self.window_ms = window_ms
+        self.robust = robust
+        self.last_id = 0
+        self.last_ts = None
+        self.stale = False         # id가 건너뛰면 (다른 writer 등) 다음 조회 때 재구축
+        self.text = None           # 캐시된 요약 (last_id + 시간 버킷 컷오프 기준)
+        self.text_cutoff = None
+        self.hourly = {}
+        self.win = deque()         # (ts_ms, y)
+        self.origin = None
+        self.k = k
+        self._zero_sums()
+
+    def _zero_sums(self):
+        self.n = np.zeros(self.k)
+        self.sx = np.zeros(self.k)
+        self.sxx = np.zeros(self.k)
+        self.sy = np.zeros(self.k)
+        self.sxy = np.zeros(self.k)
+
+    def add(self, ts_ms: int, y, row_id: int = None, robust_values: dict = None):
+        y = np.asarray(y, dtype=np.float64)
+        if self.robust is not None and robust_values:
+            self.robust.update(ts_ms, robust_values)
+        ok = ~np.isnan(y)
+        b = rollup.bucket_start(ts_ms, HOUR_MS)
+        acc = self.hourly.get(b)
+        if acc is None:
+            acc = self.hourly[b] = [np.zeros(self.k), np.zeros(self.k)]
+        acc[0] += ok
+        acc[1] += np.where(ok, y, 0.0)
+
+        if self.last_ts is None or ts_ms > self.last_ts:
+            self.last_ts = ts_ms
+        if ts_ms >= self.last_ts - self.window_ms:
+            if self.origin is None:
+                self.origin = ts_ms
+            self.win.append((ts_ms, y))
+            self._accumulate(ts_ms, y, 1.0)
+        self._evict()
+        if row_id is not None:
+            self.last_id = max(self.last_id, row_id)
+        self.text = None
+
+    def _accumulate(self, ts_ms, y, sign):
+        x = (ts_ms - self.origin) / 60000.0
+        ok = ~np.isnan(y)
+        w = sign * ok
+        yz = np.where(ok, y, 0.0)
+        self.n += w
+        self.sx += w * x
+        self.sxx += w * x * x
+        self.sy += sign * yz
+        self.sxy += sign * x * yz
+
+    def _evict(self):
+        start = self.last_ts - self.window_ms
+        while self.win and self.win[0][0] < start:
+            ts_ms, y = self.win.popleft()
+            self._accumulate(ts_ms, y, -1.0)
+        if not self.win:
+            self.origin = None
+            self._zero_sums()
+        elif self.last_ts - self.origin > self.REBASE_MS:
+            self.origin = self.win[0][0]
+            self._zero_sums()
+            for ts_ms, y in self.win:
+                self._accumulate(ts_ms, y, 1.0)
+
+    def slopes(self, min_rows: int = 10):
+        """
+        분당 기울기 (GraphAnalyzer._slopes와 같은 최소제곱), 구간 행이 부족하면 None.
+        지표별 유효 행(NULL 제외)이 min_rows 미만이면 그 지표만 NaN
+        """
+        if len(self.win) < min_rows:
+            return None
+        den = self.n * self.sxx - self.sx * self.sx
+        out = np.divide(self.n * self.sxy - self.sx * self.sy, den, out=np.zeros(self.k), where=den > 0)
+        out[self.n < min_rows] = np.nan
+        return out
+
+class TrendService:
+    """
+    /report·/chat용 트렌드 요약 캐시.
+      - LogWriter 커밋 리스너(on_commit)로 사용자별 시간 버킷 합계와 회귀 충분통계를 증분 갱신
+      - summary(): 마지막 로그 id가 캐시와 같으면 저장된 텍스트 그대로 (hit),
+        다르면 증분 상태에서 O(버킷 수)로 다시 조립, 상태가 없거나 id가 건너뛰었으면 DB에서 재구축
+      - 사용자 상태는 max_users명까지 LRU 유지 (밀려난 사용자는 다음 조회 때 재구축)
+    """
+    def __init__(self, tenants, hours: int = 12, trend_window_min: int = 10,
+                 robust: dict = None, robust_warmup_min: int = 60, change_recent_min: int = 60,
+                 max_users: int = 256):
+        self.tenants = tenants
+        self.hours = hours
+        self.trend_window_min = trend_window_min
+        self.robust_params = robust or {}          # RobustTrendEngine 인자 (metrics, ph_threshold 등)
+        self.robust_warmup_ms = robust_warmup_min * 60_000
+        self.change_recent_ms = change_recent_min * 60_000   # 리포트에 넣을 변화점 범위
+        self.analyzer = GraphAnalyzer()
+        self.targets = self.analyzer.targets
+        self.max_users = max_users
+        self._states = OrderedDict()   # user_key → _TrendState (LRU)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "rebuilds": 0, "rows_applied": 0, "peek_hits": 0, "peek_misses": 0,
+                      "evicted": 0}
+
+    def _get(self, user_key):
+        """상태 조회 + LRU 갱신. _lock 보유 상태에서 호출."""
+        st = self._states.get(user_key)
+        if st is not None:
+            self._states.move_to_end(user_key)
+        return st
+
+    # ---- 증분 갱신 (LogWriter listener, 이벤트 루프) ----
+    def on_commit(self, batch):
+        with self._lock:
+            for r in batch:
+                st = self._states.get(r.get("user_key") or DEFAULT_USER)
+                row_id = r.get("id")
+                if st is None or row_id is None or row_id <= st.last_id:
+                    continue   # 상태가 없으면 다음 조회 때 DB에서 구축
+                if row_id != st.last_id + 1:
+                    st.stale = True
+                st.add(int(r["ts_ms"]), [r.get(ROW_KEYS[t], np.nan) for t in self.targets], row_id,
+                       {m: r.get(ROW_KEYS[m]) for m in st.robust.trends})
+                self.stats["rows_applied"] += 1
+
+    # ---- 조회 ----
+    def summary(self, user_key: str = None) -> str:
+        """트렌드 요약 텍스트 (GraphAnalyzer 리포트 형식). DB 조회가 있을 수 있으므로 스레드에서 호출."""
+        user_key = user_key or DEFAULT_USER
+        store = self.tenants.scope(user_key)
+        db_last = store.last_row_id()
+        with self._lock:
+            st = self._get(user_key)
+            if st is not None and not st.stale and st.last_id == db_last:
+                if st.text is not None and st.text_cutoff == self._cutoff():
+                    self.stats["hits"] += 1
+                    return st.text
+                self.stats["misses"] += 1
+                st.text = self._render(st)
+                return st.text
+        st = self._rebuild(store)
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["rebuilds"] += 1
+            st.text = self._render(st)
+            self._states[user_key] = st
+            self._states.move_to_end(user_key)
+            while len(self._states) > self.max_users:
+                self._states.popitem(last=False)
+                self.stats["evicted"] += 1
+            return st.text
+
+    def peek(self, user_key: str = None):
+        """
+        DB 조회 없이 메모리 상태로 요약 (스케줄러가 summary()로 미리 구축, 이후 on_commit으로 최신 유지).
+        상태가 없거나 외부 쓰기로 stale이면 None → 호출 측에서 summary()로.
+        """
+        with self._lock:
+            st = self._get(user_key or DEFAULT_USER)
+            if st is None or st.stale:
+                self.stats["peek_misses"] += 1
+                return None
+            if st.text is None or st.text_cutoff != self._cutoff():
+                st.text = self._render(st)
+            self.stats["peek_hits"] += 1
+            return st.text
+
+    def snapshot(self, user_key: str = None) -> dict:
+        """/trend API: 요약 텍스트 + 강건 추세(수준, EWMA/Theil–Sen 기울기, 변화점)"""
+        user_key = user_key or DEFAULT_USER
+        text = self.summary(user_key)
+        with self._lock:
+            st = self._states.get(user_key)
+            return {"user": user_key, "last_ts_ms": st.last_ts if st else None,
+                    "summary": text, "robust": st.robust.snapshot() if st else {}}
+
+    def _rebuild(self, store, max_tries: int = 3) -> _TrendState:
+        """
+        롤업(1h) + 최근 원시 행으로 상태 구성. 도중에 커밋이 끼면 다시.
+        원시 행은 max(트렌드 구간, 워밍업) 만큼 읽어 강건 추세는 전부로, 회귀 합계는 트렌드 구간만으로 채움.
+        """
+        window_ms = self.trend_window_min * 60_000
+        for _ in range(max_tries):
+            id0 = store.last_row_id()
+            st = _TrendState(len(self.targets), window_ms, RobustTrendEngine(**self.robust_params))
+            for r in store.get_rollup("1h", hours=self.hours, metrics=self.targets):
+                acc = st.hourly.setdefault(r["bucket_ms"], [np.zeros(st.k), np.zeros(st.k)])
+                j = self.targets.index(r["metric"])
+                acc[0][j] += r["count"]
+                acc[1][j] += r["sum"]
+            last_ms = store.last_ts_ms()
+            if last_ms is not None:
+                cols = store.get_arrays(hours=self.hours, since_ms=last_ms - max(window_ms, self.robust_warmup_ms))
+                Y = np.column_stack([cols[t] for t in self.targets]).astype(np.float64)
+                ts_list = cols["ts_ms"].tolist()
+                robust_cols = {m: cols[m].astype(np.float64).tolist() for m in st.robust.trends}
+                for i, ts_ms in enumerate(ts_list):
+                    st.robust.update(ts_ms, {m: v[i] for m, v in robust_cols.items()})
+                start = int(np.searchsorted(cols["ts_ms"], last_ms - window_ms, side="left"))
+                st.last_ts = int(last_ms)
+                st.origin = ts_list[start] if start < len(ts_list) else None
+                for ts_ms, y in zip(ts_list[start:], Y[start:]):
+                    st.win.append((ts_ms, y))
+                    st._accumulate(ts_ms, y, 1.0)
+            st.last_id = id0
+            if store.last_row_id() == id0:
+                break
+        return st
+
+    def _cutoff(self):
+        return rollup.bucket_start(int((time.time() - self.hours * 3600) * 1000), HOUR_MS)
+
+    def _render(self, st: _TrendState) -> str:
+        cutoff = st.text_cutoff = self._cutoff()
+        for b in [b for b in st.hourly if b < cutoff]:
+            del st.hourly[b]
+        if not st.hourly and not st.win:
+            return "데이터가 충분하지 않습니다."
+        rows = [{"bucket_ms": b, "metric": t, "count": cnt[j], "sum": tot[j]}
+                for b, (cnt, tot) in sorted(st.hourly.items()) for j, t in enumerate(self.targets)]
+        robust_lines = st.robust.summary_lines(self.change_recent_ms, st.last_ts) if st.last_ts is not None else []
+        return self.analyzer.format_report(self.analyzer._hourly_from_rollup(rows), st.slopes(), self.trend_window_min,
+                                           robust_lines)
+
+    def invalidate(self, user_key: str = None):
+        with self._lock:
+            self._states.pop(user_key or DEFAULT_USER, None)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {**self.stats, "users": len(self._states)}
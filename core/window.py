@@ -1,32 +1,102 @@
 
-from collections import deque
-import time, statistics as stats
+import math, time
+import numpy as np
+
+from core.ringbuffer import SampleRing
 
 class WindowAggregator:
-    def __init__(self, window_sec: int = 60):
+    """
+    슬라이딩 윈도우 집계 (증분 방식).
+    - 샘플은 컬럼형 링버퍼(SampleRing)에 float32로 보관 → 메모리 = window_sec × max_fps 고정
+    - append/evict 시 카운트·합계·Welford 분산을 갱신 → snapshot()은 O(1)
+    - 임의 구간 통계는 window_stats()로 벡터화 계산
+    """
+    def __init__(self, window_sec: int = 60, max_fps: int = 30):
         self.window_ms = window_sec * 1000
-        self.samples = deque()   # (ts_ms, feats, events)
+        self.samples = SampleRing(capacity=window_sec * max_fps + 1)
+        self._c = self.samples.col
         self._last_cleanup = 0
 
-    def update(self, feats: dict, events: dict):
-        ts = int(time.time()*1000)
-        self.samples.append((ts, feats, events))
+        # 누적 통계 (윈도우 내부 샘플 기준)
+        self._n = 0
+        self._closed = 0                                  # ear < perclos_th 프레임 수
+        self._events = {"blink": 0, "yawn": 0, "nodding": 0}    # 이벤트 합계
+        self._sums = {"posture_angle_norm": 0.0, "gaze_on_pct": 0.0, "near_work": 0.0}
+        self._defaults = {"ear": 0.3, "mar": 0.2, "posture_angle_norm": 0.0,
+                          "gaze_on_pct": 0.7, "near_work": 0.0}
+        self._ear_mean = 0.0                              # Welford (headpose_var 대용)
+        self._ear_m2 = 0.0
+        self.perclos_th = 0.21
+
+    def update(self, feats: dict, events: dict, ts_ms: int = None):
+        ts = int(time.time()*1000) if ts_ms is None else int(ts_ms)
+        row = [feats.get(k, d) for k, d in self._defaults.items()]
+        row += [events.get(k, 0) for k in self._events]
+        if self.samples.full:
+            # 용량 초과(예상보다 높은 fps): 가장 오래된 샘플부터 밀어냄
+            self._remove(self.samples.popleft()[1])
+        self._add(self.samples.append(ts, row))
         # cleanup
         if ts - self._last_cleanup > 2000:
             self._cleanup(ts)
             self._last_cleanup = ts
 
     def _cleanup(self, now_ms):
-        while self.samples and (now_ms - self.samples[0][0]) > self.window_ms:
-            self.samples.popleft()
+        while len(self.samples) and (now_ms - self.samples.first_ts()) > self.window_ms:
+            self._remove(self.samples.popleft()[1])
+
+    # ---- 증분 갱신 (row: 링버퍼에 저장된 float32 값) ----
+    def _add(self, row):
+        c = self._c
+        self._n += 1
+        ear = row[c["ear"]]
+        if ear < self.perclos_th:
+            self._closed += 1
+        for k in self._events:
+            self._events[k] += row[c[k]]
+        for k in self._sums:
+            self._sums[k] += row[c[k]]
+        # Welford 추가
+        d = ear - self._ear_mean
+        self._ear_mean += d / self._n
+        self._ear_m2 += d * (ear - self._ear_mean)
+
+    def _remove(self, row):
+        c = self._c
+        ear = row[c["ear"]]
+        if ear < self.perclos_th:
+            self._closed -= 1
+        for k in self._events:
+            self._events[k] -= row[c[k]]
+        for k in self._sums:
+            self._sums[k] -= row[c[k]]
+        self._n -= 1
+        if self._n <= 0:
+            self._reset_stats()
+            return
+        # Welford 제거 (역연산)
+        mean_old = self._ear_mean
+        self._ear_mean = (mean_old * (self._n + 1) - ear) / self._n
+        self._ear_m2 -= (ear - mean_old) * (ear - self._ear_mean)
+        if self._ear_m2 < 0.0:
+            self._ear_m2 = 0.0
+
+    def _reset_stats(self):
+        self._n = 0
+        self._closed = 0
+        for k in self._events: self._events[k] = 0
+        for k in self._sums: self._sums[k] = 0.0
+        self._ear_mean = 0.0
+        self._ear_m2 = 0.0
 
     def snapshot(self):
-        if not self.samples:
+        if not len(self.samples):
             return {}
         # 집계
         perclos = self._perclos()
         blink_rate = self._rate_per_min("blink")
         yawn_rate = self._rate_per_min("yawn")
+        nod_rate = self._rate_per_min("nodding")
         # 간단 평균들
         posture = self._avg_feat("posture_angle_norm", 0.0)
         headvar = self._var_feat("ear")  # 대용(추후 head pose 분산)
@@ -37,6 +107,7 @@ class WindowAggregator:
             "perclos": perclos,
             "blink_rate_min": blink_rate,
             "yawn_rate_min": yawn_rate,
+            "nodding_rate_min": nod_rate,
             "posture_angle_norm": posture,
             "headpose_var": headvar,
             "gaze_on_pct": gaze_on,
@@ -44,29 +115,231 @@ class WindowAggregator:
         }
         return snap
 
-    def _perclos(self, th=0.21):
-        cnt = 0; closed = 0
-        for _, feats, _ in self.samples:
-            cnt += 1
-            if feats.get("ear", 0.3) < th:
-                closed += 1
-        return (closed/cnt) if cnt>0 else 0.0
+    def window_stats(self, seconds: float = None):
+        """
+        최근 seconds 구간(≤ window, None이면 버퍼 전체) 통계를 링버퍼 슬라이스로 벡터화 계산.
+        snapshot()과 같은 키를 반환.
+        """
+        if not len(self.samples):
+            return {}
+        since = None if seconds is None else self.samples.last_ts() - int(seconds * 1000)
+        ts, cols = self.samples.window(since)
+        if len(ts) == 0:
+            return {}
+        minutes = max(1e-3, (int(ts[-1]) - int(ts[0]) + 1) / 60000.0)
+        ear = cols["ear"].astype(np.float64)
+        return {
+            "perclos": float(np.mean(ear < self.perclos_th)),
+            "blink_rate_min": float(cols["blink"].sum(dtype=np.float64)) / minutes,
+            "yawn_rate_min": float(cols["yawn"].sum(dtype=np.float64)) / minutes,
+            "nodding_rate_min": float(cols["nodding"].sum(dtype=np.float64)) / minutes,
+            "posture_angle_norm": float(cols["posture_angle_norm"].mean(dtype=np.float64)),
+            "headpose_var": float(ear.var()) if len(ear) >= 2 else 0.0,
+            "gaze_on_pct": float(cols["gaze_on_pct"].mean(dtype=np.float64)),
+            "near_work": float(cols["near_work"].mean(dtype=np.float64)),
+        }
+
+    def _perclos(self):
+        return (self._closed/self._n) if self._n>0 else 0.0
 
     def _rate_per_min(self, key):
-        if not self.samples: return 0.0
+        if not len(self.samples): return 0.0
         # 이벤트 카운트
-        ev_count = sum( e.get(key,0) for _,_,e in self.samples )
-        dur_ms = self.samples[-1][0] - self.samples[0][0] + 1
+        ev_count = self._events.get(key, 0)
+        dur_ms = self.samples.last_ts() - self.samples.first_ts() + 1
         minutes = max(1e-3, dur_ms/60000.0)
         return ev_count / minutes
 
     def _avg_feat(self, name, default=0.0):
-        vals = [ f.get(name, default) for _,f,_ in self.samples ]
-        return sum(vals)/len(vals) if vals else default
+        if self._n == 0: return default
+        return self._sums[name] / self._n
 
     def _var_feat(self, name, default=0.0):
-        vals = [ f.get(name, default) for _,f,_ in self.samples ]
-        return (stats.pvariance(vals) if len(vals)>=2 else 0.0)
+        # 현재는 ear만 증분 추적
+        return (self._ear_m2 / self._n) if self._n >= 2 else 0.0
+
+class MultiWindowAggregator:
+    """
+    다중 해상도 롤링 윈도우 (예: 10초 / 1분 / 5분 / 1시간) 동시 유지.
+    - 프레임은 현재 1초 버킷에만 누적 (프레임당 O(1))
+    - 버킷이 닫힐 때(초당 1회) 공유 버킷 링에 기록하고 각 horizon 합계에 더하고/만료분을 뺌
+    - snapshot()은 horizon별 합계 + 열린 버킷으로 O(horizon 수)
+    """
+    FIELDS = ("n", "closed", "blink", "yawn", "nodding",
+              "posture_angle_norm", "gaze_on_pct", "near_work", "first_ts", "last_ts")
+    SUM_FIELDS = FIELDS[:8]
+    DEFAULT_HORIZONS = {"10s": 10, "1m": 60, "5m": 300, "1h": 3600}
+
+    def __init__(self, horizons: dict = None, perclos_th: float = 0.21):
+        self.horizons = dict(horizons or self.DEFAULT_HORIZONS)
+        self.perclos_th = perclos_th
+        cap = max(self.horizons.values()) + 1
+        self._cap = cap
+        self._f = {name: i for i, name in enumerate(self.FIELDS)}
+        self._buckets = np.zeros((len(self.FIELDS), cap), dtype=np.float64)
+        self._bucket_sec = np.zeros(cap, dtype=np.int64)
+        self._k = 0                       # 닫힌 버킷 누적 개수 (링 위치 = k % cap)
+        self._cur_sec = None              # 열린 버킷의 epoch 초
+        self._cur = self._empty()
+        # horizon별: 가장 오래된 포함 버킷 번호 + 합계
+        self._lo = {h: 0 for h in self.horizons}
+        self._tot = {h: self._empty() for h in self.horizons}
+
+    def _empty(self):
+        return {**{k: 0.0 for k in self.SUM_FIELDS}, "first_ts": None, "last_ts": None}
+
+    def update(self, feats: dict, events: dict, ts_ms: int = None):
+        ts = int(time.time()*1000) if ts_ms is None else int(ts_ms)
+        sec = ts // 1000
+        if self._cur_sec is None:
+            self._cur_sec = sec
+        elif sec != self._cur_sec:
+            self._close_bucket(sec)
+
+        b = self._cur
+        b["n"] += 1
+        if feats.get("ear", 0.3) < self.perclos_th:
+            b["closed"] += 1
+        b["blink"] += events.get("blink", 0)
+        b["yawn"] += events.get("yawn", 0)
+        b["nodding"] += events.get("nodding", 0)
+        b["posture_angle_norm"] += feats.get("posture_angle_norm", 0.0)
+        b["gaze_on_pct"] += feats.get("gaze_on_pct", 0.7)
+        b["near_work"] += feats.get("near_work", 0.0)
+        if b["first_ts"] is None:
+            b["first_ts"] = ts
+        b["last_ts"] = ts
+
+    def _close_bucket(self, new_sec):
+        j = self._k % self._cap
+        for name, i in self._f.items():
+            self._buckets[i, j] = self._cur[name]
+        self._bucket_sec[j] = self._cur_sec
+        self._k += 1
+
+        for h, span in self.horizons.items():
+            tot = self._tot[h]
+            for k in self.SUM_FIELDS:
+                tot[k] += self._cur[k]
+            if tot["first_ts"] is None:
+                tot["first_ts"] = self._cur["first_ts"]
+            tot["last_ts"] = self._cur["last_ts"]
+            # 만료 버킷 제거 (new_sec 기준 span 초 이전)
+            lo = self._lo[h]
+            while lo < self._k and self._bucket_sec[lo % self._cap] <= new_sec - span:
+                col = self._buckets[:, lo % self._cap]
+                for k in self.SUM_FIELDS:
+                    tot[k] -= col[self._f[k]]
+                lo += 1
+            self._lo[h] = lo
+            if lo < self._k:
+                tot["first_ts"] = int(self._buckets[self._f["first_ts"], lo % self._cap])
+            else:
+                tot = self._tot[h] = self._empty()
+
+        self._cur_sec = new_sec
+        self._cur = self._empty()
+
+    def snapshot(self):
+        """{horizon: {perclos, blink_rate_min, yawn_rate_min, nodding_rate_min, posture_angle_norm, ...}}"""
+        cur = self._cur
+        out = {}
+        for h in self.horizons:
+            tot = self._tot[h]
+            n = tot["n"] + cur["n"]
+            if n <= 0:
+                out[h] = {}
+                continue
+            first = tot["first_ts"] if tot["first_ts"] is not None else cur["first_ts"]
+            last = cur["last_ts"] if cur["last_ts"] is not None else tot["last_ts"]
+            minutes = max(1e-3, (last - first + 1) / 60000.0)
+            out[h] = {
+                "perclos": (tot["closed"] + cur["closed"]) / n,
+                "blink_rate_min": (tot["blink"] + cur["blink"]) / minutes,
+                "yawn_rate_min": (tot["yawn"] + cur["yawn"]) / minutes,
+                "nodding_rate_min": (tot["nodding"] + cur["nodding"]) / minutes,
+                "posture_angle_norm": (tot["posture_angle_norm"] + cur["posture_angle_norm"]) / n,
+                "gaze_on_pct": (tot["gaze_on_pct"] + cur["gaze_on_pct"]) / n,
+                "near_work": (tot["near_work"] + cur["near_work"]) / n,
+                "samples": int(n),
+            }
+        return out
+
+class IntervalAccumulator:
+    """
+    DB 로그 주기(LOG_INTERVAL) 단위 집계 - 프레임당 O(1).
+      - 지수(fatigue/stress): 평균/최소/최대
+      - 특징(perclos/yawn_rate/posture/headpose): 평균
+      - 이벤트(blink/yawn/nodding): 구간 내 횟수
+      - 품질: 전체/유효(얼굴 검출) 프레임 수, 조도 양호 비율
+    지수/특징은 유효 프레임만 반영 (얼굴 없음/완전 가림 프레임의 대체값이 섞이지 않도록),
+    유효 프레임이 없으면 NULL(None). 이벤트 횟수와 품질은 전체 프레임 기준.
+    flush()는 repository.save_many() 형식의 행 dict 1개를 반환하고 초기화.
+    """
+    RANGE_METRICS = ("fatigue", "stress")
+    MEAN_METRICS = ("perclos", "yawn_rate", "posture", "headpose")
+    EVENTS = ("blink", "yawn", "nodding")
+
+    def __init__(self, interval_sec: float = 10.0):
+        self.interval_ms = int(interval_sec * 1000)
+        self._start_ms = None
+        self._last_ms = None
+        self._reset()
+
+    def _reset(self):
+        self.frames = 0
+        self.valid_frames = 0
+        self.lighting_ok = 0
+        self._sum = {k: 0.0 for k in self.RANGE_METRICS + self.MEAN_METRICS}
+        self._min = {k: math.inf for k in self.RANGE_METRICS}
+        self._max = {k: -math.inf for k in self.RANGE_METRICS}
+        self._events = {k: 0 for k in self.EVENTS}
+
+    def add(self, ts_ms: int, values: dict, events: dict, valid: bool = True, lighting_ok: bool = True):
+        if self._start_ms is None:
+            self._start_ms = ts_ms
+        self._last_ms = ts_ms
+        self.frames += 1
+        self.lighting_ok += 1 if lighting_ok else 0
+        for k in self.EVENTS:
+            if events.get(k):
+                self._events[k] += 1
+        if not valid:
+            return
+        self.valid_frames += 1
+        for k in self._sum:
+            self._sum[k] += values.get(k, 0.0)
+        for k in self.RANGE_METRICS:
+            v = values.get(k, 0.0)
+            if v < self._min[k]: self._min[k] = v
+            if v > self._max[k]: self._max[k] = v
+
+    def due(self, ts_ms: int) -> bool:
+        return self._start_ms is not None and ts_ms - self._start_ms >= self.interval_ms
+
+    def flush(self, ts_ms: int = None):
+        """구간 요약 행 반환 (프레임 없으면 None) 후 다음 구간 시작. ts_ms 생략 시 마지막 프레임 시각."""
+        if ts_ms is None:
+            ts_ms = self._last_ms
+        if self.frames == 0:
+            self._start_ms = None
+            return None
+        n, nv = self.frames, self.valid_frames
+        row = {k: (self._sum[k] / nv if nv else None) for k in self._sum}
+        for k in self.RANGE_METRICS:
+            row[f"{k}_min"] = self._min[k] if nv else None
+            row[f"{k}_max"] = self._max[k] if nv else None
+        row.update(self._events)
+        row.update({
+            "ts_ms": int(ts_ms),
+            "interval_ms": int(ts_ms - self._start_ms),
+            "frames": n,
+            "valid_frames": self.valid_frames,
+            "lighting_ok_ratio": self.lighting_ok / n,
+        })
+        self._start_ms = None
+        self._reset()
+        return row
 
 class Calibrator:
     """초기 30~60초 개인 기준선/임계 계산 자리 (간단 스텁)."""
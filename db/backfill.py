@@ -0,0 +1,172 @@
+# db/backfill.py
+"""
+과거 logs 행을 새 규칙(rules.yaml)으로 재채점해 log_scores(버전별 사이드 테이블)에 기록.
+
+  python -m db.backfill --rules config/rules.yaml --workers 4 --chunk 5000
+
+- 날짜 파티션 단위로 프로세스 풀에 분배
+- 청크마다 커밋 + backfill_progress(last_id) 갱신 → 중단 후 재실행하면 이어서 진행
+- 날짜가 끝난 파티션만 done (오늘 파티션은 last_id만 전진 → 다음 실행 때 새 행 이어서 채점)
+- 같은 rule_version인데 컴파일된 규칙 해시(ScoringEngine.fingerprint)가 다르면 실행 거부
+  (version을 올리지 않고 가중치만 바꾼 경우 기존 점수가 조용히 남지 않도록)
+- 종료 시 처리량(rows/s) 출력
+"""
+import argparse, sqlite3, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from core.indices import RULES_PATH, ScoringEngine
+from db.schema import apply_migrations
+
+DB_PATH = Path(__file__).parent.parent / "wellness.db"
+
+# logs 컬럼 → 규칙 피처 키 (저장되지 않은 피처는 rules.yaml 기본값 사용)
+COLUMN_FEATURES = {
+    "perclos": "perclos",
+    "yawn_rate": "yawn_rate_min",
+    "posture_angle": "posture_angle_norm",
+    "headpose_var": "headpose_var",
+}
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    return conn
+
+def ensure_tables(conn):
+    apply_migrations(conn)   # ts_ms 컬럼/인덱스 필요
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS log_scores (
+            log_id INTEGER NOT NULL,
+            rule_version INTEGER NOT NULL,
+            fatigue REAL,
+            stress REAL,
+            PRIMARY KEY (log_id, rule_version)
+        );
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            rule_version INTEGER NOT NULL,
+            partition TEXT NOT NULL,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            rows INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            rules_hash TEXT,
+            PRIMARY KEY (rule_version, partition)
+        );
+    ''')
+    if "rules_hash" not in {r[1] for r in conn.execute("PRAGMA table_info(backfill_progress)")}:
+        conn.execute("ALTER TABLE backfill_progress ADD COLUMN rules_hash TEXT")
+    conn.commit()
+
+def check_rules(conn, engine):
+    """이 rule_version으로 이미 채점한 파티션의 규칙 해시가 현재와 다르면 RuntimeError"""
+    row = conn.execute(
+        "SELECT rules_hash FROM backfill_progress WHERE rule_version = ? AND rules_hash IS NOT NULL "
+        "AND rules_hash != ? LIMIT 1", (engine.version, engine.fingerprint)).fetchone()
+    if row:
+        raise RuntimeError(
+            f"rules changed but version did not: rule_version={engine.version} was scored with rules {row[0]}, "
+            f"current rules are {engine.fingerprint}. Bump `version:` in rules.yaml to re-score.")
+
+def list_partitions(conn):
+    """데이터가 있는 로컬 날짜(YYYY-MM-DD) 목록 - ts_ms 인덱스로 다음 행만 찾아 빈 날은 건너뜀"""
+    days = []
+    row = conn.execute("SELECT MIN(ts_ms) FROM logs").fetchone()
+    while row and row[0] is not None:
+        day = datetime.fromtimestamp(row[0] / 1000).date().isoformat()
+        days.append(day)
+        row = conn.execute("SELECT MIN(ts_ms) FROM logs WHERE ts_ms >= ?", (partition_bounds(day)[1],)).fetchone()
+    return days
+
+def partition_bounds(day: str):
+    """로컬 날짜 → [시작, 끝) epoch ms"""
+    start = datetime.combine(date.fromisoformat(day), datetime.min.time())
+    return int(start.timestamp() * 1000), int((start + timedelta(days=1)).timestamp() * 1000)
+
+def backfill_partition(db_path, rules_path, day, chunk=5000):
+    """파티션 하나 처리 (워커 프로세스). Returns: (day, 처리 행 수, 소요 초)"""
+    t0 = time.perf_counter()
+    engine = ScoringEngine.from_yaml(rules_path)
+    cols = list(COLUMN_FEATURES)
+    feat_idx = [engine.keys.index(COLUMN_FEATURES[c]) for c in cols]
+    lo, hi = partition_bounds(day)
+
+    conn = _connect(db_path)
+    row = conn.execute(
+        "SELECT last_id, done FROM backfill_progress WHERE rule_version = ? AND partition = ?",
+        (engine.version, day)).fetchone()
+    last_id, done = row if row else (0, 0)
+    closed = hi <= int(time.time() * 1000)      # 로컬 날짜가 끝났는지 (오늘은 writer가 계속 추가)
+    if done and closed:
+        conn.close()
+        return day, 0, time.perf_counter() - t0
+
+    total = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, {", ".join(cols)} FROM logs
+            WHERE ts_ms >= ? AND ts_ms < ? AND id > ?
+            ORDER BY id LIMIT ?
+        ''', (lo, hi, last_id, chunk)).fetchall()
+        if not rows:
+            break
+        arr = np.array(rows, dtype=np.float64)          # None → nan → 기본값
+        X = np.full((len(arr), len(engine.keys)), np.nan)
+        X[:, feat_idx] = arr[:, 1:]
+        S = engine.score_matrix(X)
+        ids = arr[:, 0].astype(np.int64).tolist()
+        fi, si = engine.score_names.index("fatigue"), engine.score_names.index("stress")
+        last_id = ids[-1]
+        total += len(ids)
+        with conn:   # 청크 단위 트랜잭션 (체크포인트 포함)
+            conn.executemany(
+                "INSERT OR REPLACE INTO log_scores (log_id, rule_version, fatigue, stress) VALUES (?, ?, ?, ?)",
+                zip(ids, [engine.version] * len(ids), S[:, fi].tolist(), S[:, si].tolist()))
+            conn.execute('''
+                INSERT INTO backfill_progress (rule_version, partition, last_id, rows, rules_hash) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(rule_version, partition) DO UPDATE SET
+                    last_id = excluded.last_id, rows = rows + ?, rules_hash = excluded.rules_hash
+            ''', (engine.version, day, last_id, len(ids), engine.fingerprint, len(ids)))
+
+    with conn:
+        conn.execute('''
+            INSERT INTO backfill_progress (rule_version, partition, last_id, done, rules_hash) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(rule_version, partition) DO UPDATE SET done = excluded.done, rules_hash = excluded.rules_hash
+        ''', (engine.version, day, last_id, int(closed), engine.fingerprint))
+    conn.close()
+    return day, total, time.perf_counter() - t0
+
+def run(db_path=DB_PATH, rules_path=RULES_PATH, workers=4, chunk=5000, log=print):
+    engine = ScoringEngine.from_yaml(rules_path)
+    conn = _connect(db_path)
+    ensure_tables(conn)
+    try:
+        check_rules(conn, engine)
+        days = list_partitions(conn)
+    finally:
+        conn.close()
+    log(f"rule_version={engine.version} rules={engine.fingerprint} partitions={len(days)} workers={workers}")
+
+    t0 = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(backfill_partition, str(db_path), str(rules_path), d, chunk) for d in days]
+        for fut in as_completed(futs):
+            day, n, sec = fut.result()
+            total += n
+            if n:
+                log(f"  {day}: {n:,} rows in {sec:.2f}s ({n / max(sec, 1e-9):,.0f} rows/s)")
+    elapsed = time.perf_counter() - t0
+    log(f"done: {total:,} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    return {"rule_version": engine.version, "rows": total, "seconds": elapsed}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-score stored logs under a rules.yaml version")
+    ap.add_argument("--db", default=str(DB_PATH))
+    ap.add_argument("--rules", default=str(RULES_PATH))
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--chunk", type=int, default=5000)
+    args = ap.parse_args()
+    run(args.db, args.rules, args.workers, args.chunk)
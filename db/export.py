@@ -0,0 +1,129 @@
+# db/export.py
+"""
+logs → 날짜 파티션 컬럼 파일 (Parquet 또는 Arrow IPC) 스트리밍 내보내기.
+
+  python -m db.export --out export/ --since 2025-01-01 --until 2025-04-01 --session <sid> --format parquet
+
+- 출력: out/date=YYYY-MM-DD/logs.parquet (hive 파티션 → pyarrow.dataset / pandas.read_parquet로 바로 로드)
+- ts_ms 범위 + session_id 조건은 SQL로 내려서 인덱스로 필터 (idx_logs_ts_ms / idx_logs_session_ts)
+- fetchmany(chunk) 단위로 RecordBatch를 만들어 바로 기록 → 메모리는 chunk 행 분량만 사용
+- pyarrow는 선택 의존성 (pip install pyarrow)
+"""
+import argparse, sqlite3, time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from db.backfill import DB_PATH, list_partitions, partition_bounds
+
+# (컬럼, 타입) - 지표는 float32, 카운트는 int32 (NULL 유지)
+FLOAT_COLUMNS = ("perclos", "yawn_rate", "posture_angle", "headpose_var", "fatigue", "stress",
+                 "fatigue_min", "fatigue_max", "stress_min", "stress_max", "lighting_ok_ratio")
+INT_COLUMNS = ("blink", "yawn", "nodding", "frames", "valid_frames", "interval_ms")
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("db.export requires pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+def _schema(pa, float_cols, int_cols):
+    return pa.schema(
+        [pa.field("id", pa.int64()), pa.field("ts_ms", pa.int64()), pa.field("session_id", pa.string())]
+        + [pa.field(c, pa.float32()) for c in float_cols]
+        + [pa.field(c, pa.int32()) for c in int_cols]
+    )
+
+def _batch(pa, schema, rows, n_float):
+    """fetchmany 결과(튜플 목록) → RecordBatch (컬럼 단위 NumPy 변환, 행 dict 없음)"""
+    cols = list(zip(*rows))
+    arrays = [
+        pa.array(np.fromiter(cols[0], dtype=np.int64, count=len(rows))),
+        pa.array(np.fromiter(cols[1], dtype=np.int64, count=len(rows))),
+        pa.array(cols[2], type=pa.string()),
+    ]
+    for c in cols[3:3 + n_float]:
+        a = np.array(c, dtype=np.float64)                 # None → nan
+        arrays.append(pa.array(a.astype(np.float32), mask=np.isnan(a)))
+    for c in cols[3 + n_float:]:
+        a = np.array(c, dtype=np.float64)
+        arrays.append(pa.array(np.nan_to_num(a).astype(np.int32), mask=np.isnan(a)))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def export(db_path=DB_PATH, out_dir="export", since_ms: int = None, until_ms: int = None,
+           session_id: str = None, fmt: str = "parquet", chunk: int = 50_000, compression: str = "zstd",
+           log=print) -> dict:
+    """
+    [since_ms, until_ms) 구간(+세션)을 날짜 파티션 파일로 기록.
+    Returns: {"files": [...], "rows": n, "seconds": s}
+    """
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"unknown format: {fmt}")
+    pa, pq = _require_pyarrow()
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.execute("PRAGMA query_only=ON")
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(logs)")}
+    float_cols = [c for c in FLOAT_COLUMNS if c in existing]
+    int_cols = [c for c in INT_COLUMNS if c in existing]
+    schema = _schema(pa, float_cols, int_cols)
+    select = ", ".join(["id", "ts_ms", "session_id"] + float_cols + int_cols)
+
+    out_dir = Path(out_dir)
+    t0 = time.perf_counter()
+    files, total = [], 0
+    for day in list_partitions(conn):
+        lo, hi = partition_bounds(day)
+        lo, hi = max(lo, since_ms if since_ms is not None else lo), min(hi, until_ms if until_ms is not None else hi)
+        if lo >= hi:
+            continue
+        where, args = "ts_ms >= ? AND ts_ms < ?", [lo, hi]
+        if session_id is not None:
+            where, args = "session_id = ? AND " + where, [session_id] + args
+        cur = conn.execute(f"SELECT {select} FROM logs WHERE {where} ORDER BY ts_ms", args)
+
+        writer, n, path = None, 0, None
+        try:
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                if writer is None:   # 빈 파티션은 파일을 만들지 않음
+                    part = out_dir / f"date={day}"
+                    part.mkdir(parents=True, exist_ok=True)
+                    if fmt == "parquet":
+                        path = part / "logs.parquet"
+                        writer = pq.ParquetWriter(str(path), schema, compression=compression)
+                    else:
+                        path = part / "logs.arrow"
+                        writer = pa.ipc.new_file(str(path), schema)
+                writer.write_batch(_batch(pa, schema, rows, len(float_cols)))
+                n += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        if n:
+            files.append(str(path))
+            total += n
+            log(f"  {day}: {n:,} rows → {path}")
+    conn.close()
+    elapsed = time.perf_counter() - t0
+    log(f"done: {total:,} rows, {len(files)} files in {elapsed:.2f}s")
+    return {"files": files, "rows": total, "seconds": elapsed}
+
+def _date_ms(s):
+    return int(datetime.fromisoformat(s).timestamp() * 1000) if s else None
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export logs to date-partitioned Parquet/Arrow files")
+    ap.add_argument("--db", default=str(DB_PATH))
+    ap.add_argument("--out", default="export")
+    ap.add_argument("--since", help="ISO date/time (local), inclusive")
+    ap.add_argument("--until", help="ISO date/time (local), exclusive")
+    ap.add_argument("--session")
+    ap.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    ap.add_argument("--chunk", type=int, default=50_000)
+    args = ap.parse_args()
+    export(args.db, args.out, _date_ms(args.since), _date_ms(args.until), args.session, args.format, args.chunk)
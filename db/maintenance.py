@@ -0,0 +1,179 @@
+# db/maintenance.py
+"""
+보존 기간 정리 + 공간 회수 (주기 실행, 작은 청크로 writer를 오래 막지 않음).
+
+  python -m db.maintenance --db wellness.db --retention-days 30
+  python -m db.maintenance --db wellness.db --convert-auto-vacuum   # 기존 DB 1회 전환 (서버 중지 후)
+
+1. 보존 기간이 지난 logs 삭제 - 롤업(db/rollup.py)은 저장 시점에 이미 반영되어 있으므로 원시 행만 지움
+   (log_scores의 해당 행도 함께), rollup_1m도 별도 보존 기간 적용 (1h/1d는 유지)
+2. PRAGMA incremental_vacuum(N) 반복 → 빈 페이지를 파일에서 반환
+3. ANALYZE (analysis_limit로 표본 제한) → 쿼리 플래너 통계 갱신
+청크마다 writer 락을 잡았다 놓고 잠깐 쉬므로 그 사이 LogWriter 커밋이 끼어들 수 있음.
+auto_vacuum=INCREMENTAL이 아닌 기존 DB는 2단계가 no-op → 전체 VACUUM이 필요한 전환은 오프라인 CLI로만.
+"""
+import argparse, logging, time
+
+from db import rollup
+from db.tenants import DEFAULT_USER
+
+DAY_MS = 86_400_000
+
+def _size(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return pages * page_size, free * page_size
+
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+_warned = set()
+
+def ensure_incremental_vacuum(repo, log=None, convert: bool = False):
+    """
+    auto_vacuum=INCREMENTAL 보장. 전환에는 전체 VACUUM(파일 재작성)이 필요하므로
+      - 빈 DB(logs 행 없음)만 바로 전환 (재작성할 내용이 거의 없음)
+      - 데이터가 있는 기존 DB는 convert=True(오프라인 CLI)일 때만 - 주기 실행에서는 경고만 남기고 건너뜀
+    Returns: 전환 여부
+    """
+    with repo._write_lock:
+        conn = repo._writer
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        empty = not _has_table(conn, "logs") or conn.execute("SELECT 1 FROM logs LIMIT 1").fetchone() is None
+        if not (empty or convert):
+            if repo.db_path not in _warned:
+                _warned.add(repo.db_path)
+                logging.warning(f"{repo.db_path}: auto_vacuum is not INCREMENTAL, space is not returned to the OS "
+                                f"- run `python -m db.maintenance --db {repo.db_path} --convert-auto-vacuum` "
+                                f"with the server stopped")
+            return False
+        t0 = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    if log:
+        log(f"DB auto_vacuum → INCREMENTAL ({repo.db_path}, one-time VACUUM {time.perf_counter() - t0:.2f}s)")
+    return True
+
+def delete_older_than(repo, table: str, where_col: str, cutoff_ms: int, chunk: int = 2000,
+                      pause: float = 0.02, key: str = None, also=None) -> int:
+    """
+    cutoff 이전 행을 키 chunk개씩 삭제 (청크마다 별도 트랜잭션, 인덱스 순회라 정렬 없음).
+    key: 삭제 단위 컬럼 (기본 where_col - WITHOUT ROWID 롤업은 버킷 단위)
+    also=(테이블, 컬럼): 같은 키로 함께 삭제. Returns: 삭제 행 수
+    """
+    key = key or where_col
+    total = 0
+    while True:
+        with repo._write() as conn:
+            keys = [r[0] for r in conn.execute(
+                f"SELECT DISTINCT {key} FROM {table} WHERE {where_col} < ? LIMIT ?", (cutoff_ms, chunk))]
+            if not keys:
+                break
+            marks = ", ".join("?" * len(keys))
+            total += conn.execute(f"DELETE FROM {table} WHERE {key} IN ({marks})", keys).rowcount
+            if also:
+                conn.execute(f"DELETE FROM {also[0]} WHERE {also[1]} IN ({marks})", keys)
+        if len(keys) < chunk:
+            break
+        time.sleep(pause)
+    return total
+
+def incremental_vacuum(repo, pages: int = 512, pause: float = 0.02) -> int:
+    """빈 페이지를 pages개씩 반환. 반환한 페이지 수."""
+    freed = 0
+    while True:
+        with repo._write_lock:
+            conn = repo._writer
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free == 0:
+                break
+            # execute()는 1 step(=1페이지)만 진행 → executescript로 끝까지 실행
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        freed += free - left
+        if left >= free:
+            break
+        time.sleep(pause)
+    return freed
+
+def run(repo, retention_days: float = 30, rollup_1m_retention_days: float = 180, chunk: int = 2000,
+        vacuum_pages: int = 512, analysis_limit: int = 1000, pause: float = 0.02, now_ms: int = None) -> dict:
+    """저장소 1개 정리. Returns: 삭제 행 수, 파일 크기 전/후, 회수 바이트, 단계별 소요 시간"""
+    t0 = time.perf_counter()
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    with repo._write_lock:
+        size_before, _ = _size(repo._writer)
+        has_scores = _has_table(repo._writer, "log_scores")
+        has_anomalies = _has_table(repo._writer, "anomalies")
+    report = {"db": repo.db_path, "bytes_before": size_before}
+
+    t = time.perf_counter()
+    report["deleted_logs"] = delete_older_than(
+        repo, "logs", "ts_ms", now_ms - int(retention_days * DAY_MS), chunk, pause,
+        key="id", also=("log_scores", "log_id") if has_scores else None)
+    if has_anomalies:
+        report["deleted_anomalies"] = delete_older_than(
+            repo, "anomalies", "ts_ms", now_ms - int(retention_days * DAY_MS), chunk, pause, key="id")
+    report["deleted_rollup_1m"] = delete_older_than(
+        repo, rollup.table("1m"), "bucket_ms", now_ms - int(rollup_1m_retention_days * DAY_MS), chunk // 10, pause)
+    report["delete_sec"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    report["vacuum_pages"] = incremental_vacuum(repo, vacuum_pages, pause)
+    with repo._write_lock:
+        repo._writer.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    report["vacuum_sec"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    with repo._write_lock:
+        repo._writer.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        repo._writer.execute("ANALYZE")
+        repo._writer.commit()
+        size_after, free_after = _size(repo._writer)
+    report["analyze_sec"] = time.perf_counter() - t
+
+    report.update({
+        "bytes_after": size_after,
+        "bytes_reclaimed": size_before - size_after,
+        "free_bytes": free_after,
+        "duration_sec": time.perf_counter() - t0,
+    })
+    return report
+
+def run_all(router, log=None, **kw) -> list:
+    """TenantRouter의 모든 사용자 DB 정리 (하나씩, 대여 중에는 LRU에서 닫히지 않음)"""
+    reports = []
+    user_keys = router.catalog.user_keys()
+    if router.default_repo is not None and DEFAULT_USER not in user_keys:
+        user_keys.insert(0, DEFAULT_USER)   # 기본 wellness.db는 기본 사용자 WS 접속(카탈로그 등록) 전에도 정리
+    for user_key in user_keys:
+        try:
+            with router.lease(user_key) as repo:
+                ensure_incremental_vacuum(repo, log)
+                r = run(repo, **kw)
+        except Exception as e:
+            logging.error(f"DB maintenance failed ({user_key}): {e}")
+            continue
+        r["user"] = user_key
+        reports.append(r)
+        if log:
+            log(f"🧽 DB maintenance {user_key}: -{r['deleted_logs']} logs, "
+                f"reclaimed {r['bytes_reclaimed'] / 1024:.0f} KiB in {r['duration_sec']:.2f}s")
+    return reports
+
+if __name__ == "__main__":
+    from db.repository import DB_PATH, LogRepository
+    ap = argparse.ArgumentParser(description="Apply raw-log retention and reclaim space")
+    ap.add_argument("--db", default=str(DB_PATH))
+    ap.add_argument("--retention-days", type=float, default=30)
+    ap.add_argument("--rollup-1m-retention-days", type=float, default=180)
+    ap.add_argument("--chunk", type=int, default=2000)
+    ap.add_argument("--convert-auto-vacuum", action="store_true",
+                    help="one-time full VACUUM to switch a legacy DB to auto_vacuum=INCREMENTAL (stop the server first)")
+    args = ap.parse_args()
+    repo = LogRepository(args.db)
+    ensure_incremental_vacuum(repo, print, convert=args.convert_auto_vacuum)
+    print(run(repo, args.retention_days, args.rollup_1m_retention_days, args.chunk))
+    repo.close()
@@ -1,49 +1,139 @@
 # db/repository.py
-import sqlite3
-from datetime import datetime, timedelta
+import itertools, logging, queue, sqlite3, threading, time
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
+from db import rollup
+from db.schema import apply_migrations
+
 # 프로젝트 루트에 'wellness.db'라는 파일로 저장됩니다
 DB_PATH = Path(__file__).parent.parent / "wellness.db"
 
+# 고정 SQL 문자열 → sqlite3 statement cache에서 재사용 (prepared statement)
+LOG_COLUMNS = (
+    "ts", "ts_ms", "session_id", "perclos", "yawn_rate", "posture_angle", "headpose_var",
+    "fatigue", "stress", "blink", "yawn", "nodding",
+    "fatigue_min", "fatigue_max", "stress_min", "stress_max",
+    "frames", "valid_frames", "lighting_ok_ratio", "interval_ms",
+)
+INSERT_LOG_SQL = f'''
+    INSERT INTO logs ({", ".join(LOG_COLUMNS)})
+    VALUES ({", ".join("?" * len(LOG_COLUMNS))})
+'''
+
+ANOMALY_COLUMNS = ("ts_ms", "session_id", "log_id", "metric", "value", "median", "mad", "z",
+                   "direction", "severity", "baseline")
+INSERT_ANOMALY_SQL = f'''
+    INSERT INTO anomalies ({", ".join(ANOMALY_COLUMNS)})
+    VALUES ({", ".join("?" * len(ANOMALY_COLUMNS))})
+'''
+
+# 트렌드 분석 대상 지표 (get_arrays 기본 컬럼)
+ANALYSIS_METRICS = ("perclos", "yawn_rate", "posture_angle", "headpose_var", "fatigue", "stress")
+
 class LogRepository:
-    def __init__(self):
+    """
+    연결 관리형 저장소.
+      - writer: 장수명 연결 1개 (WAL, synchronous=NORMAL), 스레드 락으로 직렬화
+      - reader: 연결 풀 (WAL이라 writer와 동시 읽기 가능)
+      - save_many(): executemany + 단일 트랜잭션(group commit), 롤업(1m/1h/1d)도 같은 트랜잭션에서 갱신
+    """
+    def __init__(self, db_path=DB_PATH, max_readers: int = 4):
+        self.db_path = str(db_path)
+        self.max_readers = max_readers
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
         self._init_db()
 
+    def _connect(self, readonly: bool = False):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, cached_statements=256)
+        if not readonly:
+            # 새 DB 파일이면 빈 페이지를 점진 반환할 수 있게 (WAL 전환 전에 지정해야 적용, 기존 파일은 python -m db.maintenance --convert-auto-vacuum으로 오프라인 1회 전환)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """풀에서 읽기 연결 대여 (없으면 max_readers까지 생성, 초과 시 대기)"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                create = self._reader_count < self.max_readers
+                if create:
+                    self._reader_count += 1
+            conn = self._connect(readonly=True) if create else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def _write(self):
+        """writer 연결로 트랜잭션 실행 (커밋/롤백 자동)"""
+        with self._write_lock:
+            with self._writer:
+                yield self._writer
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
     def _init_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        # 원하시는 9개 항목 + 시간(ts) 저장용 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts TEXT,
-                perclos REAL,
-                yawn_rate REAL,
-                posture_angle REAL,
-                headpose_var REAL,
-                fatigue REAL,
-                stress REAL,
-                blink INTEGER,
-                yawn INTEGER,
-                nodding INTEGER
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self._write() as conn:
+            # 원하시는 9개 항목 + 시간(ts) 저장용 테이블
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts TEXT,
+                    perclos REAL,
+                    yawn_rate REAL,
+                    posture_angle REAL,
+                    headpose_var REAL,
+                    fatigue REAL,
+                    stress REAL,
+                    blink INTEGER,
+                    yawn INTEGER,
+                    nodding INTEGER
+                )
+            ''')
+            # 개인 캘리브레이션 프로필 (user 또는 camera 키)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS calibration_profiles (
+                    profile_key TEXT PRIMARY KEY,
+                    ear_mu REAL,
+                    mar_median REAL,
+                    mar_mad REAL,
+                    updated_at TEXT
+                )
+            ''')
+        # 스키마 마이그레이션 (db/schema.py)
+        with self._write_lock:
+            apply_migrations(self._writer, log=logging.info)
 
-    def save(self, data: dict):
-        """n초마다 호출될 저장 함수"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO logs (
-                ts, perclos, yawn_rate, posture_angle, headpose_var,
-                fatigue, stress, blink, yawn, nodding
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(),
+    @staticmethod
+    def _log_params(data: dict):
+        ts_ms = int(data.get('ts_ms') or time.time() * 1000)
+        return (
+            datetime.fromtimestamp(ts_ms / 1000).isoformat(),
+            ts_ms,
+            data.get('session_id') or '',
             data['perclos'],
             data['yawn_rate'],
             data['posture'],
@@ -51,35 +141,183 @@ class LogRepository:
             data['fatigue'],
             data['stress'],
 
-            1 if data['blink'] else 0, # True/False -> 1/0 변환
-            1 if data['yawn'] else 0,
-            1 if data['nodding'] else 0
-        ))
-        conn.commit()
-        conn.close()
-
-        # db/repository.py (기존 클래스 안에 메서드 추가)
-    
-    def get_data_for_analysis(self, hours: int = 24):
-        """최근 N시간 동안의 6가지 지표 데이터를 모두 가져옴"""
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # 현재 시간 - hours
-        cutoff_time = (datetime.now() - timedelta(hours=hours)).isoformat()
-        
-        # 6가지 핵심 지표만 조회
-        cursor.execute('''
-            SELECT ts, perclos, yawn_rate, posture_angle, headpose_var, fatigue, stress
-            FROM logs 
-            WHERE ts > ? 
-            ORDER BY ts ASC
-        ''', (cutoff_time,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+            int(data['blink']),   # 구간 내 횟수 (True/False도 1/0으로)
+            int(data['yawn']),
+            int(data['nodding']),
+
+            # 구간 집계 (없으면 NULL)
+            data.get('fatigue_min'),
+            data.get('fatigue_max'),
+            data.get('stress_min'),
+            data.get('stress_max'),
+            data.get('frames'),
+            data.get('valid_frames'),
+            data.get('lighting_ok_ratio'),
+            data.get('interval_ms'),
+        )
+
+    def save(self, data: dict):
+        """n초마다 호출될 저장 함수"""
+        self.save_many([data])
+
+    def save_many(self, rows: list):
+        """
+        여러 행을 한 트랜잭션으로 저장 (group commit). 행에 ts_ms가 있으면 그 시각으로 기록.
+        행의 "anomalies"(core/anomaly.py 이벤트 목록)는 같은 트랜잭션에서 log_id와 함께 anomalies 테이블로.
+        """
+        if not rows:
+            return 0
+        params = [self._log_params(d) for d in rows]
+        with self._write() as conn:
+            conn.executemany(INSERT_LOG_SQL, params)
+            rollup.apply(conn, LOG_COLUMNS, params)
+            # 단일 writer + 한 트랜잭션 → id가 연속 (행 dict에 기록해 구독자가 캐시 무효화에 사용)
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            for k, d in enumerate(rows, start=last_id - len(rows) + 1):
+                d["id"] = k
+            anomalies = [self._anomaly_params(d, a) for d in rows for a in d.get("anomalies") or ()]
+            if anomalies:
+                conn.executemany(INSERT_ANOMALY_SQL, anomalies)
+        return len(params)
+
+    @staticmethod
+    def _anomaly_params(row: dict, a: dict):
+        return (int(a.get("ts_ms") or row["ts_ms"]), row.get("session_id") or '', row.get("id"),
+                a["metric"], a.get("value"), a.get("median"), a.get("mad"), a.get("z"),
+                a.get("direction"), a.get("severity"), a.get("baseline"))
+
+    def get_rollup(self, resolution: str = "1h", hours: float = 24, session_id: str = None,
+                   since_ms: int = None, until_ms: int = None, metrics=None):
+        """롤업 버킷 범위 조회 (db/rollup.py query). since_ms 없으면 최근 N시간."""
+        if since_ms is None:
+            since_ms = int((time.time() - hours * 3600) * 1000)
+        with self._reader() as conn:
+            return rollup.query(conn, resolution, since_ms, until_ms, session_id=session_id, metrics=metrics)
+
+    @staticmethod
+    def _analysis_where(hours, session_id, since_ms, until_ms=None):
+        # 현재 시간 - hours (epoch ms, 인덱스 범위 조회)
+        cutoff_ms = int((time.time() - hours * 3600) * 1000) if since_ms is None else int(since_ms) - 1
+        where, args = "ts_ms > ?", [cutoff_ms]
+        if until_ms is not None:
+            where, args = where + " AND ts_ms < ?", args + [int(until_ms)]
+        if session_id is not None:
+            return "session_id = ? AND " + where, [session_id] + args
+        return where, args
+
+    def get_data_for_analysis(self, hours: int = 24, session_id: str = None, since_ms: int = None):
+        """최근 N시간(또는 since_ms 이후) 6가지 지표 데이터를 모두 가져옴 (session_id 지정 시 해당 세션만)"""
+        where, args = self._analysis_where(hours, session_id, since_ms)
+
+        with self._reader() as conn:
+            conn.row_factory = sqlite3.Row
+            # 6가지 핵심 지표만 조회
+            rows = conn.execute(f'''
+                SELECT ts, perclos, yawn_rate, posture_angle, headpose_var, fatigue, stress
+                FROM logs 
+                WHERE {where}
+                ORDER BY ts_ms ASC
+            ''', args).fetchall()
+            conn.row_factory = None
         return [dict(row) for row in rows]
 
+    def get_arrays(self, hours: int = 24, session_id: str = None, since_ms: int = None, metrics=ANALYSIS_METRICS,
+                   until_ms: int = None):
+        """
+        get_data_for_analysis()의 컬럼형 버전 - 행 dict 없이 커서에서 바로 NumPy 배열로.
+        Returns: {"ts_ms": int64[n], metric: float32[n] ...} (ts_ms 오름차순, NULL → nan)
+        """
+        where, args = self._analysis_where(hours, session_id, since_ms, until_ms)
+        cols = ("ts_ms",) + tuple(metrics)
+        with self._reader() as conn:
+            cur = conn.execute(f"SELECT {', '.join(cols)} FROM logs WHERE {where} ORDER BY ts_ms ASC", args)
+            # 튜플을 펼쳐 float64 1차원으로 한 번에 변환 (None → nan), ts_ms는 2^53 이하라 정확
+            flat = np.fromiter(itertools.chain.from_iterable(cur), dtype=np.float64)
+        table = flat.reshape(-1, len(cols))
+        out = {"ts_ms": table[:, 0].astype(np.int64)}
+        for j, c in enumerate(metrics, start=1):
+            out[c] = table[:, j].astype(np.float32)
+        return out
+
+    def get_series(self, since_ms: int, until_ms: int, metrics, points: int = 500,
+                   source: str = "auto", session_id: str = None) -> dict:
+        """
+        차트용 [since_ms, until_ms) 지표별 시계열 (다운샘플 전).
+        source="auto"면 구간 길이/points로 롤업 해상도 선택 (rollup.pick_resolution), 롤업은 버킷 평균.
+        Returns: {"source": "raw"|"1m"|"1h"|"1d", "series": {metric: (ts_ms int64[n], value float64[n])}}
+        """
+        unknown = [m for m in metrics if m not in rollup.METRICS]
+        if unknown:
+            raise ValueError(f"unknown metrics: {unknown}")
+        if source == "auto":
+            source = rollup.pick_resolution(until_ms - since_ms, points)
+        if source == "raw":
+            cols = self.get_arrays(session_id=session_id, since_ms=since_ms, until_ms=until_ms, metrics=metrics)
+            series = {m: (cols["ts_ms"], cols[m].astype(np.float64)) for m in metrics}
+            return {"source": source, "series": series}
+        rows = self.get_rollup(source, session_id=session_id, since_ms=since_ms, until_ms=until_ms, metrics=metrics)
+        acc = {m: ([], []) for m in metrics}
+        for r in rows:
+            t, v = acc[r["metric"]]
+            t.append(r["bucket_ms"])
+            v.append(r["mean"])
+        series = {m: (np.array(t, dtype=np.int64), np.array(v, dtype=np.float64)) for m, (t, v) in acc.items()}
+        return {"source": source, "series": series}
+
+    def get_anomalies(self, hours: float = 24, session_id: str = None, since_ms: int = None, limit: int = 200):
+        """최근 이상치 이벤트 (최신순)"""
+        where, args = self._analysis_where(hours, session_id, since_ms)
+        with self._reader() as conn:
+            rows = conn.execute(f'''
+                SELECT id, {", ".join(ANOMALY_COLUMNS)} FROM anomalies
+                WHERE {where}
+                ORDER BY ts_ms DESC LIMIT ?
+            ''', args + [int(limit)]).fetchall()
+        return [dict(zip(("id",) + ANOMALY_COLUMNS, r)) for r in rows]
+
+    def last_row_id(self) -> int:
+        """마지막 로그 id (rowid 끝만 읽음, 없으면 0)"""
+        with self._reader() as conn:
+            return conn.execute("SELECT MAX(id) FROM logs").fetchone()[0] or 0
+
+    def last_ts_ms(self, session_id: str = None):
+        """마지막 로그 시각 (epoch ms, 없으면 None) - 인덱스 끝만 읽음"""
+        with self._reader() as conn:
+            if session_id is None:
+                row = conn.execute("SELECT MAX(ts_ms) FROM logs").fetchone()
+            else:
+                row = conn.execute("SELECT MAX(ts_ms) FROM logs WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def load_calibration(self, profile_key: str):
+        """저장된 캘리브레이션 프로필 조회 (없으면 None)"""
+        with self._reader() as conn:
+            row = conn.execute('''
+                SELECT ear_mu, mar_median, mar_mad, updated_at
+                FROM calibration_profiles WHERE profile_key = ?
+            ''', (profile_key,)).fetchone()
+        if not row:
+            return None
+        return dict(zip(("ear_mu", "mar_median", "mar_mad", "updated_at"), row))
+
+    def save_calibration(self, profile_key: str, profile: dict):
+        """캘리브레이션 프로필 upsert"""
+        with self._write() as conn:
+            conn.execute('''
+                INSERT INTO calibration_profiles (profile_key, ear_mu, mar_median, mar_mad, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(profile_key) DO UPDATE SET
+                    ear_mu = excluded.ear_mu,
+                    mar_median = excluded.mar_median,
+                    mar_mad = excluded.mar_mad,
+                    updated_at = excluded.updated_at
+            ''', (
+                profile_key,
+                profile['ear_mu'],
+                profile['mar_median'],
+                profile['mar_mad'],
+                datetime.now().isoformat()
+            ))
+
 # 전역 객체 생성
-repo = LogRepository()
\ No newline at end of file
+repo = LogRepository()
@@ -0,0 +1,151 @@
+# db/rollup.py
+# 시계열 롤업 (1분/1시간/1일): (session_id, bucket_ms, metric)별 count/sum/sumsq/min/max
+#  - logs 저장과 같은 트랜잭션에서 증분 upsert → 원시 행을 다시 읽지 않고 평균/분산/범위 조회
+#  - 버킷 경계는 로컬 시계 기준 (시간대별 평균의 "14시"와 일치)
+import time
+
+RESOLUTIONS = {"1m": 60_000, "1h": 3_600_000, "1d": 86_400_000}
+
+METRICS = ("perclos", "yawn_rate", "posture_angle", "headpose_var",
+           "fatigue", "stress", "blink", "yawn", "nodding")
+
+# 구간 집계 컬럼이 있으면 min/max는 그 범위를 사용
+RANGE_COLUMNS = {"fatigue": ("fatigue_min", "fatigue_max"), "stress": ("stress_min", "stress_max")}
+
+SOURCE_COLUMNS = ("session_id", "ts_ms") + METRICS + ("fatigue_min", "fatigue_max", "stress_min", "stress_max")
+
+def table(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"unknown rollup resolution: {resolution}")
+    return f"rollup_{resolution}"
+
+def bucket_start(ts_ms: int, res_ms: int, offset_ms: int = None) -> int:
+    """ts_ms가 속한 버킷 시작 (epoch ms, 로컬 시각 경계)"""
+    if offset_ms is None:
+        offset_ms = time.localtime(ts_ms // 1000).tm_gmtoff * 1000
+    return (ts_ms + offset_ms) // res_ms * res_ms - offset_ms
+
+def pick_resolution(span_ms: int, points: int) -> str:
+    """차트 points개를 채울 수 있는 가장 거친 롤업 (1분 롤업으로도 부족하면 원시 행 "raw")"""
+    for res in ("1d", "1h", "1m"):
+        if span_ms / RESOLUTIONS[res] >= points:
+            return res
+    return "raw"
+
+def create_tables(conn):
+    for res in RESOLUTIONS:
+        t = table(res)
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {t} (
+                session_id TEXT NOT NULL,
+                bucket_ms INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                sumsq REAL NOT NULL,
+                min REAL,
+                max REAL,
+                PRIMARY KEY (session_id, bucket_ms, metric)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_bucket ON {t}(bucket_ms)")
+
+def aggregate(columns, rows) -> dict:
+    """
+    logs 행(columns 순서 튜플) → {(resolution, session_id, bucket_ms, metric): [count, sum, sumsq, min, max]}
+    배치 안에서 먼저 합쳐 upsert 횟수를 버킷 수로 줄임.
+    """
+    ix = {c: i for i, c in enumerate(columns)}
+    metrics = [(m, ix[m], tuple(ix.get(c) for c in RANGE_COLUMNS.get(m, (None, None))))
+               for m in METRICS if m in ix]
+    i_sid, i_ts = ix["session_id"], ix["ts_ms"]
+    acc = {}
+    for r in rows:
+        ts = r[i_ts]
+        if ts is None:
+            continue
+        sid = r[i_sid] or ""
+        off = time.localtime(ts // 1000).tm_gmtoff * 1000
+        buckets = [(res, bucket_start(ts, res_ms, off)) for res, res_ms in RESOLUTIONS.items()]
+        for m, i, (i_lo, i_hi) in metrics:
+            v = r[i]
+            if v is None:
+                continue
+            lo = r[i_lo] if i_lo is not None and r[i_lo] is not None else v
+            hi = r[i_hi] if i_hi is not None and r[i_hi] is not None else v
+            for res, b in buckets:
+                k = (res, sid, b, m)
+                a = acc.get(k)
+                if a is None:
+                    acc[k] = [1, v, v * v, lo, hi]
+                else:
+                    a[0] += 1
+                    a[1] += v
+                    a[2] += v * v
+                    if lo < a[3]: a[3] = lo
+                    if hi > a[4]: a[4] = hi
+    return acc
+
+def apply(conn, columns, rows) -> int:
+    """logs에 넣은 행들을 롤업에 반영 (호출측 트랜잭션 안에서). upsert 행 수 반환."""
+    acc = aggregate(columns, rows)
+    by_res = {}
+    for (res, sid, b, m), (n, s, ss, lo, hi) in acc.items():
+        by_res.setdefault(res, []).append((sid, b, m, n, s, ss, lo, hi))
+    for res, params in by_res.items():
+        conn.executemany(f'''
+            INSERT INTO {table(res)} (session_id, bucket_ms, metric, count, sum, sumsq, min, max)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_id, bucket_ms, metric) DO UPDATE SET
+                count = count + excluded.count,
+                sum = sum + excluded.sum,
+                sumsq = sumsq + excluded.sumsq,
+                min = MIN(min, excluded.min),
+                max = MAX(max, excluded.max)
+        ''', params)
+    return len(acc)
+
+def rebuild(conn, chunk: int = 10000, since_id: int = 0):
+    """logs 전체(또는 since_id 이후)를 청크 단위로 롤업에 반영 (마이그레이션/복구용)"""
+    cols = [c for c in SOURCE_COLUMNS if c in {r[1] for r in conn.execute("PRAGMA table_info(logs)")}]
+    last_id = since_id
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(cols)} FROM logs WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk)).fetchall()
+        if not rows:
+            break
+        apply(conn, cols, [r[1:] for r in rows])
+        last_id = rows[-1][0]
+    return last_id
+
+def query(conn, resolution: str, since_ms: int, until_ms: int = None, session_id: str = None, metrics=None):
+    """
+    [since_ms, until_ms) 버킷 조회. session_id 없으면 전체 세션 합산.
+    Returns: [{bucket_ms, metric, count, sum, sumsq, min, max, mean, std}] (bucket_ms 오름차순)
+    """
+    where, args = ["bucket_ms >= ?"], [bucket_start(int(since_ms), RESOLUTIONS[resolution])]
+    if until_ms is not None:
+        where.append("bucket_ms < ?")
+        args.append(int(until_ms))
+    if session_id is not None:
+        where.append("session_id = ?")
+        args.append(session_id)
+    if metrics:
+        where.append(f"metric IN ({', '.join('?' * len(metrics))})")
+        args.extend(metrics)
+    rows = conn.execute(f'''
+        SELECT bucket_ms, metric, SUM(count), SUM(sum), SUM(sumsq), MIN(min), MAX(max)
+        FROM {table(resolution)}
+        WHERE {" AND ".join(where)}
+        GROUP BY bucket_ms, metric
+        ORDER BY bucket_ms
+    ''', args).fetchall()
+    out = []
+    for b, m, n, s, ss, lo, hi in rows:
+        mean = s / n
+        out.append({
+            "bucket_ms": b, "metric": m, "count": n, "sum": s, "sumsq": ss, "min": lo, "max": hi,
+            "mean": mean, "std": max(ss / n - mean * mean, 0.0) ** 0.5,
+        })
+    return out
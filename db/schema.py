@@ -1 +1,97 @@
-# 컬렉션 스키마/인덱스 정의 자리
+# db/schema.py
+# SQLite 스키마 마이그레이션 (PRAGMA user_version 기반)
+# 각 마이그레이션은 (버전, 설명, 함수) - 함수는 writer 연결 하나로 실행되고 끝나면 user_version 갱신
+from datetime import datetime
+
+from db import rollup
+
+BACKFILL_CHUNK = 10000
+
+def iso_to_ms(ts: str):
+    """ISO-8601(로컬 naive 포함) → epoch ms"""
+    try:
+        return int(datetime.fromisoformat(ts).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+def _m1_numeric_ts(conn):
+    """logs.ts_ms(INTEGER epoch ms) + session_id 추가, 기존 행 ts_ms 채움, (session_id, ts_ms) 인덱스"""
+    cols = _columns(conn, "logs")
+    if "ts_ms" not in cols:
+        conn.execute("ALTER TABLE logs ADD COLUMN ts_ms INTEGER")
+    if "session_id" not in cols:
+        conn.execute("ALTER TABLE logs ADD COLUMN session_id TEXT NOT NULL DEFAULT ''")
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, ts FROM logs WHERE id > ? AND ts_ms IS NULL ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_CHUNK)).fetchall()
+        if not rows:
+            break
+        conn.executemany("UPDATE logs SET ts_ms = ? WHERE id = ?", [(iso_to_ms(ts), i) for i, ts in rows])
+        last_id = rows[-1][0]
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_session_ts ON logs(session_id, ts_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts_ms ON logs(ts_ms)")
+
+def _m2_interval_aggregates(conn):
+    """10초 구간 집계 컬럼: 지수 min/max, 프레임/유효 프레임 수, 조도 양호 비율, 구간 길이.
+    blink/yawn/nodding은 이후 '구간 내 횟수'로 기록 (기존 행은 0/1 그대로)."""
+    cols = _columns(conn, "logs")
+    for name, decl in (
+        ("fatigue_min", "REAL"), ("fatigue_max", "REAL"),
+        ("stress_min", "REAL"), ("stress_max", "REAL"),
+        ("frames", "INTEGER"), ("valid_frames", "INTEGER"),
+        ("lighting_ok_ratio", "REAL"), ("interval_ms", "INTEGER"),
+    ):
+        if name not in cols:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {name} {decl}")
+
+def _m3_rollups(conn):
+    """rollup_1m/1h/1d 테이블 생성 + 기존 logs로 채움"""
+    rollup.create_tables(conn)
+    rollup.rebuild(conn, chunk=BACKFILL_CHUNK)
+
+def _m4_anomalies(conn):
+    """개인 기준선 대비 이상치 이벤트 (core/anomaly.py) - 원인 로그 행은 log_id"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS anomalies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts_ms INTEGER NOT NULL,
+            session_id TEXT NOT NULL DEFAULT '',
+            log_id INTEGER,
+            metric TEXT NOT NULL,
+            value REAL,
+            median REAL,
+            mad REAL,
+            z REAL,
+            direction TEXT,
+            severity TEXT,
+            baseline TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_ts_ms ON anomalies(ts_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_session_ts ON anomalies(session_id, ts_ms)")
+
+MIGRATIONS = [
+    (1, "logs.ts_ms + session_id + indexes", _m1_numeric_ts),
+    (2, "logs interval aggregate columns", _m2_interval_aggregates),
+    (3, "rollup_1m/1h/1d tables", _m3_rollups),
+    (4, "anomalies table", _m4_anomalies),
+]
+
+def apply_migrations(conn, log=None):
+    """미적용 마이그레이션을 순서대로 실행. 적용 후 버전 반환."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, desc, fn in MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            fn(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        if log:
+            log(f"DB migration {version}: {desc}")
+        current = version
+    return current
@@ -0,0 +1,295 @@
+# db/tenants.py
+# 다중 사용자 저장소
+#   - catalog.db: users / devices / sessions (누가, 어떤 카메라로, 언제)
+#   - 사용자별 로그 DB 파일 (data/tenants/u000001.db) → 쓰기 락/WAL/인덱스가 사용자마다 분리
+#   - TenantRouter: 사용자 키 → LogRepository (LRU로 열린 파일 수 제한)
+#   - ScopedRepository: 사용자(+세션) 범위로 고정된 조회/저장 API
+import logging, sqlite3, threading, time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from db.repository import ANALYSIS_METRICS, LogRepository
+
+DEFAULT_USER = "local"
+
+class PartialSaveError(RuntimeError):
+    """save_many에서 일부 사용자 그룹만 저장됨. pending: 저장되지 않은 행 (재시도 대상), saved: 저장된 행 수"""
+    def __init__(self, msg, pending: list, saved: int):
+        super().__init__(msg)
+        self.pending = pending
+        self.saved = saved
+
+class Catalog:
+    """users/devices/sessions 메타데이터 (작은 공용 DB 1개)"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_key TEXT NOT NULL UNIQUE,
+                    db_file TEXT,
+                    created_at_ms INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS devices (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL REFERENCES users(id),
+                    device_key TEXT NOT NULL,
+                    created_at_ms INTEGER NOT NULL,
+                    last_seen_ms INTEGER,
+                    UNIQUE (user_id, device_key)
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL REFERENCES users(id),
+                    device_id INTEGER REFERENCES devices(id),
+                    started_at_ms INTEGER NOT NULL,
+                    ended_at_ms INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_user_started ON sessions(user_id, started_at_ms);
+            ''')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def user(self, user_key: str, db_file: str = None) -> dict:
+        """사용자 조회/생성 → {id, user_key, db_file}"""
+        now = int(time.time() * 1000)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO users (user_key, db_file, created_at_ms) VALUES (?, ?, ?)",
+                (user_key, db_file, now))
+            uid, f = self._conn.execute(
+                "SELECT id, db_file FROM users WHERE user_key = ?", (user_key,)).fetchone()
+        return {"id": uid, "user_key": user_key, "db_file": f}
+
+    def find(self, user_key: str):
+        """사용자 조회만 (없으면 None, 생성하지 않음)"""
+        with self._lock:
+            r = self._conn.execute("SELECT id, db_file FROM users WHERE user_key = ?", (user_key,)).fetchone()
+        return {"id": r[0], "user_key": user_key, "db_file": r[1]} if r else None
+
+    def user_keys(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT user_key FROM users ORDER BY id")]
+
+    def set_db_file(self, user_id: int, db_file: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE users SET db_file = ? WHERE id = ?", (db_file, user_id))
+
+    def device(self, user_id: int, device_key: str) -> int:
+        now = int(time.time() * 1000)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO devices (user_id, device_key, created_at_ms, last_seen_ms) VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, device_key) DO UPDATE SET last_seen_ms = excluded.last_seen_ms
+            ''', (user_id, device_key, now, now))
+            return self._conn.execute(
+                "SELECT id FROM devices WHERE user_id = ? AND device_key = ?", (user_id, device_key)).fetchone()[0]
+
+    def start_session(self, session_id: str, user_id: int, device_id: int = None):
+        """세션 시작 기록 (같은 id로 재접속하면 종료 표시만 해제)"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO sessions (session_id, user_id, device_id, started_at_ms) VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET ended_at_ms = NULL
+            ''', (session_id, user_id, device_id, int(time.time() * 1000)))
+
+    def end_session(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sessions SET ended_at_ms = ? WHERE session_id = ?",
+                               (int(time.time() * 1000), session_id))
+
+    def sessions(self, user_id: int, limit: int = 50):
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT s.session_id, d.device_key, s.started_at_ms, s.ended_at_ms
+                FROM sessions s LEFT JOIN devices d ON d.id = s.device_id
+                WHERE s.user_id = ? ORDER BY s.started_at_ms DESC LIMIT ?
+            ''', (user_id, limit)).fetchall()
+        return [dict(zip(("session_id", "device_key", "started_at_ms", "ended_at_ms"), r)) for r in rows]
+
+class TenantRouter:
+    """
+    사용자 키 → 사용자 전용 LogRepository.
+      - 기본 사용자(DEFAULT_USER)는 기존 wellness.db(default_repo)를 그대로 사용 (기존 이력 유지)
+      - 그 외 사용자는 data_dir/tenants/u{id:06d}.db (파일명에 사용자 입력을 쓰지 않음)
+      - 열린 파일은 max_open개까지 LRU 유지, 사용 중(lease)인 저장소는 닫지 않음
+      - save_many(rows): 행의 user_key별로 나눠 각 파일에 group commit (LogWriter의 repo로 사용)
+    """
+    def __init__(self, data_dir, default_repo: LogRepository = None, max_open: int = 64, max_readers: int = 2):
+        self.data_dir = Path(data_dir)
+        self.tenant_dir = self.data_dir / "tenants"
+        self.tenant_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog = Catalog(self.data_dir / "catalog.db")
+        self.default_repo = default_repo
+        self.max_open = max_open
+        self.max_readers = max_readers
+        self._open = OrderedDict()   # user_key → LogRepository
+        self._leases = {}            # user_key → 사용 중 개수
+        self._users = {}             # user_key → catalog row (캐시)
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "evicted": 0}
+
+    def user(self, user_key: str) -> dict:
+        u = self._users.get(user_key)
+        if u is None:
+            u = self.catalog.user(user_key)
+            if not u["db_file"]:
+                f = "" if user_key == DEFAULT_USER and self.default_repo is not None \
+                    else str(self.tenant_dir / f"u{u['id']:06d}.db")
+                self.catalog.set_db_file(u["id"], f)
+                u["db_file"] = f
+            self._users[user_key] = u
+        return u
+
+    def exists(self, user_key: str = None) -> bool:
+        """등록된 사용자인지 (조회 전용 API용 - user()와 달리 카탈로그 행/DB 파일을 만들지 않음)"""
+        user_key = user_key or DEFAULT_USER
+        if user_key in self._users or (user_key == DEFAULT_USER and self.default_repo is not None):
+            return True
+        return self.catalog.find(user_key) is not None
+
+    @contextmanager
+    def lease(self, user_key: str = None):
+        """사용자 저장소 대여 (대여 중에는 LRU에서 닫히지 않음)"""
+        user_key = user_key or DEFAULT_USER
+        u = self.user(user_key)
+        if not u["db_file"]:
+            yield self.default_repo
+            return
+        with self._lock:
+            r = self._open.get(user_key)
+            if r is None:
+                r = LogRepository(u["db_file"], max_readers=self.max_readers)
+                self._open[user_key] = r
+                self.stats["opened"] += 1
+            self._open.move_to_end(user_key)
+            self._leases[user_key] = self._leases.get(user_key, 0) + 1
+            self._evict()
+        try:
+            yield r
+        finally:
+            with self._lock:
+                self._leases[user_key] -= 1
+
+    def _evict(self):
+        """max_open 초과분을 오래된 순으로 닫음 (대여 중 제외). _lock 보유 상태에서 호출."""
+        over = len(self._open) - self.max_open
+        for key in list(self._open):
+            if over <= 0:
+                break
+            if self._leases.get(key, 0):
+                continue
+            self._open.pop(key).close()
+            self._leases.pop(key, None)
+            self.stats["evicted"] += 1
+            over -= 1
+
+    def scope(self, user_key: str = None, session_id: str = None) -> "ScopedRepository":
+        return ScopedRepository(self, user_key or DEFAULT_USER, session_id)
+
+    def open_session(self, session_id: str, user_key: str = None, device_key: str = None) -> "ScopedRepository":
+        """세션 시작을 카탈로그에 기록하고 세션 범위 저장소 반환"""
+        u = self.user(user_key or DEFAULT_USER)
+        device_id = self.catalog.device(u["id"], device_key) if device_key else None
+        self.catalog.start_session(session_id, u["id"], device_id)
+        return self.scope(u["user_key"], session_id)
+
+    def save_many(self, rows: list):
+        """
+        행의 user_key별로 나눠 저장 (사용자마다 별도 트랜잭션).
+        한 그룹이 실패해도 나머지는 계속 저장하고, 실패 그룹이 있으면 PartialSaveError(pending=그 행들)
+        → 호출 측은 pending만 재시도 (이미 커밋된 그룹을 다시 쓰면 로그/롤업/이상치가 중복됨)
+        """
+        groups = {}
+        for r in rows:
+            groups.setdefault(r.get("user_key") or DEFAULT_USER, []).append(r)
+        n, pending, errors = 0, [], []
+        for user_key, part in groups.items():
+            try:
+                with self.lease(user_key) as r:
+                    n += r.save_many(part)
+            except Exception as e:
+                pending.extend(part)
+                errors.append(f"{user_key}: {e}")
+        if pending:
+            raise PartialSaveError(f"{len(errors)}/{len(groups)} tenant groups failed ({'; '.join(errors)})",
+                                   pending, n)
+        return n
+
+    def close(self):
+        with self._lock:
+            for r in self._open.values():
+                try: r.close()
+                except Exception as e: logging.error(f"Tenant repo close failed: {e}")
+            self._open.clear()
+        self.catalog.close()
+
+    def info(self) -> dict:
+        return {**self.stats, "open": len(self._open), "users_cached": len(self._users)}
+
+class ScopedRepository:
+    """사용자(+세션) 범위 저장소. session_id가 None이면 사용자의 전체 세션."""
+    def __init__(self, router: TenantRouter, user_key: str, session_id: str = None):
+        self.router = router
+        self.user_key = user_key
+        self.session_id = session_id
+
+    def save_many(self, rows: list):
+        for r in rows:
+            r.setdefault("user_key", self.user_key)
+            if self.session_id is not None:
+                r.setdefault("session_id", self.session_id)
+        return self.router.save_many(rows)
+
+    def get_data_for_analysis(self, hours: int = 24, since_ms: int = None):
+        with self.router.lease(self.user_key) as r:
+            return r.get_data_for_analysis(hours=hours, session_id=self.session_id, since_ms=since_ms)
+
+    def get_arrays(self, hours: int = 24, since_ms: int = None, until_ms: int = None, metrics=ANALYSIS_METRICS):
+        with self.router.lease(self.user_key) as r:
+            return r.get_arrays(hours=hours, session_id=self.session_id, since_ms=since_ms, until_ms=until_ms,
+                                metrics=metrics)
+
+    def get_anomalies(self, hours: float = 24, since_ms: int = None, limit: int = 200):
+        with self.router.lease(self.user_key) as r:
+            return r.get_anomalies(hours=hours, session_id=self.session_id, since_ms=since_ms, limit=limit)
+
+    def get_series(self, since_ms: int, until_ms: int, metrics, points: int = 500, source: str = "auto"):
+        with self.router.lease(self.user_key) as r:
+            return r.get_series(since_ms, until_ms, metrics, points, source, session_id=self.session_id)
+
+    def get_rollup(self, resolution: str = "1h", hours: float = 24, since_ms: int = None,
+                   until_ms: int = None, metrics=None):
+        with self.router.lease(self.user_key) as r:
+            return r.get_rollup(resolution, hours=hours, session_id=self.session_id,
+                                since_ms=since_ms, until_ms=until_ms, metrics=metrics)
+
+    def last_row_id(self):
+        with self.router.lease(self.user_key) as r:
+            return r.last_row_id()
+
+    def last_ts_ms(self):
+        with self.router.lease(self.user_key) as r:
+            return r.last_ts_ms(session_id=self.session_id)
+
+    def load_calibration(self, profile_key: str):
+        with self.router.lease(self.user_key) as r:
+            return r.load_calibration(profile_key)
+
+    def save_calibration(self, profile_key: str, profile: dict):
+        with self.router.lease(self.user_key) as r:
+            return r.save_calibration(profile_key, profile)
+
+    def end(self):
+        if self.session_id is not None:
+            self.router.catalog.end_session(self.session_id)
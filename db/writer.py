@@ -0,0 +1,150 @@
+# db/writer.py
+import asyncio, logging, time
+
+class LogWriter:
+    """
+    비동기 write-behind 로그 큐.
+      - 모든 세션이 submit()으로 넣고, 백그라운드 태스크 1개가 모아서 저장
+        (다른 스레드에서의 submit()은 이벤트 루프로 넘겨 적재 - 스케줄러 스레드 작업의 세션 정리 등)
+      - flush_ms마다 또는 batch_rows가 차면 한 트랜잭션으로 repo.save_many()
+      - 큐가 가득 차면(디스크 지연 등) submit()은 드롭 + 카운트, put()은 대기(backpressure)
+      - stop() 시 남은 행을 모두 flush
+      - 커밋 성공 후 add_listener()로 등록한 함수에 배치 전달 (행에 id가 채워진 상태)
+      - 저장소가 일부 행만 저장했다고 알리면(pending 속성이 있는 예외) 남은 행만 재시도
+    """
+    def __init__(self, repo, max_queue: int = 10000, batch_rows: int = 200, flush_ms: int = 1000,
+                 max_retries: int = 3):
+        self.repo = repo
+        self.batch_rows = batch_rows
+        self.flush_sec = flush_ms / 1000.0
+        self.max_retries = max_retries
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._loop = None
+        self._stopping = False
+        self._listeners = []
+        self._stats = {
+            "submitted": 0, "committed": 0, "batches": 0,
+            "dropped": 0, "failed": 0, "max_depth": 0,
+            "last_commit_ms": 0.0, "max_commit_ms": 0.0, "total_commit_ms": 0.0,
+        }
+
+    # ---- 생산자 ----
+    def submit(self, row: dict) -> bool:
+        """논블로킹 적재. 큐가 가득 차면 드롭(카운트) 후 False. 다른 스레드에서 호출하면 루프로 넘기고 True."""
+        loop = self._loop
+        if loop is not None and not self._on_loop(loop):
+            try:
+                loop.call_soon_threadsafe(self.submit, row)
+            except RuntimeError:          # 루프 종료 후
+                self._stats["dropped"] += 1
+                return False
+            return True
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+            return False
+        self._stats["submitted"] += 1
+        self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+        return True
+
+    @staticmethod
+    def _on_loop(loop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    async def put(self, row: dict, timeout: float = None) -> bool:
+        """backpressure 적재: 자리가 날 때까지 대기 (timeout 초과 시 드롭)"""
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout)
+        except asyncio.TimeoutError:
+            self._stats["dropped"] += 1
+            return False
+        self._stats["submitted"] += 1
+        return True
+
+    def add_listener(self, fn):
+        """fn(batch): 커밋된 행 목록을 받는 콜백 (이벤트 루프에서 호출, 빠르게 끝나야 함)"""
+        self._listeners.append(fn)
+
+    # ---- 소비자 ----
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        """남은 행 flush 후 종료"""
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._commit(batch)
+
+    async def _collect(self):
+        """첫 행을 기다린 뒤 flush 주기 또는 batch_rows까지 모음"""
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self._queue.get(), self.flush_sec))
+        except asyncio.TimeoutError:
+            return batch
+        deadline = time.monotonic() + self.flush_sec
+        while len(batch) < self.batch_rows and not self._stopping:
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remain))
+            except asyncio.TimeoutError:
+                break
+        # 종료 중이면 대기 없이 남은 것까지
+        while len(batch) < self.batch_rows and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _commit(self, batch):
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            t0 = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.repo.save_many, pending)
+                pending = []
+                break
+            except Exception as e:
+                # 일부만 저장됐으면(TenantRouter의 사용자별 트랜잭션 - PartialSaveError) 남은 행만 재시도
+                pending = getattr(e, "pending", None) or pending
+                logging.error(f"LogWriter commit failed ({attempt + 1}/{self.max_retries + 1}): {e}")
+                if attempt < self.max_retries and not self._stopping:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+                    continue
+                self._stats["failed"] += len(pending)
+        failed = {id(r) for r in pending}
+        done = [r for r in batch if id(r) not in failed] if failed else batch
+        if not done:
+            return
+        ms = (time.perf_counter() - t0) * 1000.0
+        st = self._stats
+        st["committed"] += len(done)
+        st["batches"] += 1
+        st["last_commit_ms"] = ms
+        st["max_commit_ms"] = max(st["max_commit_ms"], ms)
+        st["total_commit_ms"] += ms
+        for fn in self._listeners:
+            try: fn(done)
+            except Exception as e: logging.error(f"LogWriter listener failed: {e}")
+
+    def stats(self) -> dict:
+        st = dict(self._stats)
+        st["queue_depth"] = self._queue.qsize()
+        st["avg_commit_ms"] = st["total_commit_ms"] / st["batches"] if st["batches"] else 0.0
+        return st
@@ -0,0 +1,58 @@
+# SQLite 로그 저장 벤치마크 (임시 DB 사용)
+#   python scripts/bench_db.py
+# 기존 방식(매 행 connect/commit/close) vs 장수명 WAL 연결 save() vs save_many() 배치
+import os, sqlite3, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db.repository import LogRepository, INSERT_LOG_SQL
+
+def make_row(i):
+    return {"perclos": 0.1, "yawn_rate": 0.2, "posture": 0.3, "headpose": 0.01,
+            "fatigue": 40.0 + i % 10, "stress": 30.0, "blink": i % 2, "yawn": 0, "nodding": 0}
+
+def legacy_save(db_path, data):
+    """기존 구현: 매 호출마다 새 연결 + commit"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(INSERT_LOG_SQL, LogRepository._log_params(data))
+    conn.commit()
+    conn.close()
+
+def bench(label, fn, n):
+    t0 = time.perf_counter()
+    fn(n)
+    sec = time.perf_counter() - t0
+    print(f"{label:<38} {n:>8,} rows  {n / sec:>12,.0f} inserts/s")
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        legacy_db = os.path.join(d, "legacy.db")
+        LogRepository(legacy_db).close()
+        sqlite3.connect(legacy_db).execute("PRAGMA journal_mode=DELETE").close()
+        bench("legacy (connect/commit per row)", lambda n: [legacy_save(legacy_db, make_row(i)) for i in range(n)], 2_000)
+
+        repo = LogRepository(os.path.join(d, "wal.db"))
+        bench("WAL persistent, save() per row", lambda n: [repo.save(make_row(i)) for i in range(n)], 20_000)
+        for batch in (10, 100, 1000):
+            rows = [make_row(i) for i in range(batch)]
+            bench(f"WAL persistent, save_many(batch={batch})",
+                  lambda n: [repo.save_many(rows) for _ in range(n // batch)], 100_000)
+
+        repo.close()
+
+        # 시간 범위 읽기: 90일치(10초 간격) 로그에서 최근 12시간 조회 (ts_ms 인덱스)
+        repo = LogRepository(os.path.join(d, "range.db"))
+        now_ms = int(time.time() * 1000)
+        days = 90
+        n = days * 8640
+        rows = [{**make_row(i), "ts_ms": now_ms - (n - i) * 10_000, "session_id": f"s{i % 3}"} for i in range(n)]
+        t0 = time.perf_counter()
+        for k in range(0, n, 10_000):
+            repo.save_many(rows[k:k + 10_000])
+        print(f"{'load ' + str(days) + ' days':<38} {n:>8,} rows  {n / (time.perf_counter() - t0):>12,.0f} inserts/s")
+        for label, kw in (("get_data_for_analysis(12h)", {}), ("get_data_for_analysis(12h, session)", {"session_id": "s1"})):
+            t0 = time.perf_counter()
+            for _ in range(20):
+                out = repo.get_data_for_analysis(hours=12, **kw)
+            print(f"{label:<38} {len(out):>8,} rows  {(time.perf_counter() - t0) / 20 * 1000:>12.1f} ms/query")
+        repo.close()
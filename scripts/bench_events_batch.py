@@ -0,0 +1,46 @@
+# 배치 이벤트 검출 (detect_events_batch) vs 스트리밍 EventState 비교
+#   python scripts/bench_events_batch.py
+# 랜덤 EAR/MAR + 샘플별 임계값으로 두 경로의 blink/yawn 인덱스가 같은지 확인하고 처리량 측정
+import sys, time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.events import EventState, detect_events_batch
+
+def make_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = np.cumsum(rng.uniform(30, 70, n))
+    ear = 0.28 + 0.04 * rng.standard_normal(n)
+    ear[rng.random(n) < 0.04] = 0.12                            # 감김 구간
+    mar = 0.25 + 0.05 * rng.standard_normal(n)
+    runs = np.repeat(rng.random(n // 20) < 0.05, 20)[:n]        # 하품 구간 (~1초)
+    mar[:len(runs)][runs] = 0.9
+    # 캘리브레이터가 천천히 바꾸는 임계값 흉내
+    ear_mu = 0.30 + 0.02 * np.sin(np.arange(n) / 5000.0)
+    th_close = ear_mu * 0.65
+    th_open = th_close + 0.03
+    th_yawn = 0.55 + 0.1 * np.sin(np.arange(n) / 7000.0)
+    return ts, ear, mar, th_close, th_open, th_yawn
+
+def streaming(ts, ear, mar, th_close, th_open, th_yawn):
+    ev = EventState()
+    blink, yawn = [], []
+    for i in range(len(ts)):
+        ev.th_close, ev.th_open, ev.th_yawn = th_close[i], th_open[i], th_yawn[i]
+        out = ev.update({"ear": ear[i], "mar": mar[i]}, ts_ms=ts[i])
+        if out["blink"]: blink.append(i)
+        if out["yawn"]: yawn.append(i)
+    return {"blink": np.array(blink, dtype=np.int64), "yawn": np.array(yawn, dtype=np.int64)}
+
+if __name__ == "__main__":
+    for n in (10_000, 200_000, 1_000_000):
+        data = make_data(n, seed=n)
+        arrs = [a.tolist() for a in data]           # 스트리밍은 파이썬 float로 (프레임 입력과 동일 조건)
+        t0 = time.perf_counter(); ref = streaming(*arrs); t_stream = time.perf_counter() - t0
+        t0 = time.perf_counter(); out = detect_events_batch(*data); t_batch = time.perf_counter() - t0
+        for k in ("blink", "yawn"):
+            assert np.array_equal(ref[k], out[k]), f"{k} mismatch at n={n}"
+        print(f"n={n:>9,}  blink={len(out['blink']):>6} yawn={len(out['yawn']):>5}  "
+              f"stream={n / t_stream:>12,.0f} rows/s  batch={n / t_batch:>14,.0f} rows/s  "
+              f"({t_stream / t_batch:.0f}x)  identical=OK")
@@ -0,0 +1,89 @@
+# GraphAnalyzer 벤치마크: 행 단위 기존 구현 vs 벡터화(행 dict 입력) vs 컬럼 배열 입력
+#   python scripts/bench_trend.py
+# 1k / 100k / 1M 행에서 세 경로의 출력 텍스트가 같은지 확인하고 소요 시간 측정
+import sys, time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.trend_analysis import GraphAnalyzer
+
+KEYS = ["perclos", "yawn_rate", "posture_angle", "headpose_var", "fatigue", "stress"]
+
+def legacy_analyze(raw_data, trend_window_min=10):
+    """기존 구현 (fromisoformat/strftime per row, defaultdict 그룹, 지표별 np.polyfit)"""
+    if not raw_data:
+        return "데이터가 충분하지 않습니다."
+    processed = []
+    for row in raw_data:
+        dt = datetime.fromisoformat(row['ts'])
+        processed.append({**row, 'dt': dt, 'ts_unix': dt.timestamp()})
+    report = ["[📊 시간대별 평균 및 트렌드 분석]"]
+    hourly_groups = defaultdict(list)
+    for row in processed:
+        hourly_groups[row['dt'].strftime("%H시")].append(row)
+    report.append("\n1️⃣ 시간대별 평균 (Hourly Avg):")
+    for hour in sorted(hourly_groups.keys()):
+        rows = hourly_groups[hour]
+        stats = []
+        for key in ["fatigue", "stress", "perclos", "yawn_rate", "posture_angle", "headpose_var"]:
+            vals = [r[key] for r in rows if r[key] is not None]
+            if vals:
+                stats.append(f"{key}:{sum(vals) / len(vals):.1f}")
+        report.append(f" - {hour}: {', '.join(stats)}")
+    now_ts = processed[-1]['ts_unix']
+    recent_data = [r for r in processed if r['ts_unix'] >= now_ts - trend_window_min * 60]
+    report.append(f"\n2️⃣ 최근 {trend_window_min}분 트렌드 (분당 변화율):")
+    if len(recent_data) < 10:
+        report.append(" - (분석을 위한 데이터가 모이는 중입니다)")
+    else:
+        x = np.array([r['ts_unix'] for r in recent_data])
+        x = (x - x.min()) / 60.0
+        for target in KEYS:
+            slope, _ = np.polyfit(x, np.array([r[target] for r in recent_data]), 1)
+            direction = "↗️증가" if slope > 0 else "↘️감소"
+            if abs(slope) < 0.01: direction = "➡️유지"
+            report.append(f" - {target}: {direction} (속도: {slope:+.3f}/분)")
+    return "\n".join(report)
+
+def make_data(n, seed=0):
+    """12시간에 걸친 n행 (get_data_for_analysis 형식 + get_arrays 형식)"""
+    rng = np.random.default_rng(seed)
+    end_ms = int(time.time() * 1000)
+    ts_ms = np.sort(rng.integers(end_ms - 12 * 3_600_000, end_ms, n)).astype(np.int64)
+    ts_ms[-200:] = np.linspace(end_ms - 500_000, end_ms, 200).astype(np.int64)   # 최근 구간 보장
+    # float32로 저장되는 배열 경로와 같은 값이 되도록 float32 → float64
+    vals = {
+        "perclos": rng.uniform(0, 0.5, n), "yawn_rate": rng.uniform(0, 3, n),
+        "posture_angle": rng.uniform(0, 1, n), "headpose_var": rng.uniform(0, 0.05, n),
+        "fatigue": rng.uniform(0, 100, n), "stress": np.linspace(20, 80, n) + rng.normal(0, 5, n),
+    }
+    vals = {k: v.astype(np.float32) for k, v in vals.items()}
+    iso = [datetime.fromtimestamp(t / 1000).isoformat() for t in ts_ms.tolist()]
+    rows = [{"ts": iso[i], **{k: float(vals[k][i]) for k in KEYS}} for i in range(n)]
+    return rows, {"ts_ms": ts_ms, **vals}
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+if __name__ == "__main__":
+    ga = GraphAnalyzer()
+    print(f"{'rows':>10} {'legacy':>10} {'vec(rows)':>10} {'vec(arrays)':>12}  same")
+    for n in (1_000, 100_000, 1_000_000):
+        rows, cols = make_data(n, seed=n)
+        ref, t_legacy = timed(legacy_analyze, rows, repeat=1 if n > 100_000 else 3)
+        out_rows, t_rows = timed(ga.analyze, rows)
+        out_arr, t_arr = timed(ga.analyze, cols)
+        same = ref == out_rows == out_arr
+        print(f"{n:>10,} {t_legacy * 1000:>8.1f}ms {t_rows * 1000:>8.1f}ms {t_arr * 1000:>10.1f}ms  {same}")
+        if not same:
+            for a, b, c in zip(ref.splitlines(), out_rows.splitlines(), out_arr.splitlines()):
+                if not a == b == c:
+                    print("   legacy:", a, "\n   rows:  ", b, "\n   arrays:", c)
@@ -0,0 +1,119 @@
+# 프레임당 윈도우 집계 / 이벤트 검출 벤치마크
+#   python scripts/bench_window.py
+# 10초 ~ 1시간 윈도우에서 증분 WindowAggregator와 전체 순회(기존 방식) snapshot 비교
+# + 링버퍼 벡터화 window_stats() 비용/메모리
+import math, random, statistics as stats, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.window import WindowAggregator, MultiWindowAggregator
+from core.events import EventState
+
+FPS = 20
+WINDOWS_SEC = [10, 60, 300, 1800, 3600]
+
+def naive_snapshot(agg):
+    """기존 O(window) 방식 (참조용): 윈도우 전체를 파이썬 루프로 재집계"""
+    ts, cols = agg.samples.window()
+    ears = cols["ear"].tolist()
+    n = len(ears)
+    dur_min = max(1e-3, (int(ts[-1]) - int(ts[0]) + 1) / 60000.0)
+    avg = lambda k: sum(cols[k].tolist()) / n
+    return {
+        "perclos": sum(1 for e in ears if e < 0.21) / n,
+        "blink_rate_min": sum(cols["blink"].tolist()) / dur_min,
+        "yawn_rate_min": sum(cols["yawn"].tolist()) / dur_min,
+        "posture_angle_norm": avg("posture_angle_norm"),
+        "headpose_var": stats.pvariance(ears) if n >= 2 else 0.0,
+        "gaze_on_pct": avg("gaze_on_pct"),
+        "near_work": avg("near_work"),
+    }
+
+def make_frames(n, seed=0):
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(n):
+        feats = {
+            "ear": rng.gauss(0.28, 0.05),
+            "posture_angle_norm": rng.random(),
+            "gaze_on_pct": 0.7,
+            "near_work": float(rng.random() < 0.2),
+        }
+        events = {"blink": int(rng.random() < 0.01), "yawn": int(rng.random() < 0.001), "nodding": 0}
+        frames.append((feats, events))
+    return frames
+
+def bench(window_sec, naive_checks=40):
+    n_frames = window_sec * FPS * 2      # 윈도우가 가득 찬 뒤 evict까지 포함
+    naive_every = max(1, n_frames // naive_checks)
+    frames = make_frames(n_frames)
+    agg = WindowAggregator(window_sec=window_sec)
+    dt_ms = 1000 // FPS
+
+    t_inc = 0.0
+    t_naive = 0.0; t_vec = 0.0; n_naive = 0
+    max_err = 0.0
+    for i, (feats, events) in enumerate(frames):
+        t0 = time.perf_counter()
+        agg.update(feats, events, ts_ms=i * dt_ms)
+        snap = agg.snapshot()
+        t_inc += time.perf_counter() - t0
+
+        # 기존 방식은 느리므로 일부 프레임만 측정/검증
+        if i % naive_every == 0:
+            t0 = time.perf_counter()
+            ref = naive_snapshot(agg)
+            t_naive += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            vec = agg.window_stats()
+            t_vec += time.perf_counter() - t0
+            n_naive += 1
+            max_err = max(max_err, max(abs(snap[k] - ref[k]) for k in ref),
+                          max(abs(vec[k] - ref[k]) for k in ref))
+
+    return {
+        "window_sec": window_sec,
+        "inc_us": t_inc / n_frames * 1e6,
+        "naive_us": t_naive / max(1, n_naive) * 1e6,
+        "vec_us": t_vec / max(1, n_naive) * 1e6,
+        "ring_kb": agg.samples.nbytes / 1024,
+        "max_abs_err": max_err,
+    }
+
+def bench_multi(seconds=3600):
+    """10s/1m/5m/1h 동시 집계: 프레임당 비용 (update + snapshot)"""
+    frames = make_frames(seconds * FPS)
+    multi = MultiWindowAggregator()
+    dt_ms = 1000 // FPS
+    t0 = time.perf_counter()
+    for i, (feats, events) in enumerate(frames):
+        multi.update(feats, events, ts_ms=i * dt_ms)
+        multi.snapshot()
+    return (time.perf_counter() - t0) / len(frames) * 1e6
+
+def bench_events(seconds=600):
+    """EventState.update (blink/yawn 히스테리시스 + 깜빡임 간격 통계 + 끄덕임) + blink_var 조회: 프레임당 비용"""
+    rng = random.Random(1)
+    ev = EventState()
+    dt_ms = 1000 // FPS
+    frames = [{"ear": 0.1 if rng.random() < 0.05 else 0.3, "mar": 0.2,
+               "head_pose": {"pitch": 6.0 * math.sin(2 * math.pi * i / FPS)}}
+              for i in range(seconds * FPS)]
+    t0 = time.perf_counter()
+    for i, feats in enumerate(frames):
+        ts = i * dt_ms
+        ev.update(feats, ts_ms=ts)
+        ev.blink_stats.cv("1m", now_ms=ts)
+    return (time.perf_counter() - t0) / len(frames) * 1e6
+
+if __name__ == "__main__":
+    print(f"{'window':>8} {'incremental(us/frame)':>22} {'naive(us/frame)':>16} {'speedup':>8} "
+          f"{'window_stats(us)':>17} {'ring(KiB)':>10} {'max_err':>10}")
+    for w in WINDOWS_SEC:
+        r = bench(w)
+        print(f"{r['window_sec']:>7}s {r['inc_us']:>22.2f} {r['naive_us']:>16.1f} "
+              f"{r['naive_us']/r['inc_us']:>7.0f}x {r['vec_us']:>17.1f} {r['ring_kb']:>10.0f} "
+              f"{r['max_abs_err']:>10.2e}")
+    print(f"\nMultiWindowAggregator {list(MultiWindowAggregator.DEFAULT_HORIZONS)}: "
+          f"{bench_multi():.2f} us/frame (update + snapshot)")
+    print(f"EventState (+ blink interval stats, nod detector): {bench_events():.2f} us/frame")
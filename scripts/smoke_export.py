@@ -0,0 +1,58 @@
+# logs → Parquet/Arrow 내보내기 스모크 실행 (임시 DB 사용)
+#   python scripts/smoke_export.py
+# 3일치 로그를 넣고 parquet/arrow로 내보낸 뒤 파티션별 행 수·NULL·기간/세션 필터를 확인
+import os, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db.repository import LogRepository
+from db.backfill import partition_bounds
+from db.export import export
+
+DAY_MS = 86_400_000
+PER_DAY = 1_000
+
+def make_row(ts_ms, i):
+    return {"ts_ms": ts_ms, "session_id": f"s{i % 2}",
+            "perclos": 0.1, "yawn_rate": 0.2, "posture": 0.3, "headpose": 0.01,
+            "fatigue": None if i % 50 == 0 else 40.0 + i % 10, "stress": 30.0,
+            "blink": i % 2, "yawn": 0, "nodding": 0}
+
+def count_rows(files, fmt):
+    import pyarrow as pa, pyarrow.parquet as pq
+    n, nulls = 0, 0
+    for f in files:
+        t = pq.read_table(f) if fmt == "parquet" else pa.ipc.open_file(f).read_all()
+        n += t.num_rows
+        nulls += t.column("fatigue").null_count
+    return n, nulls
+
+if __name__ == "__main__":
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow not installed - skipped (pip install pyarrow)")
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as d:
+        db_path = os.path.join(d, "export.db")
+        repo = LogRepository(db_path)
+        today = time.strftime("%Y-%m-%d")
+        lo, _ = partition_bounds(today)
+        days = [lo - 2 * DAY_MS, lo - DAY_MS, lo]
+        rows = [make_row(start + i * 60_000, i) for start in days for i in range(PER_DAY)]
+        repo.save_many(rows)
+        repo.close()
+
+        for fmt in ("parquet", "arrow"):
+            out = export(db_path, os.path.join(d, fmt), fmt=fmt, chunk=300, log=lambda *_: None)
+            n, nulls = count_rows(out["files"], fmt)
+            assert len(out["files"]) == 3 and n == out["rows"] == len(rows), (fmt, out, n)
+            assert nulls == len(rows) // 50, nulls
+            print(f"{fmt:<8} {len(out['files'])} files  {n:>6,} rows  {nulls} NULL fatigue  {out['seconds']:.2f}s")
+
+        out = export(db_path, os.path.join(d, "filtered"), since_ms=days[1], until_ms=days[2],
+                     session_id="s0", log=lambda *_: None)
+        assert len(out["files"]) == 1 and out["rows"] == PER_DAY // 2, out
+        print(f"filtered {len(out['files'])} file   {out['rows']:>6,} rows  (1 day, session s0)")
+    print("ok")
@@ -0,0 +1,70 @@
+# 트렌드 요약 NULL 구간 스모크 실행
+#   python scripts/smoke_trend_nulls.py
+# 유효 프레임이 없던 구간(지표 NULL)이 최근 N분 기울기를 nan으로 만들지 않는지 확인
+#   - GraphAnalyzer: NULL은 열마다 제외, 유효 행이 10개 미만인 지표만 "수집 중"
+#   - TrendService 증분 상태(_TrendState): NULL 행이 들어왔다 구간 밖으로 밀려나도 기울기가 회복
+import sys, time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.trend_analysis import GraphAnalyzer
+from core.trend_service import _TrendState
+
+def make_cols(n=60, step_ms=10_000, seed=0):
+    """최근 n구간 (10초 간격) 컬럼 배열"""
+    rng = np.random.default_rng(seed)
+    ts_ms = int(time.time() * 1000) - step_ms * (n - 1) + np.arange(n, dtype=np.int64) * step_ms
+    t = np.arange(n) * step_ms / 60_000.0
+    cols = {"ts_ms": ts_ms,
+            "perclos": 0.2 + 0.001 * t, "yawn_rate": np.full(n, 0.5), "posture_angle": 0.3 + 0.01 * t,
+            "headpose_var": np.full(n, 0.01), "fatigue": 40 + 2.0 * t + rng.normal(0, 0.5, n),
+            "stress": 60 - 1.0 * t + rng.normal(0, 0.5, n)}
+    return {k: (v if k == "ts_ms" else v.astype(np.float32)) for k, v in cols.items()}
+
+def polyfit_slope(cols, key, window_min=10):
+    ts = cols["ts_ms"] / 1000.0
+    keep = ts >= ts[-1] - window_min * 60
+    x, y = (ts[keep] - ts[keep][0]) / 60.0, cols[key][keep].astype(np.float64)
+    ok = ~np.isnan(y)
+    return np.polyfit(x[ok], y[ok], 1)[0]
+
+def check_analyzer():
+    ga = GraphAnalyzer()
+    cols = make_cols()
+    base = ga.analyze_arrays(cols)
+
+    cols["fatigue"][-20] = np.nan           # NULL 구간 1개
+    cols["stress"][-55:] = np.nan           # 최근 10분 유효 행 5개 → 수집 중
+    out = ga.analyze_arrays(cols)
+    assert "nan" not in out
+    lines = {l[3:].split(":")[0]: l for l in out.splitlines()
+             if l.startswith(" - ") and ("/분" in l or "모이는 중" in l)}
+    assert f"{polyfit_slope(cols, 'fatigue'):+.3f}/분" in lines["fatigue"], lines["fatigue"]
+    assert "↗️증가" in lines["fatigue"]
+    assert "모이는 중" in lines["stress"], lines["stress"]
+    # NULL이 없는 지표는 그대로
+    for key in ("perclos", "yawn_rate", "posture_angle", "headpose_var"):
+        assert lines[key] in base, key
+
+def check_incremental():
+    ga = GraphAnalyzer()
+    cols = make_cols(n=240)                 # 40분, 구간 10분 = 60행
+    cols["fatigue"][100] = np.nan
+    Y = np.column_stack([cols[t] for t in ga.targets]).astype(np.float64)
+    ts = cols["ts_ms"]
+    st = _TrendState(len(ga.targets), 10 * 60_000)
+    for i in range(len(ts)):
+        st.add(int(ts[i]), Y[i], row_id=i + 1)
+        if i in (130, len(ts) - 1):         # NULL 행이 구간 안 / 밖으로 밀려난 뒤
+            start = int(np.searchsorted(ts, ts[i] - 10 * 60_000, side="left"))
+            ref = ga._slopes((ts[start:i + 1] - ts[start]) / 60_000.0, Y[start:i + 1])
+            got = st.slopes()
+            print(f"row {i:>3}: valid fatigue rows {int(st.n[4])}, slope {got[4]:+.4f} (ref {ref[4]:+.4f})")
+            assert not np.isnan(got).any(), got
+            assert np.allclose(got, ref, atol=1e-6), (got, ref)
+
+if __name__ == "__main__":
+    check_analyzer()
+    check_incremental()
+    print("ok")
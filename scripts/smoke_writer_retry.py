@@ -0,0 +1,58 @@
+# LogWriter 재시도 스모크 실행 (임시 디렉터리의 TenantRouter 사용)
+#   python scripts/smoke_writer_retry.py
+# 두 번째 사용자 DB 저장이 한 번 실패해도 첫 사용자 행/롤업/이상치가 중복 저장되지 않는지 확인
+import asyncio, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db.tenants import TenantRouter
+from db.writer import LogWriter
+
+def make_row(user_key, ts_ms):
+    return {"user_key": user_key, "session_id": f"s-{user_key}", "ts_ms": ts_ms,
+            "perclos": 0.1, "yawn_rate": 0.2, "posture": 0.3, "headpose": 0.01,
+            "fatigue": 80.0, "stress": 30.0, "blink": 1, "yawn": 0, "nodding": 0,
+            "anomalies": [{"metric": "fatigue", "value": 80.0, "median": 40.0, "mad": 2.0, "z": 13.5,
+                           "direction": "up", "severity": "high", "baseline": "hour", "n": 60,
+                           "ts_ms": ts_ms, "hour": 0}]}
+
+def fail_once(repo):
+    orig, calls = repo.save_many, []
+    def flaky(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OSError("disk I/O error (injected)")
+        return orig(rows)
+    repo.save_many = flaky
+    return calls
+
+async def main(d):
+    router = TenantRouter(d)
+    with router.lease("bob") as repo:      # LRU에 열린 인스턴스를 실패하도록 교체
+        bob_calls = fail_once(repo)
+    committed = []
+    writer = LogWriter(router, flush_ms=50, max_retries=2)
+    writer.add_listener(committed.extend)
+    writer.start()
+    ts_ms = int(time.time() * 1000)
+    writer.submit(make_row("alice", ts_ms))
+    writer.submit(make_row("bob", ts_ms))
+    await asyncio.sleep(0.3)
+    await writer.stop()
+
+    for user_key in ("alice", "bob"):
+        store = router.scope(user_key)
+        counts = [r["count"] for r in store.get_rollup("1m", hours=1, metrics=("fatigue",))]
+        n_anom = len(store.get_anomalies(hours=1))
+        print(f"{user_key:<6} last_row_id={store.last_row_id()}  rollup_1m count={sum(counts)}  anomalies={n_anom}")
+        assert store.last_row_id() == 1 and sum(counts) == 1 and n_anom == 1, user_key
+    assert bob_calls == [1, 1], bob_calls                  # bob만 재시도
+    assert sorted(r["user_key"] for r in committed) == ["alice", "bob"], committed
+    st = writer.stats()
+    assert st["committed"] == 2 and st["failed"] == 0, st
+    router.close()
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        asyncio.run(main(d))
+    print("ok")